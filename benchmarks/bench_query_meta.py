@@ -0,0 +1,67 @@
+"""
+Per-call overhead of building the SQL for a Base getter / insert, with the
+metadata compiled once per class (current code) versus recompiled on every
+call the way the getters used to (a throwaway self.ctype(self.log) plus
+column lists, aliased selects and join clauses rebuilt from FIELDS and
+ASSOCIATIONS).
+
+No database is needed; only statement building is timed.
+
+    python benchmarks/bench_query_meta.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "nemoassets"))
+
+import query_meta
+import file
+import library
+
+
+CASES = [
+    ("File, 3 params, 3 assoc", file.File, {"project_id" : 1, "file_name" : None, "id" : [1, 2, 3, 4]}, ["file_attributes", "libraries", "collections"]),
+    ("Library, 1 param, 2 assoc", library.Library, {"project_id" : 1}, ["technique", "attributes"]),
+]
+
+INSERT_CASES = [
+    ("File insert", file.File, {"file_id" : "f", "data_type_id" : 1, "file_format_id" : 1, "project_id" : 1, "file_name" : "a", "md5" : "x", "size" : 1}),
+]
+
+
+def render_select(cls, meta, params, assoc):
+    meta.validate(params, assoc)
+    where_stmt, bound = meta.where(params)
+    return meta.cached_sql(("joined", meta.params_shape(params), tuple(assoc)),
+                           lambda: [" SELECT " + ", ".join(meta.aliased_table_cols + meta.assocs[name].aliased_cols) + " FROM " + meta.table
+                                    + meta.assocs[name].join_stmt + where_stmt for name in assoc]), bound
+
+
+def compiled(cls, params, assoc):
+    return render_select(cls, cls._meta, params, assoc)
+
+
+def uncompiled(cls, params, assoc):
+    cls(None)
+    return render_select(cls, query_meta.QueryMeta(cls), params, assoc)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print(f"{'case':32} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+    for name, cls, params, assoc in CASES:
+        before = timeit.timeit(lambda: uncompiled(cls, dict(params), assoc), number=iterations) / iterations * 1e6
+        after = timeit.timeit(lambda: compiled(cls, dict(params), assoc), number=iterations) / iterations * 1e6
+        print(f"{name:32} {before:12.2f} {after:12.2f} {before / after:7.1f}x")
+
+    for name, cls, params in INSERT_CASES:
+        instance = cls(None)
+        before = timeit.timeit(lambda: query_meta.QueryMeta(cls).insert_stmt(params) and cls(None), number=iterations) / iterations * 1e6
+        after = timeit.timeit(lambda: instance._build_insert_stmt(params), number=iterations) / iterations * 1e6
+        print(f"{name:32} {before:12.2f} {after:12.2f} {before / after:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Memory per result and attribute-read latency of model instances (File) versus
+the slotted read-only records returned with as_records=True.
+
+No database is needed; both are built from the same synthetic rows, the way
+the getters build them from cursor rows.
+
+    python benchmarks/bench_records.py [rows]
+"""
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "nemoassets"))
+
+import file
+
+
+def make_rows(n):
+    return [{"id" : i, "file_id" : f"nemo:fil-{i:08d}", "data_type_id" : 1, "file_format_id" : 2, "project_id" : 3,
+             "submission_id" : None, "file_name" : f"file_{i}.bam", "md5" : "d41d8cd98f00b204e9800998ecf8427e",
+             "sha256" : None, "size" : i * 10, "mtime" : None, "latest_identifier" : None, "version" : None,
+             "analysis_id" : None, "alt_id" : None, "comment" : None} for i in range(n)]
+
+
+def build(rows, factory):
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = [factory(row) for row in rows]
+    elapsed = time.perf_counter() - started
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, size, elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = make_rows(n)
+    model = file.File()
+
+    objects, object_bytes, object_time = build(rows, lambda row: file.File(model.log, row))
+    records, record_bytes, record_time = build(rows, lambda row: model._record_type(row))
+    del objects[1:], records[1:]
+
+    obj, rec = objects[0], records[0]
+    obj_read = timeit.timeit(lambda: obj.file_name, number=1000000) * 1000
+    rec_read = timeit.timeit(lambda: rec.file_name, number=1000000) * 1000
+
+    print(f"{n} rows")
+    print(f"{'':20} {'bytes/row':>10} {'build us/row':>13} {'read ns':>8}")
+    print(f"{'File instances':20} {object_bytes / n:10.0f} {object_time / n * 1e6:13.2f} {obj_read:8.1f}")
+    print(f"{'FileRecord':20} {record_bytes / n:10.0f} {record_time / n * 1e6:13.2f} {rec_read:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,79 @@
 import sys
+import json
+import base64
 import itertools
+from collections import deque, Counter
 from datetime import date, datetime
+from decimal import Decimal
 from typing import Any
+import mysql.connector
+from mysql.connector import errorcode
+import config
 import db_utils
+import lineage_closure
+import query_meta
+import records
+
+conf = config.Config.get_config()
+
+# Lineage engine used by _get_ancestors() / _get_descendant(): 'cte' resolves the whole
+# lineage with one WITH RECURSIVE query; 'bfs' walks it one SELECT per node.
+LINEAGE_ENGINE = conf.get('lineage', 'engine', fallback='cte')
+LINEAGE_MAX_DEPTH = conf.getint('lineage', 'max_depth', fallback=100)
+
+# Set to False the first time the server rejects a recursive CTE (MySQL < 8.0)
+_cte_supported = True
+
+def _is_cte_unsupported(error):
+    """
+    Whether a ProgrammingError raised by a WITH RECURSIVE query means the server can't parse it
+    (ER_PARSE_ERROR), as opposed to a missing table, bad column or permission problem that a
+    fallback would only hide
+    """
+    return getattr(error, "errno", None) == errorcode.ER_PARSE_ERROR
+
+# How _get_records() loads associations; see _get_records_with_associations()
+ASSOC_STRATEGIES = ["join", "batched"]
+ASSOC_STRATEGY = conf.get('query', 'assoc_strategy', fallback='join')
+
+# (table, key_field) pairs whose UNIQUE index _upsert_rows() has already confirmed
+_unique_keys_checked = set()
+
+# Rows fetched per cursor batch when building DataFrame / Arrow results
+COLUMNAR_FETCH_SIZE = 10000
+
+def _values_equal(param_value, db_value):
+    """
+    Whether a value passed in by an app matches the value read from the database for a single
+    column, using the same rules as Base.compare_to(): two falsey values are equal, and a string
+    matches a non-string when they are equal once converted to strings (datetimes as '%F %T.%f')
+    """
+    if not param_value and not db_value:
+        return True
+    if type(param_value) != type(db_value):
+        if isinstance(db_value, datetime) and isinstance(param_value, str):
+            return db_value.strftime('%F %T.%f') == param_value
+        elif (isinstance(db_value, str) != isinstance(param_value, str)): # if one is an str and the other isn't
+            if not isinstance(param_value, str):
+                return str(param_value) == db_value
+            return str(db_value) == param_value
+        return False
+    return param_value == db_value
+
+def _comparable(value):
+    """
+    A hashable stand-in for value such that _comparable(a) == _comparable(b) wherever
+    _values_equal(a, b) holds for scalar column values: falsey values all map to None, and a
+    string matches a non-string with the same str(). Values of different non-string types stay
+    apart, e.g. True vs 1 or 1.0 vs 1, as in _values_equal(). The one case no key can match is a
+    string of a falsey value, such as "0" vs 0: _values_equal() accepts it although it also treats
+    0 and None as equal but not "0" and None; here "0" only matches "0".
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime('%F %T.%f')
+    return str(value)
 
 class Base(object):
 
@@ -21,6 +92,13 @@ class Base(object):
             else:
                 setattr(self, field, None)
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Compile the select lists, join fragments, etc. for this class once rather than on every query
+        if hasattr(cls, "TABLE") and hasattr(cls, "FIELDS"):
+            cls._meta = query_meta.QueryMeta(cls)
+            cls._record_type = records.make_record_type(cls)
+
     def __str__(self):
         d = vars(self).copy()
         d.pop("log")
@@ -71,48 +149,87 @@ class Base(object):
         return object.__getattribute__(self, name)
 
 
-    def _get_records_with_associations(self, params, assoc):
-    
-        # Get the FIELDS and TABLE from the child who is invoking this function
-        child = self.ctype(self.log)
-        FIELDS = child.FIELDS
-        TABLE = child.TABLE
+    def _add_assoc_value(self, instance, assoc_meta, row):
+        """
+        Append the association values in row to the instance attribute named after the association.
+        Values are set with object.__setattr__ since records (see records.py) are read-only to callers.
 
-        mysql_cnx = None
-        try:
-            where_stmt = ""
-            if not isinstance(params, dict):
-                raise ValueError(f"params must be dict. Received {params} with type {type(params)}")
-            fields_plus_id_col = list(FIELDS.keys()) + ["id"]
-            if not all(field in fields_plus_id_col for field in list(params.keys())):
-                raise ValueError(f"Expected only the following parameters {fields_plus_id_col}, but recieved params {list(params.keys())}")
-            if not isinstance(assoc, list):
-                raise ValueError(f"Associations must be provided as a list")
-            if not all(assoc_key in child.ASSOCIATIONS.keys() for assoc_key in assoc):
-                raise ValueError(f"Expected only the following associations {list(child.ASSOCIATIONS.keys())}, but recieved params {assoc}")
-            
-            # Build the where clause
-            param_names = list(params.keys())
-            for field in param_names:
-                if where_stmt:
-                    where_stmt += " and "
-                else:
-                    where_stmt = " WHERE "
-                if params[field] is None:
-                    where_stmt += f"{TABLE}.{field} is %({field})s"
-                elif isinstance(params[field], list):
-                    where_stmt += f"{TABLE}.{field} in ("
-                    values_list = params[field]
-                    for index, value in enumerate(values_list):
-                        if index > 0:
-                            where_stmt += ", "
-                        where_stmt += f"%({field}_{str(index)})s"
-                        params[field + "_" + str(index)] = value
-                    where_stmt += ")"
-                    params.pop(field)
+        :param: instance: A model instance or record
+        :param: assoc_meta (AssocMeta): The compiled association, from self._meta.assocs
+        """
+        assoc_name = assoc_meta.name
+
+        # In order to accommodate both the human readable values as well as internal database values,
+        # we'll return a dictionary which has two keys if we were supplied with the reference table details
+        # (meaning that the reference table was also joined into the query)
+        # 'human_readable' and 'raw'
+        raw_results = {key : row[col] for col, key in assoc_meta.raw_cols}
+
+        # since we are left-joining, if we got back only None results, continue
+        if all(value is None for value in raw_results.values()):
+            return
+
+        if assoc_meta.ref:
+            # initialize this assocation to a dict with two keys (if it's not truthy)
+            if not getattr(instance, assoc_name):
+                object.__setattr__(instance, assoc_name, {'human_readable' : [], 'raw' : []})
+            current_assoc_dict = getattr(instance, assoc_name + "_all")
+            current_assoc_dict['human_readable'].append(row[assoc_meta.human_key])
+            current_assoc_dict['raw'].append(raw_results)
+        else:
+            # If there are no reference details, we won't use the human_readable / raw keys at all in this attribute
+            # Instead, we'll just put the raw values in as a list of dicts (or just dict if one-to-one is specified)
+
+            # if this is a one-to-one relationship, no need to use a list
+            if assoc_meta.one_to_one:
+                object.__setattr__(instance, assoc_name, raw_results)
+            else:
+                # initialize this assocation to an empty list (if it's not already truthy)
+                if not getattr(instance, assoc_name):
+                    object.__setattr__(instance, assoc_name, [])
+                current_assoc_list = getattr(instance, assoc_name)
+
+                # Instead of returning a list of dicts that have just one key, return a list of values.
+                if len(raw_results) == 1:
+                    single_value = list(raw_results.values())[0]
+                    current_assoc_list.append(single_value)
                 else:
-                    where_stmt += f"{TABLE}.{field} = %({field})s"
+                    current_assoc_list.append(raw_results)
+
+                object.__setattr__(instance, assoc_name, current_assoc_list)
+
+    def _new_result(self, params, as_records=False):
+        """
+        :return: a record (see records.py) if as_records, else a new instance of the model class
+        """
+        if as_records:
+            return self._record_type(params)
+        return self.ctype(self.log, params)
+
+    def _get_records_with_associations(self, params, assoc, strategy=None, as_records=False):
+        """
+        :param: strategy (str): How associations are loaded; one of ASSOC_STRATEGIES. Defaults to the
+            [query] assoc_strategy setting.
+            * "join" runs one query per association, each joining the main table to that association table
+            * "batched" selects the main table rows once, then loads each association for those ids in
+              chunks of WHERE ... IN (...). Unlike "join", records without any rows in a ref_join association
+              are still returned.
+        """
+        strategy = strategy or ASSOC_STRATEGY
+        if strategy == "join":
+            return self._get_records_joined(params, assoc, as_records)
+        if strategy == "batched":
+            return self._get_records_batched(params, assoc, as_records)
+        raise ValueError(f"Unknown association strategy {strategy}. Expected one of {ASSOC_STRATEGIES}")
+
+    def _get_records_joined(self, params, assoc, as_records=False):
 
+        meta = self._meta
+
+        mysql_cnx = None
+        try:
+            meta.validate(params, assoc)
+            where_stmt, params = meta.where(params)
 
             # Build and run the queries
             # A couple ways to do the association queries:
@@ -124,191 +241,125 @@ class Base(object):
             #       More SQL time, less Python time (no filtering needed)
             # Going with option 2 because it seems simpler to implement and possibly faster
 
-            results = {}
+            # Originally, each association was just a join, but now that I'm pulling back library which might have a null technique id, for example,
+            # that results in no library coming back with a regular join. So I thought to do a left join instead, but that's caused me to
+            # get back a lot of None results which messes up the compare_to() function by comparing things like an empty to list
+            # to a list containting a dict with no values:
+            # Eg. {'attributes': {'arg': 'Empty list', 'db': "[{'value': None, 'unit': None, 'attributes_id': None, 'source_value': None}]"}
+            # So to get around both of the shortcomings, will do a left join (AssocMeta.join_stmt) and then strip out dictionaries where all values are None
 
-            table_cols = [TABLE + "." + field for field in FIELDS.keys()]
-            table_cols.insert(0, TABLE + ".id")
-            aliased_table_cols = [col + " AS `" + col + "`" for col in table_cols]
-            # aliased_table_cols = [TABLE + "." + field + " AS `" + TABLE + "." + field + "`" for field in FIELDS.keys()]
-            # aliased_table_cols.insert(0, TABLE + ".id AS `" + TABLE + ".id`") # in addition to retrieving the named fields, we'll retrieve the internal table id
-            # table_cols = [TABLE + "." + field for field in FIELDS.keys()]
-            # table_cols.insert(0, TABLE + ".id")
+            # Normally, we don't want to concatenate anything to an sql string due to risk of SQL injections, however
+            # all that's happening here is that we're building out a prepared statement with parameterized placeholders
+            # in the 'where' clause. Additionally, these params and fields have been demonstrated to be valid (above).
+            def build_stmts():
+                return [f""" SELECT {", ".join(meta.aliased_table_cols + meta.assocs[assoc_name].aliased_cols)} FROM {meta.table} """
+                        + meta.assocs[assoc_name].join_stmt + where_stmt for assoc_name in assoc]
+            stmts = meta.cached_sql(("joined", meta.params_shape(params), tuple(assoc)), build_stmts)
 
-            for assoc_name in assoc:
-                self.log.debug(f"Now retrieving {assoc_name}")
-                assoc_details = child.ASSOCIATIONS[assoc_name]
-
-                # TODO: Should change all ASSOICATIONS to have a retrieve list of columns and a load_associations list of columns
-                # For now, remove the id_col from assoc_cols to make life easy and have the return be a list instead of it being a dict (below)
-                assoc_cols = []
-                ref_cols = []
-                for assoc_field in assoc_details['cols']:
-                    if assoc_field == assoc_details['id_col']:
-                        continue
-                    assoc_cols.append(assoc_details['table'] + "." + assoc_field)
-                if "ref_join" in assoc_details and "ref_cols" in assoc_details["ref_join"]:
-                    for assoc_field in assoc_details['ref_join']['ref_cols']:
-                        if assoc_field == assoc_details['id_col']:
-                            continue
-                        ref_cols.append(assoc_details['ref_join']['ref_table'] + "." + assoc_field)
-
-                # assoc_cols = [assoc_details['table'] + "." + assoc_field for assoc_field in assoc_details['cols']]
-                aliased_assoc_cols = [col + " AS `" + col + "`" for col in assoc_cols]
-                assoc_id_col = f"{TABLE}.id"
-                if 'assoc_id_col' in assoc_details:
-                    assoc_id_col = assoc_details['assoc_id_col']
-                
-                # Originally, this was just a join, but now that I'm pulling back library which might have a null technique id, for example,
-                # that results in no library coming back with a regular join. So I thought to do a left join instead, but that's caused me to
-                # get back a lot of None results which messes up the compare_to() function by comparing things like an empty to list 
-                # to a list containting a dict with no values:
-                # Eg. {'attributes': {'arg': 'Empty list', 'db': "[{'value': None, 'unit': None, 'attributes_id': None, 'source_value': None}]"}
-                # So to get around both of the shortcomings, will do a left join and then strip out dictionaries where all values are None
-                join_stmt = f" left join {assoc_details['table']} on {assoc_details['table']}.{assoc_details['id_col']} = {assoc_id_col} "
-                
-                ref_details = None
-                if "ref_join" in assoc_details:
-                    ref_details = assoc_details["ref_join"]
-                    aliased_ref_cols = [f"{ref_details['readable_field']} AS `{ref_details['ref_table']}.{ref_details['readable_field']}`"]
-                    join_stmt += f" join {ref_details['ref_table']} on {ref_details['ref_table']}.id = {assoc_details['table']}.{ref_details['ref_field']} "
-                    # select all table cols + all joined table cols
-                    if "ref_cols" in ref_details:
-                        aliased_ref_cols = [f"{ref_details['ref_table']}.{ref_col} AS `{ref_details['ref_table']}.{ref_col}`" for ref_col in ref_details['ref_cols']]
-                    select = f""" SELECT {", ".join(aliased_table_cols + aliased_assoc_cols + aliased_ref_cols)} FROM {TABLE} """
-                else:
-                    select = f""" SELECT {", ".join(aliased_table_cols + aliased_assoc_cols)} FROM {TABLE} """
+            results = {}
+            id_key = f"{meta.table}.id"
 
-                # Normally, we don't want to concatenate anything to an sql string due to risk of SQL injections, however
-                # all that's happening here is that we're building out a prepared statement with parameterized placeholders
-                # in the 'where' clause. Additionally, these params and fields have been demonstrated to be valid (above).
-                stmt = select + join_stmt + where_stmt
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor(dictionary=True)
 
-                mysql_cnx = self.db.get_db_connection()
-                cursor = mysql_cnx.cursor(dictionary=True)
+            for assoc_name, stmt in zip(assoc, stmts):
+                self.log.debug(f"Now retrieving {assoc_name}")
+                assoc_meta = meta.assocs[assoc_name]
 
                 self.log.debug(f"Executing stmt: {stmt} with params {params}")
                 cursor.execute(stmt, params)
                 for row in cursor.fetchall():
-                    # field_names = [i[0] for i in cursor.description]
-                    if row[f'{TABLE}.id'] in results:
+                    if row[id_key] in results:
                         # We've already pulled in this entity (fist-class table result)
-                        instance = results[row[f'{TABLE}.id']]
+                        instance = results[row[id_key]]
                     else:
                         # Make the first class entity instance
-                        entity_results = {k[len(TABLE)+1:]: row[k] for k in table_cols}
+                        entity_results = {field : row[col] for col, field in meta.entity_cols}
                         self.log.debug(f"Instantiating new entity with {entity_results}")
-                        child_instance = self.ctype(self.log, entity_results)
-                        results[row[f'{TABLE}.id']] = child_instance
-                        instance = child_instance
-                    
+                        instance = self._new_result(entity_results, as_records)
+                        results[row[id_key]] = instance
+
                     # append the results from this association query
-                    # In order to accommodate both the human readable values as well as internal database values,
-                    # we'll return a dictionary which has two keys if we were supplied with the reference table details
-                    # (meaning that the reference table was also joined into the query (above))
-                    # 'human_readable' and 'raw'
-                    
-                    if "ref_join" in assoc_details and "ref_cols" in assoc_details["ref_join"]:
-                        raw_results = {col[len(assoc_details['ref_join']['ref_table'])+1:]:row[col] for col in ref_cols}
-                    else:
-                        raw_results = {col[len(assoc_details['table'])+1:]:row[col] for col in assoc_cols}
-                    
-                    # since we are left-joining, if we got back only None results, continue
-                    if all(value is None for value in raw_results.values()):
-                        continue
-
-                    if ref_details:
-                        # initialize this assocation to a dict with two keys (if it's not truthy)
-                        if not getattr(instance, assoc_name):
-                            setattr(instance, assoc_name, {'human_readable' : [], 'raw' : []}) 
-                        human_results = row[f"{ref_details['ref_table']}.{ref_details['readable_field']}"]
-                        current_assoc_dict = getattr(instance, assoc_name + "_all")
-                        current_assoc_dict['human_readable'].append(human_results)
-                        current_assoc_dict['raw'].append(raw_results)
-                    else:
-                        # If there are no reference details, we won't use the human_readable / raw keys at all in this attribute
-                        # Instead, we'll just put the raw values in as a list of dicts (or just dict if one-to-one is specified)
-                        
-                        # if this is a one-to-one relationship, no need to use a list
-                        if "one_to_one" in assoc_details and assoc_details["one_to_one"]:
-                            setattr(instance, assoc_name, raw_results)
-                        else:
-                            # initialize this assocation to an empty list (if it's not already truthy)
-                            if not getattr(instance, assoc_name):
-                                setattr(instance, assoc_name, [])
-                            current_assoc_list = getattr(instance, assoc_name)
-
-                            # Instead of returning a list of dicts that have just one key, return a list of values.
-                            if len(raw_results) == 1:
-                                single_value = list(raw_results.values())[0]
-                                current_assoc_list.append(single_value)
-                            else:
-                                current_assoc_list.append(raw_results)
-                            
-                            setattr(instance, assoc_name, current_assoc_list)
+                    self._add_assoc_value(instance, assoc_meta, row)
 
             self.log.debug("Returning " + str(len(results)) + " results")
-            
+
             return list(results.values())
 
         except Exception as error:
-            self.log.error("Failed in _get_records_with_associations() {}".format(error), exc_info=sys.exc_info())
+            self.log.error("Failed in _get_records_joined() {}".format(error), exc_info=sys.exc_info())
             raise error
         finally:
             try:
                 self.db.close_connection(mysql_cnx)
             except Exception as error:
                 raise error
-        
 
-    def _get_records_without_associations(self, params):
+    def _load_associations_for(self, instances, assoc, cursor):
+        """
+        Populate the requested associations on instances (a dict of id -> instance) with one query per
+        association per IN_CLAUSE_CHUNK_SIZE ids
+        """
+        meta = self._meta
 
-        # Get the FIELDS and TABLE from the child who is invoking this function
-        child = self.ctype(self.log)
-        FIELDS = child.FIELDS
-        TABLE = child.TABLE
+        for assoc_name in assoc:
+            self.log.debug(f"Now retrieving {assoc_name}")
+            assoc_meta = meta.assocs[assoc_name]
+
+            for chunk in db_utils.chunked(instances.keys()):
+                placeholders, params = db_utils.build_in_clause(chunk)
+                stmt = meta.cached_sql(("batched", assoc_name, len(chunk)),
+                                       lambda: assoc_meta.batched_stmt + f" WHERE {assoc_meta.parent_id_col} IN ({placeholders})")
+                self.log.debug(f"Executing stmt: {stmt} for {len(chunk)} ids")
+                cursor.execute(stmt, params)
+                for row in cursor.fetchall():
+                    self._add_assoc_value(instances[row['_parent_id']], assoc_meta, row)
+
+    def _get_records_batched(self, params, assoc, as_records=False):
+
+        meta = self._meta
 
         mysql_cnx = None
         try:
-            where_stmt = ""
-            if not isinstance(params, dict):
-                raise ValueError(f"params must be dict. Received {params} with type {type(params)}")
-            fields_plus_id_col = list(FIELDS.keys()) + ["id"]
-            if not all(field in fields_plus_id_col for field in list(params.keys())):
-                raise ValueError(f"Expected only the following parameters {fields_plus_id_col}, but recieved params {list(params.keys())}")
-
-            all_fields = [TABLE + "." + field for field in FIELDS.keys()]
-            all_fields.insert(0, TABLE + ".id")
-
-            select = f""" SELECT {", ".join(all_fields)}
-                        FROM {TABLE}
-                    """
-            # Build the where clause
-            param_names = list(params.keys())
-            for field in param_names:
-                if where_stmt:
-                    where_stmt += " and "
-                else:
-                    where_stmt = " WHERE "
-                if params[field] is None:
-                    where_stmt += f"{field} is %({field})s"
-                elif isinstance(params[field], list):
-                    where_stmt += f"{field} in ("
-                    values_list = params[field]
-                    for index, value in enumerate(values_list):
-                        if index > 0:
-                            where_stmt += ", "
-                        where_stmt += f"%({field}_{str(index)})s"
-                        params[field + "_" + str(index)] = value
-                    where_stmt += ")"
-                    params.pop(field)
-                else:
-                    where_stmt += f"{field} = %({field})s"          
+            meta.validate(params, assoc)
+            where_stmt, params = meta.where(params)
+            stmt = meta.select_stmt + where_stmt
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor(dictionary=True)
+
+            self.log.debug(f"Executing stmt: {stmt} with params {params}")
+            cursor.execute(stmt, params)
+            results = {row["id"] : self._new_result(row, as_records) for row in cursor.fetchall()}
+
+            if results:
+                self._load_associations_for(results, assoc, cursor)
 
+            self.log.debug("Returning " + str(len(results)) + " results")
+            return list(results.values())
+
+        except Exception as error:
+            self.log.error("Failed in _get_records_batched() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def _get_records_without_associations(self, params, as_records=False):
+
+        meta = self._meta
+
+        mysql_cnx = None
+        try:
+            meta.validate(params)
+            where_stmt, params = meta.where(params)
 
             # Normally, we don't want to concatenate anything to an sql string due to risk of SQL injections, however
             # all that's happening here is that we're building out a prepared statement with parameterized placeholders
             # in the 'where' clause. Additionally, these params and fields have been demonstrated to be valid (above).
-            stmt = select + where_stmt
+            stmt = meta.select_stmt + where_stmt
 
             mysql_cnx = self.db.get_db_connection()
             cursor = mysql_cnx.cursor(dictionary=True)
@@ -318,7 +369,7 @@ class Base(object):
 
             results = []
             for row in cursor.fetchall():
-                child_instance = self.ctype(self.log, row)
+                child_instance = self._new_result(row, as_records)
                 results.append(child_instance)
 
             self.log.debug("Returning " + str(len(results)) + " results")
@@ -333,13 +384,310 @@ class Base(object):
             except Exception as error:
                 raise error
 
-    
 
-    def _get_records(self, params={}, assoc=[]):
-        if assoc:
-            return self._get_records_with_associations(params, assoc)
-        return self._get_records_without_associations(params)
 
+    def _iter_records(self, params={}, assoc=[], chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE, as_records=False):
+        """
+        Generator version of _get_records() for result sets too large to hold in memory. Rows are read
+        chunk_size at a time from an unbuffered cursor and instances are yielded as each chunk is
+        built. Associations are loaded per chunk the same way as the "batched" strategy, so every
+        instance is complete when it is yielded.
+
+        Outside a transaction, the rows stream over their own pooled connection and associations are
+        loaded over a second one. Inside a transaction both share the transaction's connection so
+        uncommitted rows are seen; the result set is then buffered client-side, although instances
+        are still only built a chunk at a time.
+
+        Closing the generator early (e.g. breaking out of the loop) discards the streaming connection
+        rather than reading the rest of the result set.
+
+        :param: params (dict): Same as for _get_records()
+        :param: assoc (list): Associations to load on each instance
+        :param: chunk_size (int): Number of rows fetched (and associations loaded) at a time
+        :param: as_records (bool): Yield read-only records instead of model instances; see _get_records()
+        """
+        meta = self._meta
+
+        mysql_cnx = None
+        assoc_cnx = None
+        try:
+            meta.validate(params, assoc)
+            where_stmt, params = meta.where(params)
+            stmt = meta.select_stmt + where_stmt
+
+            streaming = not db_utils.is_transaction_state()
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor(dictionary=True, buffered=not streaming)
+
+            self.log.debug(f"Executing stmt: {stmt} with params {params}")
+            cursor.execute(stmt, params)
+
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                instances = {row["id"] : self._new_result(row, as_records) for row in rows}
+
+                if assoc:
+                    if assoc_cnx is None:
+                        # The streaming connection can't run other queries until its result set is read
+                        assoc_cnx = self.db.get_db_connection() if streaming else mysql_cnx
+                    self._load_associations_for(instances, assoc, assoc_cnx.cursor(dictionary=True))
+
+                yield from instances.values()
+
+        except Exception as error:
+            self.log.error("Failed in _iter_records() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                if assoc_cnx is not mysql_cnx:
+                    self.db.close_connection(assoc_cnx)
+                # A connection left with unread rows is discarded rather than returned to the pool
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def _encode_page_cursor(self, order_by, descending, value, record_id):
+        # JSON has no datetime, DECIMAL or BINARY values, so those are tagged and restored by _decode_page_cursor()
+        if isinstance(value, datetime):
+            value = {"datetime" : value.isoformat()}
+        elif isinstance(value, date):
+            value = {"date" : value.isoformat()}
+        elif isinstance(value, Decimal):
+            value = {"decimal" : str(value)}
+        elif isinstance(value, (bytes, bytearray)):
+            value = {"bytes" : base64.urlsafe_b64encode(bytes(value)).decode()}
+        token = {"order_by" : order_by, "descending" : descending, "value" : value, "id" : record_id}
+        return base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+    def _decode_page_cursor(self, cursor_token, order_by, descending):
+        try:
+            token = json.loads(base64.urlsafe_b64decode(cursor_token.encode()))
+        except Exception:
+            raise ValueError(f"Invalid page cursor {cursor_token}")
+        if token.get("order_by") != order_by or token.get("descending") != descending:
+            raise ValueError(f"Page cursor was issued for order_by={token.get('order_by')} descending={token.get('descending')}, "
+                             f"not order_by={order_by} descending={descending}")
+        value = token["value"]
+        if isinstance(value, dict) and "datetime" in value:
+            value = datetime.fromisoformat(value["datetime"])
+        elif isinstance(value, dict) and "date" in value:
+            value = date.fromisoformat(value["date"])
+        elif isinstance(value, dict) and "decimal" in value:
+            value = Decimal(value["decimal"])
+        elif isinstance(value, dict) and "bytes" in value:
+            value = base64.urlsafe_b64decode(value["bytes"].encode())
+        return value, token["id"]
+
+    def _get_records_page(self, params={}, assoc=[], after_id=None, limit=100, order_by="id", descending=False, as_records=False):
+        """
+        Keyset (seek) pagination. Instead of an OFFSET, each page starts right after the last row of the
+        previous one, so page 40 costs the same as page 1 given an index on (order_by, id).
+
+        Rows are ordered by order_by and then id, so the order is stable even when order_by has duplicates.
+        As in MySQL, NULLs sort before all other values ascending and after them descending.
+
+        :param: params (dict): Same as for _get_records()
+        :param: assoc (list): Associations to load, for just this page's records
+        :param: after_id: None for the first page; otherwise the cursor returned with the previous page.
+            When ordering by id, a plain record id may be passed instead.
+        :param: limit (int): Maximum number of records in the page
+        :param: order_by (str): "id" or one of the FIELDS
+        :param: descending (bool): Reverse the order
+        :param: as_records (bool): Return read-only records instead of model instances; see _get_records()
+
+        :return: a tuple of the list of records and the cursor for the next page (None on the last page)
+        """
+        meta = self._meta
+        TABLE = meta.table
+
+        mysql_cnx = None
+        try:
+            meta.validate(params, assoc)
+            if order_by not in meta.params_allowed:
+                raise ValueError(f"order_by must be 'id' or one of {meta.fields}. Received {order_by}")
+            if not isinstance(limit, int) or limit < 1:
+                raise ValueError(f"limit must be a positive integer. Received {limit}")
+
+            where_stmt, params = meta.where(params)
+
+            after_value = None
+            if after_id is not None:
+                if isinstance(after_id, str):
+                    after_value, after_id = self._decode_page_cursor(after_id, order_by, descending)
+                elif order_by != "id":
+                    raise ValueError("A plain id can only be used as after_id when ordering by id. Pass the cursor returned with the previous page.")
+
+            order_col = f"{TABLE}.{order_by}"
+            id_col = f"{TABLE}.id"
+            op = "<" if descending else ">"
+
+            if after_id is not None:
+                params["_after_id"] = after_id
+                if order_by == "id":
+                    seek_stmt = f"{id_col} {op} %(_after_id)s"
+                elif after_value is None:
+                    # Last row had a NULL: rest of the NULLs, then (ascending only) every non-NULL
+                    seek_stmt = f"({order_col} IS NULL and {id_col} {op} %(_after_id)s)"
+                    if not descending:
+                        seek_stmt = f"({seek_stmt} or {order_col} IS NOT NULL)"
+                else:
+                    params["_after_value"] = after_value
+                    seek_stmt = f"({order_col} {op} %(_after_value)s or ({order_col} = %(_after_value)s and {id_col} {op} %(_after_id)s)"
+                    if descending:
+                        seek_stmt += f" or {order_col} IS NULL"
+                    seek_stmt += ")"
+                where_stmt += (" and " if where_stmt else " WHERE ") + seek_stmt
+
+            direction = "DESC" if descending else "ASC"
+            order_stmt = f" ORDER BY {id_col} {direction}" if order_by == "id" else f" ORDER BY {order_col} {direction}, {id_col} {direction}"
+
+            # Read one extra row to find out whether there is another page
+            stmt = meta.select_stmt + where_stmt + order_stmt + f" LIMIT {limit + 1}"
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor(dictionary=True)
+
+            self.log.debug(f"Executing stmt: {stmt} with params {params}")
+            cursor.execute(stmt, params)
+            rows = cursor.fetchall()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = self._encode_page_cursor(order_by, descending, rows[-1][order_by], rows[-1]["id"])
+
+            results = {row["id"] : self._new_result(row, as_records) for row in rows}
+            if results and assoc:
+                self._load_associations_for(results, assoc, cursor)
+
+            return list(results.values()), next_cursor
+
+        except Exception as error:
+            self.log.error("Failed in _get_records_page() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def _read_columns(self, cursor):
+        """
+        Read the rest of cursor's (tuple) result set into a dict of column name -> list of values
+        """
+        names = cursor.column_names
+        columns = {name : [] for name in names}
+        column_lists = [columns[name] for name in names]
+        while True:
+            rows = cursor.fetchmany(COLUMNAR_FETCH_SIZE)
+            if not rows:
+                break
+            for column, values in zip(column_lists, zip(*rows)):
+                column.extend(values)
+        return columns
+
+    def _read_assoc_columns(self, assoc_meta, parent_ids, cursor):
+        """
+        Load an association for parent_ids in long form: a parent_id column plus one column per raw value
+        (and the readable_field for ref_join associations), with one row per association row.
+        """
+        meta = self._meta
+        sources = {"parent_id" : "_parent_id"}
+        for col, key in assoc_meta.raw_cols:
+            sources[key] = col
+        if assoc_meta.ref and assoc_meta.ref['readable_field'] not in sources:
+            sources[assoc_meta.ref['readable_field']] = assoc_meta.human_key
+        columns = {name : [] for name in sources}
+
+        for chunk in db_utils.chunked(parent_ids):
+            placeholders, params = db_utils.build_in_clause(chunk)
+            stmt = meta.cached_sql(("batched", assoc_meta.name, len(chunk)),
+                                   lambda: assoc_meta.batched_stmt + f" WHERE {assoc_meta.parent_id_col} IN ({placeholders})")
+            self.log.debug(f"Executing stmt: {stmt} for {len(chunk)} ids")
+            cursor.execute(stmt, params)
+            chunk_columns = self._read_columns(cursor)
+
+            # Same rule as the object loaders: rows whose raw values are all None are dropped
+            raw_values = [chunk_columns[col] for col, key in assoc_meta.raw_cols]
+            keep = [index for index, values in enumerate(zip(*raw_values)) if any(value is not None for value in values)]
+            for name, source in sources.items():
+                values = chunk_columns[source]
+                columns[name].extend(values if len(keep) == len(values) else [values[index] for index in keep])
+        return columns
+
+    def _get_records_columnar(self, params, assoc, as_arrow=False):
+        """
+        Build the result as a pandas DataFrame (or a pyarrow Table if as_arrow) straight from the cursor,
+        without creating an object per row.
+
+        :return: the frame of main table rows if assoc is empty; otherwise a tuple of that frame and a
+            dict of association name -> long-form frame keyed by parent_id (see _read_assoc_columns())
+        """
+        # Optional dependencies, only needed for these result modes
+        if as_arrow:
+            try:
+                import pyarrow
+            except ImportError:
+                raise ImportError("as_arrow=True requires the pyarrow package")
+            make_frame = pyarrow.table
+        else:
+            try:
+                import pandas
+            except ImportError:
+                raise ImportError("as_frame=True requires the pandas package")
+            make_frame = pandas.DataFrame
+
+        meta = self._meta
+
+        mysql_cnx = None
+        try:
+            meta.validate(params, assoc)
+            where_stmt, params = meta.where(params)
+            stmt = meta.select_stmt + where_stmt
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            self.log.debug(f"Executing stmt: {stmt} with params {params}")
+            cursor.execute(stmt, params)
+            columns = self._read_columns(cursor)
+            frame = make_frame(columns)
+            if not assoc:
+                return frame
+
+            assoc_frames = {}
+            for assoc_name in assoc:
+                self.log.debug(f"Now retrieving {assoc_name}")
+                assoc_frames[assoc_name] = make_frame(self._read_assoc_columns(meta.assocs[assoc_name], columns["id"], cursor))
+            return frame, assoc_frames
+
+        except Exception as error:
+            self.log.error("Failed in _get_records_columnar() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def _get_records(self, params={}, assoc=[], strategy=None, as_records=False, as_frame=False, as_arrow=False):
+        """
+        :param: params (dict): field -> value to filter on; a value of None matches NULL and a list matches any of its values
+        :param: assoc (list): Names of the ASSOCIATIONS to load onto each result
+        :param: strategy (str): How associations are loaded; see _get_records_with_associations()
+        :param: as_records (bool): Return compact read-only records (see records.py) instead of model instances.
+            Records have the same attributes, including the _raw / _all accessors, but none of the model's
+            methods, and use a fraction of the memory.
+        :param: as_frame (bool): Return a pandas DataFrame instead; see _get_records_columnar()
+        :param: as_arrow (bool): Return a pyarrow Table instead; see _get_records_columnar()
+        """
+        if as_frame or as_arrow:
+            return self._get_records_columnar(params, assoc, as_arrow)
+        if assoc:
+            return self._get_records_with_associations(params, assoc, strategy, as_records)
+        return self._get_records_without_associations(params, as_records)
 
     def _get_record(self, params:dict, assoc=[]):
         records = self._get_records(params, assoc)
@@ -352,8 +700,7 @@ class Base(object):
         return None
 
     def _validate_add_keys(self, params):
-        child = self.ctype(self.log)
-        for field in child.REQUIRED_KEYS_FOR_ADD:
+        for field in self.REQUIRED_KEYS_FOR_ADD:
             if isinstance(field, str):
                 if field not in params:
                     self.log.warning(f"{field} not in params")
@@ -368,41 +715,228 @@ class Base(object):
             
 
     def _build_insert_stmt(self, params={}):
-        child = self.ctype(self.log)
-        FIELDS = child.FIELDS
-        TABLE = child.TABLE
-
-        REQUIRED_FIELDS = [field for field in FIELDS if FIELDS[field]]
-        OPTIONAL_FIELDS = [field for field in FIELDS if not FIELDS[field]]
+        meta = self._meta
 
         # Verify that all required fields are specified, else raise exception
-        if not all(req_field in params for req_field in REQUIRED_FIELDS):
-            raise Exception(f"Missing required param. Required: {REQUIRED_FIELDS}. Received: {params}")
-        
-        # Build the start of the query with required fields
-        ins_stmt = f"INSERT INTO {TABLE} ({','.join(REQUIRED_FIELDS)}"
-        val_stmt = f"VALUES({', '.join(['%s'] * len(REQUIRED_FIELDS))}"
+        if not all(req_field in params for req_field in meta.required_fields):
+            raise Exception(f"Missing required param. Required: {meta.required_fields}. Received: {params}")
 
-        # data = (sample['smp_id'],)
-        data = tuple([params[field] for field in REQUIRED_FIELDS])
+        # Required fields followed by whichever optional fields were supplied
+        return meta.insert_stmt(params)
 
-        # add to statement with optional fields
-        for field in OPTIONAL_FIELDS:
-            if field in params:
-                ins_stmt = ins_stmt + f", {field}"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, params[field])
+    def _natural_key(self, params, key_fields):
+        if len(key_fields) == 1:
+            return params[key_fields[0]]
+        return tuple(params[field] for field in key_fields)
+
+    def _insert_rows(self, rows, key_fields, cursor, chunk_size=db_utils.INSERT_CHUNK_SIZE):
+        """
+        Insert rows into this class's table with multi-row INSERTs and read back the generated ids.
+        Rows are grouped by which optional fields they supply so that each statement has a single
+        column list. Called inside an existing transaction; the caller commits.
+
+        :param: rows (list): dicts of field -> value, each with all the required fields
+        :param: key_fields (list): Fields that identify a row, e.g. ["file_id"]. The generated ids are
+            read back by these, so they must be unique within rows.
+        :param: cursor: A cursor on the transaction's connection
+
+        :return: a dict of natural key (the key field's value, or a tuple of values for several key
+            fields) to generated id, in the order of rows
+        """
+        meta = self._meta
+
+        keys = []
+        groups = {}
+        for row in rows:
+            if not all(req_field in row for req_field in meta.required_fields):
+                raise Exception(f"Missing required param. Required: {meta.required_fields}. Received: {row}")
+            keys.append(self._natural_key(row, key_fields))
+            optional = tuple(field for field in meta.optional_fields if field in row)
+            groups.setdefault(optional, []).append(row)
+
+        if len(set(keys)) != len(keys):
+            raise ValueError(f"Rows must have unique values for {key_fields}")
+
+        for optional, group in groups.items():
+            cols = meta.required_fields + list(optional)
+            for chunk in db_utils.chunked(group, chunk_size):
+                stmt = meta.insert_rows_stmt(optional, len(chunk))
+                self.log.debug(f"Executing stmt INSERT INTO {self.TABLE} ({', '.join(cols)}) for {len(chunk)} rows")
+                cursor.execute(stmt, tuple(row[field] for row in chunk for field in cols))
+
+        ids = self._get_ids_for_keys(key_fields, keys, cursor)
+        missing = [key for key in keys if key not in ids]
+        if missing:
+            raise Exception(f"Unable to read back the ids of inserted {self.TABLE} records: {missing[:10]}")
+        return {key : ids[key] for key in keys}
+
+    def _get_rows_for_keys(self, key_field, keys, cursor):
+        """
+        :return: a dict of requested key_field value to the record's id and FIELDS as a dict, read
+            with one query per IN_CLAUSE_CHUNK_SIZE keys. A record whose stored key differs from the
+            requested one only in case, accents or trailing spaces is found under the requested key;
+            see db_utils.match_requested().
+        """
+        meta = self._meta
+        cols = ["id"] + meta.fields
+        existing = {}
+        for chunk in db_utils.chunked(keys):
+            placeholders, params = db_utils.build_in_clause(chunk)
+            stmt = f"SELECT {', '.join(cols)} FROM {self.TABLE} WHERE {key_field} IN ({placeholders})"
+            self.log.debug(f"Executing stmt {stmt} for {len(chunk)} keys")
+            cursor.execute(stmt, params)
+            rows = [row if isinstance(row, dict) else dict(zip(cols, row)) for row in cursor.fetchall()]
+            for key, matches in db_utils.match_requested(chunk, rows, lambda row : row[key_field]).items():
+                existing[key] = matches[0]
+        return existing
+
+    def _check_unique_key(self, key_field, cursor):
+        """
+        Raise unless key_field has a single-column UNIQUE index (or is the primary key) on this
+        class's table, as _upsert_rows() requires. Checked once per table and key per process.
+        """
+        if (self.TABLE, key_field) in _unique_keys_checked:
+            return
+
+        stmt = """
+            SELECT INDEX_NAME
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %(table)s AND NON_UNIQUE = 0
+            GROUP BY INDEX_NAME
+            HAVING COUNT(*) = 1 AND MAX(COLUMN_NAME) = %(key_field)s
+        """
+        params = {"table" : self.TABLE, "key_field" : key_field}
+        self.log.debug(f"Executing stmt: {stmt} with params {params}")
+        cursor.execute(stmt, params)
+        if not cursor.fetchall():
+            raise Exception(f"{self.TABLE}.{key_field} needs a UNIQUE index for upserts to match existing records")
+        _unique_keys_checked.add((self.TABLE, key_field))
+
+    def _upsert_rows(self, rows, key_field, cursor, chunk_size=db_utils.INSERT_CHUNK_SIZE):
+        """
+        Insert or update rows matched on key_field, a unique natural key such as file_id.
+
+        The existing records are read with one query per chunk of keys and each row is classified
+        as inserted (no record yet), changed (some supplied field differs, compared as in
+        compare_to()) or untouched. Only inserted and changed rows are written, with multi-row
+        INSERT ... ON DUPLICATE KEY UPDATE statements grouped by which optional fields they supply.
+        Called inside an existing transaction; the caller commits.
+
+        :param: rows (list): dicts of field -> value. New records need every required field;
+            rows for existing records only need key_field and the fields to change.
+        :param: key_field (str): The natural key column. ON DUPLICATE KEY UPDATE matches rows on any
+            UNIQUE index, so key_field must have a UNIQUE index of its own (e.g. on file.file_id,
+            sample.smp_id, subject.sbj_id); without one every row would be inserted again. This is
+            checked against information_schema once per table and key.
+
+        :return: a dict with keys 'inserted', 'changed' and 'untouched', each a dict of natural key
+            to id in the order of rows
+        """
+        meta = self._meta
+
+        keys = [row[key_field] for row in rows]
+        if len(set(keys)) != len(keys):
+            raise ValueError(f"Rows must have unique values for {key_field}")
+
+        self._check_unique_key(key_field, cursor)
+
+        existing = self._get_rows_for_keys(key_field, keys, cursor)
+
+        report = {"inserted" : {}, "changed" : {}, "untouched" : {}}
+        groups = {}
+        for row in rows:
+            current = existing.get(row[key_field])
+            if current is None:
+                if not all(req_field in row for req_field in meta.required_fields):
+                    raise Exception(f"Missing required param. Required: {meta.required_fields}. Received: {row}")
+                report["inserted"][row[key_field]] = None
+            elif any(not _values_equal(row[field], current[field]) for field in row if field != key_field):
+                # Required fields that weren't supplied keep their current values
+                row = dict({field : current[field] for field in meta.required_fields}, **row)
+                report["changed"][row[key_field]] = current["id"]
+            else:
+                report["untouched"][row[key_field]] = current["id"]
+                continue
+            optional = tuple(field for field in meta.optional_fields if field in row)
+            groups.setdefault(optional, []).append(row)
+
+        for optional, group in groups.items():
+            cols = meta.required_fields + list(optional)
+            for chunk in db_utils.chunked(group, chunk_size):
+                stmt = meta.upsert_rows_stmt(optional, len(chunk), key_field)
+                self.log.debug(f"Executing stmt INSERT INTO {self.TABLE} ({', '.join(cols)}) ... ON DUPLICATE KEY UPDATE for {len(chunk)} rows")
+                cursor.execute(stmt, tuple(row[field] for row in chunk for field in cols))
+
+        if report["inserted"]:
+            ids = self._get_ids_for_keys([key_field], list(report["inserted"].keys()), cursor)
+            report["inserted"] = {key : ids[key] for key in report["inserted"]}
+
+        self.log.debug(f"Upserted {self.TABLE}: {len(report['inserted'])} inserted, {len(report['changed'])} changed, {len(report['untouched'])} untouched")
+        return report
+
+    def _attribute_ids_for(self, records, assoc):
+        """
+        Resolve the attr_name of every attribute dict under records[i][assoc] with one lookup
+        per batch, for the add_*s() bulk loaders
+
+        :return: a dict of attr_name to attributes id
+        """
+        names = [attr['attr_name'] for record in records for attr in (record.get(assoc) or []) if 'attr_name' in attr]
+        attribute_ids = self.db.get_attribute_ids_by_names(names) if names else {}
+        unknown = [name for name in dict.fromkeys(names) if name not in attribute_ids]
+        if unknown:
+            self.log.error(f"Cannot find attributes with names: {unknown}")
+            raise Exception(f"Cannot find attributes with names: {unknown}")
+        return attribute_ids
+
+    def _get_ids_for_keys(self, key_fields, keys, cursor):
+        """
+        :return: a dict of requested natural key to id for the records matching keys, matched as in
+            _get_rows_for_keys(). Where several records share a key the newest (highest id) wins, so
+            freshly inserted rows are found even when key_fields aren't unique across the whole table.
+        """
+        ids = {}
+        for chunk in db_utils.chunked(keys):
+            if len(key_fields) == 1:
+                placeholders, params = db_utils.build_in_clause(chunk)
+                where_stmt = f"{key_fields[0]} IN ({placeholders})"
+            else:
+                params = {}
+                row_placeholders = []
+                for index, key in enumerate(chunk):
+                    placeholders, key_params = db_utils.build_in_clause(key, f"k{index}_")
+                    row_placeholders.append(f"({placeholders})")
+                    params.update(key_params)
+                where_stmt = f"({', '.join(key_fields)}) IN ({', '.join(row_placeholders)})"
+
+            stmt = f"SELECT id, {', '.join(key_fields)} FROM {self.TABLE} WHERE {where_stmt} ORDER BY id"
+            self.log.debug(f"Executing stmt {stmt} for {len(chunk)} keys")
+            cursor.execute(stmt, params)
+            rows = [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()]
+            row_key = (lambda row : row[1]) if len(key_fields) == 1 else (lambda row : tuple(row[1:]))
+            for key, matches in db_utils.match_requested(chunk, rows, row_key).items():
+                ids[key] = matches[-1][0]
+        return ids
+
+    def _is_closure_edge_table(self, assoc):
+        return lineage_closure.LineageClosure.enabled_for(self) and assoc['table'] == self.SELF_JOIN_TABLE['table']
 
-        # Close the SQL statement
-        stmt = f"{ins_stmt} ) {val_stmt} )"
-        return stmt, data
-    
     def _delete_assoc(self, assoc, key_field, value, cursor):
 
+        if self._is_closure_edge_table(assoc):
+            # Collect the children of the edges about to go so their lineage can be recomputed
+            child_field = self.SELF_JOIN_TABLE['child_field']
+            stmt = f"SELECT {child_field} FROM {assoc['table']} WHERE {key_field} = %({key_field})s"
+            cursor.execute(stmt, {key_field : value})
+            child_ids = [row[child_field] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
         stmt = f"DELETE FROM {assoc['table']} WHERE {key_field} = %({key_field})s"
         self.log.debug(f"Deleting {assoc['table']} records where {key_field} = {value}")
         cursor.execute(stmt, {key_field : value})
 
+        if self._is_closure_edge_table(assoc) and child_ids:
+            lineage_closure.LineageClosure(self).refresh_descendants(child_ids, cursor)
+
     def _create_assoc(self, assoc, values, cursor):
         # """
         # Create an association entry in table assoc['table'] with columns assoc['cols']
@@ -428,6 +962,163 @@ class Base(object):
         self.log.debug(f"Executing stmt {stmt} with values {values}")
         cursor.execute(stmt, values)
 
+        if self._is_closure_edge_table(assoc):
+            lineage_closure.LineageClosure(self).add_edge(values[self.SELF_JOIN_TABLE['parent_field']], values[self.SELF_JOIN_TABLE['child_field']], cursor)
+
+    def _create_assocs(self, assoc, values_list, cursor, chunk_size=db_utils.INSERT_CHUNK_SIZE):
+        """
+        Bulk form of _create_assoc(): rows with the same columns are written with one
+        executemany() per chunk_size rows. Called inside an existing transaction; the caller commits.
+
+        :param assoc: a dict containing the table name and columns
+        :param values_list: a list of dicts containing the column names and values to be inserted
+        :param cursor: An cursor object on the connection.
+        """
+        groups = {}
+        for values in values_list:
+            cols = tuple(c for c in assoc['cols'] if c in values)
+            groups.setdefault(cols, []).append(values)
+
+        for cols, group in groups.items():
+            stmt = f"INSERT INTO {assoc['table']} ({','.join(['`' + c + '`' for c in cols])}) VALUES ({', '.join(['%s'] * len(cols))})"
+            for chunk in db_utils.chunked(group, chunk_size):
+                self.log.debug(f"Executing stmt {stmt} for {len(chunk)} rows")
+                cursor.executemany(stmt, [tuple(values[c] for c in cols) for values in chunk])
+
+        if self._is_closure_edge_table(assoc):
+            closure = lineage_closure.LineageClosure(self)
+            for values in values_list:
+                closure.add_edge(values[self.SELF_JOIN_TABLE['parent_field']], values[self.SELF_JOIN_TABLE['child_field']], cursor)
+
+    def _create_assocs_for(self, records, record_ids, cursor, chunk_size, *lookups):
+        """
+        Write the association rows of a batch of records with _create_assocs(), one table at a time
+
+        :param records: dicts that each represent an entity, as passed to the add_*s() bulk loaders
+        :param record_ids: The internal id of each record, in the same order
+        :param lookups: Extra arguments for the class's _assoc_values(), e.g. names resolved once per batch
+        """
+        assoc_values = {}
+        for record, record_id in zip(records, record_ids):
+            for assoc, values_list in self._assoc_values(record, record_id, *lookups).items():
+                assoc_values.setdefault(assoc, []).extend(values_list)
+        for assoc, values_list in assoc_values.items():
+            self._create_assocs(self.ASSOCIATIONS[assoc], values_list, cursor, chunk_size)
+
+    def _owner_col(self, assoc):
+        """
+        The column of an association table that holds the id of the record owning the row.
+        That's the id_col unless the association sets 'owner_col', e.g. file_parents rows are
+        owned by the child file but joined on parent_file_id.
+        """
+        details = self.ASSOCIATIONS[assoc]
+        return details.get('owner_col', details['id_col'])
+
+    def _sync_associations(self, records, record_ids, assoc_names, cursor, chunk_size=db_utils.INSERT_CHUNK_SIZE, *lookups):
+        """
+        Make the association rows of existing records match the lists given in records, writing
+        only the difference. Instead of delete_before_insert's wipe and re-insert, the current rows
+        of the whole batch are read with one query per chunk of ids, both sides are compared as
+        multisets (values equal as in compare_to()) and only surplus rows are deleted and missing
+        rows inserted. Called inside an existing transaction; the caller commits.
+
+        An association is only synced for records that contain its key; an empty list removes all
+        of the record's rows. Only the columns supplied in the new rows are compared.
+
+        :param records: dicts that each represent an entity
+        :param record_ids: The internal id of each record, in the same order
+        :param assoc_names: The associations to sync, e.g. ['attributes']
+        :param lookups: Extra arguments for the class's _assoc_values()
+
+        :return: a tuple of a dict of association name to {'inserted' : n, 'deleted' : n}, and the
+            set of record ids whose rows changed
+        """
+        if not all(assoc in self.ASSOCIATIONS for assoc in assoc_names):
+            raise ValueError(f"Expected only the following associations {list(self.ASSOCIATIONS.keys())}, but recieved {assoc_names}")
+
+        counts = {}
+        changed_ids = set()
+        assoc_values = [self._assoc_values(record, record_id, *lookups) for record, record_id in zip(records, record_ids)]
+
+        for assoc in assoc_names:
+            details = self.ASSOCIATIONS[assoc]
+            owner_col = self._owner_col(assoc)
+            counts[assoc] = {"inserted" : 0, "deleted" : 0}
+
+            desired = {}
+            for record, record_id, values in zip(records, record_ids, assoc_values):
+                if assoc in record:
+                    desired[record_id] = values.get(assoc, [])
+            if not desired:
+                continue
+
+            cols = [c for c in details['cols'] if c != owner_col and any(c in v for rows in desired.values() for v in rows)]
+            select_cols = [owner_col] + cols
+
+            # owner id -> comparable row -> the rows as stored
+            current = {}
+            for chunk in db_utils.chunked(list(desired.keys())):
+                placeholders, params = db_utils.build_in_clause(chunk)
+                stmt = f"SELECT {', '.join(['`' + c + '`' for c in select_cols])} FROM {details['table']} WHERE {owner_col} IN ({placeholders})"
+                self.log.debug(f"Executing stmt {stmt} for {len(chunk)} ids")
+                cursor.execute(stmt, params)
+                for row in cursor.fetchall():
+                    row = tuple(row[c] for c in select_cols) if isinstance(row, dict) else tuple(row)
+                    current.setdefault(row[0], {}).setdefault(tuple(_comparable(v) for v in row[1:]), []).append(row[1:])
+
+            deletes = []
+            inserts = []
+            for record_id, rows in desired.items():
+                stored = current.get(record_id, {})
+                wanted = Counter()
+                for values in rows:
+                    key = tuple(_comparable(values.get(c)) for c in cols)
+                    wanted[key] += 1
+                    if wanted[key] > len(stored.get(key, [])):
+                        inserts.append(values)
+                        changed_ids.add(record_id)
+                for key, stored_rows in stored.items():
+                    surplus = len(stored_rows) - wanted[key]
+                    if surplus > 0:
+                        deletes.append((record_id, stored_rows[0], surplus))
+                        changed_ids.add(record_id)
+
+            if deletes:
+                where_stmt = " AND ".join([f"{owner_col} = %s"] + [f"`{c}` <=> %s" for c in cols])
+                for record_id, stored_row, surplus in deletes:
+                    stmt = f"DELETE FROM {details['table']} WHERE {where_stmt} LIMIT {int(surplus)}"
+                    self.log.debug(f"Executing stmt {stmt} with values {(record_id,) + stored_row}")
+                    cursor.execute(stmt, (record_id,) + stored_row)
+                    counts[assoc]["deleted"] += surplus
+
+                if self._is_closure_edge_table(details):
+                    child_field = self.SELF_JOIN_TABLE['child_field']
+                    child_ids = [record_id if child_field == owner_col else stored_row[cols.index(child_field)] for record_id, stored_row, surplus in deletes]
+                    lineage_closure.LineageClosure(self).refresh_descendants(child_ids, cursor)
+
+            if inserts:
+                self._create_assocs(details, inserts, cursor, chunk_size)
+                counts[assoc]["inserted"] = len(inserts)
+
+        self.log.debug(f"Synced associations of {self.TABLE}: {counts}")
+        return counts, changed_ids
+
+    def _sync_upserted(self, records, key_field, report, sync, cursor, chunk_size, *lookups):
+        """
+        Run _sync_associations() over the records an _upsert_rows() call found already existing,
+        moving those whose association rows changed from 'untouched' to 'changed' and adding the
+        per-association counts to report under 'associations'
+        """
+        existing = [record for record in records if record[key_field] not in report["inserted"]]
+        record_ids = [report["changed"].get(record[key_field]) or report["untouched"][record[key_field]] for record in existing]
+        counts, changed_ids = self._sync_associations(existing, record_ids, sync, cursor, chunk_size, *lookups)
+
+        for key, record_id in list(report["untouched"].items()):
+            if record_id in changed_ids:
+                report["changed"][key] = report["untouched"].pop(key)
+        report["associations"] = counts
+        return report
+
     def compare_to(self, params:dict):
         """
         This function compares this instance (self) vs a dictionary that represents 
@@ -459,26 +1150,7 @@ class Base(object):
                 continue
 
             if type(param_value) != type(self_value):
-                if isinstance(self_value, datetime) and isinstance(param_value, str):
-                    if self_value.strftime('%F %T.%f') != param_value:
-                        diffs[field] = { 
-                            "arg" : param_value, 
-                            "db" : self_value
-                        }
-                elif (isinstance(self_value, str) != isinstance(param_value, str)): # if one is an str and the other isn't
-                    if not isinstance(param_value, str): # if the param_value isn't a string
-                        if str(param_value) != self_value:  # see if the two are still unequal after converting param to a string
-                            diffs[field] = { 
-                                "arg" : param_value, 
-                                "db" : self_value
-                            }
-                    else: # if the db value isn't a string
-                        if str(self_value) != param_value: # see if the two are still unequal after converting db value to a string
-                            diffs[field] = { 
-                                "arg" : param_value, 
-                                "db" : self_value
-                            }
-                else:
+                if not _values_equal(param_value, self_value):
                     diffs[field] = { 
                         "arg" : param_value, 
                         "db" : self_value
@@ -571,38 +1243,70 @@ class Base(object):
         return None
 
 
-    def delete(self):
+    def _delete_tables(self):
         """
-        Used to delete a record and associated records in related tables.
+        The association tables holding rows owned by this class's records, in the order they are
+        cleared by delete_many(), each with the columns that hold the record's id. Associations
+        that go through a column of the main table (assoc_id_col) point at shared reference data
+        and are left alone; edges of a SELF_JOIN_TABLE are removed in both directions.
+        """
+        tables = {}
+        for assoc, details in getattr(self, "ASSOCIATIONS", {}).items():
+            if "assoc_id_col" in details:
+                continue
+            cols = tables.setdefault(details['table'], [])
+            if self._owner_col(assoc) not in cols:
+                cols.append(self._owner_col(assoc))
+
+        if hasattr(self, "SELF_JOIN_TABLE"):
+            cols = tables.setdefault(self.SELF_JOIN_TABLE['table'], [])
+            for field in (self.SELF_JOIN_TABLE['parent_field'], self.SELF_JOIN_TABLE['child_field']):
+                if field not in cols:
+                    cols.append(field)
+        return tables
+
+    def delete_many(self, ids:list, dry_run=False, chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE):
+        """
+        Delete the records with the given ids and the association rows they own, in one
+        transaction. Each table is cleared with one DELETE per chunk_size ids, association
+        tables first and the main table last so that foreign keys are never left dangling.
 
-        Parameters: None
-        Returns: None
+        Parameters:
+            ids (list): Internal ids of the records to delete
+            dry_run (bool): Only count the rows that would be deleted; nothing is written
+            chunk_size (int): Ids per IN list
+
+        Returns:
+            A dict of table name to the number of rows deleted (or that would be)
         """
-        
         mysql_cnx = None
 
-        if not self.id:
-            raise Exception("Instance does not have required attribute set: 'id'")
+        ids = list(dict.fromkeys(ids))
         try:
-
-
             mysql_cnx = self.db.get_db_connection()
             cursor = mysql_cnx.cursor()
 
-            for assoc_name in self.ASSOCIATIONS:
-                assoc_details = self.ASSOCIATIONS[assoc_name]
-                stmt = f"DELETE FROM {assoc_details['table']} WHERE {assoc_details['id_col']} = %({assoc_details['id_col']})s"
-                self.log.debug(f"Executing stmt: {stmt} with value = {self.id}")
-                cursor.execute(stmt, {f"{assoc_details['id_col']}" : self.id})
-            
-            stmt = f"DELETE FROM {self.TABLE} WHERE id = %(id)s"
-            self.log.debug(f"Executing stmt: {stmt} with id: {self.id}")
-            cursor.execute(stmt, {"id" : self.id})
+            counts = {}
+            for table_name, cols in self._delete_tables().items():
+                counts[table_name] = self.db._delete_where_in(cursor, table_name, cols, ids, dry_run, chunk_size)
+            counts[self.TABLE] = self.db._delete_where_in(cursor, self.TABLE, ["id"], ids, dry_run, chunk_size)
+
+            if dry_run:
+                self.log.debug(f"Dry run of delete_many() for {len(ids)} {self.TABLE} records: {counts}")
+                return counts
+
+            if lineage_closure.LineageClosure.enabled_for(self):
+                lineage_closure.LineageClosure(self).remove_nodes(ids, cursor)
+
             mysql_cnx.commit()
+            db_utils.invalidate_cache(self.TABLE)
+            self.log.debug(f"Deleted {len(ids)} {self.TABLE} records: {counts}")
+            return counts
 
         except Exception as error:
-            mysql_cnx.rollback()
-            self.log.error("Failed in delete() {}".format(error), exc_info=sys.exc_info())
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in delete_many() {}".format(error), exc_info=sys.exc_info())
             raise error
         finally:
             try:
@@ -610,6 +1314,17 @@ class Base(object):
             except Exception as error:
                 raise error
 
+    def delete(self):
+        """
+        Used to delete a record and associated records in related tables.
+
+        Parameters: None
+        Returns: None
+        """
+        if not self.id:
+            raise Exception("Instance does not have required attribute set: 'id'")
+        self.delete_many([self.id])
+
 
     def _breadth_first_search(self, find_ancestors:bool, flatten_results:bool):
         """
@@ -635,32 +1350,30 @@ class Base(object):
         mysql_cnx = None
 
         try:
-            child = self.ctype(self.log)
-
-            if not hasattr(child, "SELF_JOIN_TABLE"):
+            if not hasattr(self, "SELF_JOIN_TABLE"):
                 raise NotImplementedError(f"The SELF_JOIN_TABLE attribute has not been set up for {self.ctype}")
 
             record_id = self.id
 
-            visited = [record_id]
-            queue = [(record_id, 0)]
+            visited = {record_id}
+            queue = deque([(record_id, 0)])
 
             mysql_cnx = self.db.get_db_connection()
             
-            self_join_table = child.SELF_JOIN_TABLE['table']
+            self_join_table = self.SELF_JOIN_TABLE['table']
             if find_ancestors:
-                next_node_field = child.SELF_JOIN_TABLE['parent_field']
-                this_node_field = child.SELF_JOIN_TABLE['child_field']
+                next_node_field = self.SELF_JOIN_TABLE['parent_field']
+                this_node_field = self.SELF_JOIN_TABLE['child_field']
             else:
-                next_node_field = child.SELF_JOIN_TABLE['child_field']
-                this_node_field = child.SELF_JOIN_TABLE['parent_field']
+                next_node_field = self.SELF_JOIN_TABLE['child_field']
+                this_node_field = self.SELF_JOIN_TABLE['parent_field']
 
             cursor = mysql_cnx.cursor(dictionary=True)
             stmt = f"SELECT {next_node_field} from {self_join_table} where {this_node_field} = %(id)s"
 
             results = []
             while queue:
-                next_id, level = queue.pop(0)
+                next_id, level = queue.popleft()
                 params = { "id" : next_id }
                 self.log.debug(f"Executing stmt: {stmt} with params {params}")
                 cursor.execute(stmt, params)
@@ -668,7 +1381,7 @@ class Base(object):
                 for row in cursor.fetchall():
                     next_node_id = row[next_node_field]
                     if next_node_id not in visited:
-                        visited.append(next_node_id)
+                        visited.add(next_node_id)
                         queue.append((next_node_id, level+1))
                         if len(results) < level+1:
                             results.append([])
@@ -689,13 +1402,201 @@ class Base(object):
                 raise error
 
 
+    def _recursive_cte_search(self, find_ancestors:bool, flatten_results:bool):
+        """
+        Same contract as _breadth_first_search(), but resolves every ancestor/descendant and
+        its level with a single WITH RECURSIVE query instead of one SELECT per visited node.
+
+        A node reachable by several paths is reported at its shortest distance, which is the
+        level the BFS would first discover it at. Nodes within a level are ordered by id.
+        Raises mysql.connector.errors.ProgrammingError on servers without CTE support.
+        """
+        mysql_cnx = None
+
+        try:
+            if not hasattr(self, "SELF_JOIN_TABLE"):
+                raise NotImplementedError(f"The SELF_JOIN_TABLE attribute has not been set up for {self.ctype}")
+
+            self_join_table = self.SELF_JOIN_TABLE['table']
+            if find_ancestors:
+                next_node_field = self.SELF_JOIN_TABLE['parent_field']
+                this_node_field = self.SELF_JOIN_TABLE['child_field']
+            else:
+                next_node_field = self.SELF_JOIN_TABLE['child_field']
+                this_node_field = self.SELF_JOIN_TABLE['parent_field']
+
+            # MySQL can't aggregate inside the recursive step, so rows can't be deduplicated on
+            # the node alone without losing its depth. UNION (rather than UNION ALL) keeps one row
+            # per (node, depth) instead, and the max_depth bound caps the CTE at max_depth rows per
+            # reachable node, however many paths lead to it, and ends it if the edge table ever
+            # contains a cycle. MIN(depth) below then keeps each node once, at its shortest distance.
+            stmt = f"""
+                WITH RECURSIVE lineage (node_id, depth) AS (
+                    SELECT {next_node_field}, 1
+                    FROM {self_join_table}
+                    WHERE {this_node_field} = %(id)s
+                    UNION
+                    SELECT edge.{next_node_field}, lineage.depth + 1
+                    FROM {self_join_table} edge
+                    JOIN lineage ON edge.{this_node_field} = lineage.node_id
+                    WHERE lineage.depth < %(max_depth)s
+                )
+                SELECT node_id, MIN(depth) AS depth
+                FROM lineage
+                WHERE node_id <> %(id)s
+                GROUP BY node_id
+                ORDER BY depth, node_id
+            """
+            params = { "id" : self.id, "max_depth" : LINEAGE_MAX_DEPTH }
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor(dictionary=True)
+            self.log.debug(f"Executing stmt: {stmt} with params {params}")
+            cursor.execute(stmt, params)
+
+            results = []
+            for row in cursor.fetchall():
+                level = row["depth"] - 1
+                while len(results) < level + 1:
+                    results.append([])
+                results[level].append(row["node_id"])
+
+            if len(results) >= LINEAGE_MAX_DEPTH:
+                self.log.warning(f"Lineage of {self.TABLE} {self.id} reached the maximum depth of {LINEAGE_MAX_DEPTH} and may be truncated")
+
+            if flatten_results:
+                return list(itertools.chain.from_iterable(results))
+            return results
+
+        except Exception as error:
+            self.log.error("Failed in _recursive_cte_search() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def _lineage_search(self, find_ancestors:bool, flatten_results:bool):
+        global _cte_supported
+
+        if lineage_closure.LineageClosure.enabled_for(self):
+            return lineage_closure.LineageClosure(self).get_lineage([self.id], find_ancestors, flatten_results)[self.id]
+
+        if LINEAGE_ENGINE == "cte" and _cte_supported:
+            try:
+                return self._recursive_cte_search(find_ancestors, flatten_results)
+            except mysql.connector.errors.ProgrammingError as error:
+                if not _is_cte_unsupported(error):
+                    raise error
+                self.log.warning(f"Recursive CTEs not supported by this server ({error}). Falling back to breadth-first search.")
+                _cte_supported = False
+        return self._breadth_first_search(find_ancestors, flatten_results)
+
+    def _batched_lineage_search(self, record_ids:list, find_ancestors:bool, flatten_results:bool, cursor=None):
+        """
+        Lineage for many records at once. Rather than searching from each record in turn, the
+        graph is walked one frontier at a time: every node that any of the searches reaches
+        next is looked up together in chunked IN (...) queries, and the edges found are shared
+        by all searches. The cost is roughly one query per level (per IN_CLAUSE_CHUNK_SIZE
+        nodes) no matter how many records were asked for.
+
+        :param: record_ids (list): IDs of the records to search from
+        :param: find_ancestors (bool): If True, will search 'up' the tree via parents; if False will search 'down' the tree via children
+        :param: flatten_results (bool): Will return each record's ancestors as a single list if True
+        :param: cursor: An optional cursor to search with, so that edges written but not yet committed on it are seen
+
+        :return: a dict of record ID to the same levelled (or flattened) list _breadth_first_search() returns
+        """
+        mysql_cnx = None
+
+        try:
+            if not hasattr(self, "SELF_JOIN_TABLE"):
+                raise NotImplementedError(f"The SELF_JOIN_TABLE attribute has not been set up for {self.ctype}")
+
+            self_join_table = self.SELF_JOIN_TABLE['table']
+            if find_ancestors:
+                next_node_field = self.SELF_JOIN_TABLE['parent_field']
+                this_node_field = self.SELF_JOIN_TABLE['child_field']
+            else:
+                next_node_field = self.SELF_JOIN_TABLE['child_field']
+                this_node_field = self.SELF_JOIN_TABLE['parent_field']
+
+            record_ids = list(dict.fromkeys(record_ids))
+
+            # Per record: the nodes seen so far, the current frontier and the levelled results
+            visited = {record_id : {record_id} for record_id in record_ids}
+            frontiers = {record_id : [record_id] for record_id in record_ids}
+            results = {record_id : [] for record_id in record_ids}
+
+            # Memoised adjacency: node ID -> list of next node IDs
+            edges = {}
+
+            if cursor is None:
+                mysql_cnx = self.db.get_db_connection()
+                cursor = mysql_cnx.cursor(dictionary=True)
+
+            while frontiers:
+                unexplored = {node for frontier in frontiers.values() for node in frontier if node not in edges}
+                for chunk in db_utils.chunked(sorted(unexplored)):
+                    placeholders, params = db_utils.build_in_clause(chunk)
+                    stmt = f"SELECT {this_node_field}, {next_node_field} FROM {self_join_table} WHERE {this_node_field} IN ({placeholders})"
+                    self.log.debug(f"Executing stmt: {stmt} with {len(chunk)} ids")
+                    cursor.execute(stmt, params)
+
+                    for node in chunk:
+                        edges[node] = []
+                    for row in cursor.fetchall():
+                        # The caller's cursor may return tuples rather than dicts
+                        this_node_id, next_node_id = (row[this_node_field], row[next_node_field]) if isinstance(row, dict) else row
+                        edges[this_node_id].append(next_node_id)
+
+                next_frontiers = {}
+                for record_id, frontier in frontiers.items():
+                    level = []
+                    for node in frontier:
+                        for next_node_id in edges[node]:
+                            if next_node_id not in visited[record_id]:
+                                visited[record_id].add(next_node_id)
+                                level.append(next_node_id)
+                    if level:
+                        results[record_id].append(level)
+                        next_frontiers[record_id] = level
+                frontiers = next_frontiers
+
+            if flatten_results:
+                return {record_id : list(itertools.chain.from_iterable(levels)) for record_id, levels in results.items()}
+            return results
+
+        except Exception as error:
+            self.log.error("Failed in _batched_lineage_search() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def _lineage_search_for(self, record_ids:list, find_ancestors:bool, flatten_results:bool):
+        if lineage_closure.LineageClosure.enabled_for(self):
+            return lineage_closure.LineageClosure(self).get_lineage(record_ids, find_ancestors, flatten_results)
+        return self._batched_lineage_search(record_ids, find_ancestors, flatten_results)
+
+    def _get_ancestors_for(self, record_ids:list, flatten_results=False):
+        search_upwards = True
+        return self._lineage_search_for(record_ids, search_upwards, flatten_results)
+
+    def _get_descendants_for(self, record_ids:list, flatten_results=False):
+        search_upwards = False
+        return self._lineage_search_for(record_ids, search_upwards, flatten_results)
+
     def _get_ancestors(self, flatten_results=False):
         search_upwards = True
-        return self._breadth_first_search(search_upwards, flatten_results)
+        return self._lineage_search(search_upwards, flatten_results)
     
     def _get_descendant(self, flatten_results=False):
         search_upwards = False
-        return self._breadth_first_search(search_upwards, flatten_results)
+        return self._lineage_search(search_upwards, flatten_results)
 
     @property
     def date_added(self):
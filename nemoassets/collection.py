@@ -1,17 +1,32 @@
-import mysql.connector
-import time
 import sys
-import os
-import traceback
-import getpass
-from datetime import datetime, timedelta, date
-import config, db_utils, project, subject, file, sample, contributor
+import mysql.connector
+import db_utils
+import base
+from base import Base
+
+
+class _LazyAssociation():
+    """
+    Stands in for an association property of Collection until its value is known. A loaded (or assigned)
+    value is kept in the instance __dict__ under the association's name, which takes precedence over this
+    descriptor, so __get__ is only reached while the association is unloaded. It then reads the association
+    from the DB for a collection that came from there, or returns an empty value for one built in memory.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if instance._read_from_db:
+            return instance._lazy_association(self.name)
+        return instance._empty_association(self.name)
 
-conf = config.Config.get_config()
 
-class Collection:   
+class Collection(Base):
     """
-    The collection class models a collection of objects of a particular type (subject, sample, file), or of sub-collections and has the following 
+    The collection class models a collection of objects of a particular type (subject, sample, file), or of sub-collections and has the following
     properties.
 
         id: Unique numeric ID assigned by database - Integer
@@ -19,9 +34,9 @@ class Collection:
         col_type: Collection type, i.e., files, samples, subjects - String (required)
         is_static: Flag to indicate if this is a static collection. Values can be 0 or 1 - Integer
         short_name: Collection short name - String (required)
-        name: Long collection name - String 
+        name: Long collection name - String
         description: Collection description - String
-        access: A string identifying if the collection has open or controlled access - String 
+        access: A string identifying if the collection has open or controlled access - String
         license: A string identifying the license associated with this collection - String
         is_published: Flag to indicate if this collection is associated with a publication. Values can be 0 or 1 - Integer
         doi: A DataCite digital object identifier (DOI) if one is issued for this collection. - String
@@ -29,455 +44,207 @@ class Collection:
         url_knowledgebase: URL for any associated knowledgebase entry - String
         url_protocol: URL for any associated protocol entry - String
         publication: Information about the publication associated with this collection - Dictionary
-        entity_urls: URL associated with entity - Dictionary
-
-        projects: A list of projects specified by short name, associated with this collection - List    
-        attributes: A dictionary of key/value pairs of attributes that are associated with this collection - Dictionary    
-        contributors: A list of contributors, specified by email addresses, associated with this collection - List    
-        subjects: A list of subject_names associated with this collection - List    
-        samples: A list of sample_names associated with this collection - List    
-        files: A list of file_names associated with this collection - List    
-        anatomies: A list of anatomies_names associated with this collection - List    
-        taxonomies: A list of taxonomies, specified by common names, associated with this collection - List    
-        modalities: A list of modalities, specified by term name such as epigenome, whole genome, transcriptome, multiome, associated with this collection - List    
-        assays: A list of assays, specified by a controlled list that include transcriptome, chromatin, mythylome, etc., associated with this collection - List    
-        techniques: A list of specific techniques, such as 10xMultiome_ATACseq, 10XChromium_3', etc., associated with this collection - List    
+        entity_urls: URLs associated with entity - List of dictionaries
+
+        projects: A list of projects specified by short name, associated with this collection - List
+        attributes: A dictionary of key/value pairs of attributes that are associated with this collection - Dictionary
+        contributors: A list of contributors, specified by email addresses, associated with this collection - List
+        subjects: A list of subject_names associated with this collection - List
+        samples: A list of sample_names associated with this collection - List
+        files: A list of file_names associated with this collection - List
+        anatomies: A list of anatomies_names associated with this collection - List
+        taxonomies: A list of taxonomies, specified by common names, associated with this collection - List
+        modalities: A list of modalities, specified by term name such as epigenome, whole genome, transcriptome, multiome, associated with this collection - List
+        assays: A list of assays, specified by a controlled list that include transcriptome, chromatin, mythylome, etc., associated with this collection - List
+        techniques: A list of specific techniques, such as 10xMultiome_ATACseq, 10XChromium_3', etc., associated with this collection - List
         data_use_limitations: A list of associated ids from the data_use_limitation table
-        child_collections: A list of child collections associated with this collection if any - List    
+        child_collections: A list of child collections associated with this collection if any - List
         date_added: Date and time record was created. Assigned by the database - Datetime
-    """
-
-    def __init__(self, log, params={}):   
-        self.log = log
-        self.db = db_utils.Db(log)
-
-        self._read_from_db = 0
-
-        if "id" in params:
-            self.id = params["id"]
-        else:
-            self.id = None
-
-        if "col_type" in params:
-            self.col_type = params["col_type"]
-        else:
-            self.col_type = None
-
-        if "col_id" in params:
-            self.col_id = params["col_id"]
-        else:
-            self.col_id = None
-
-        if "is_static" in params:
-            self.is_static = params["is_static"]
-        else:
-            self.is_static = None
-
-        if "short_name" in params:
-            self.short_name = params["short_name"]
-        else:
-            self.short_name = None
-
-        if "name" in params:
-            self.name = params["name"]
-        else:
-            self.name = None
-
-        if "description" in params:
-            self.description = params["description"]
-        else:
-            self.description = None
-
-        if "access" in params:
-            self.access = params["access"]
-        else:
-            self.access = None
-
-        if "is_published" in params:
-            self.is_published = params["is_published"]
-        else:
-            self.is_published = None
-
-        if "license" in params:
-            self.license = params["license"]
-        else:
-            self.license = None
-
-        if "doi" in params:
-            self.doi = params["doi"]
-        else:
-            self.doi = None
-
-        if "submission_status" in params:
-            self.submission_status = params["submission_status"]
-        else:
-            self.submission_status = None
-
-        if "url_protocol" in params:
-            self.url_protocol = params["url_protocol"]
-        else:
-            self.url_protocol = None
-
-        if "url_knowledgebase" in params:
-            self.url_knowledgebase = params["url_knowledgebase"]
-        else:
-            self.url_knowledgebase = None
-
-        if "attributes" in params:
-            self.attributes = params["attributes"]
-        else:
-            self.attributes = {}
-
-        if "child_collections" in params:
-            self.child_collections = params["child_collections"]
-        else:
-            self.child_collections = {}
-
-        if "subjects" in params:
-            self.subjects = params["subjects"]
-        else:
-            self.subjects = []
-
-        if "files" in params:
-            self.files = params["files"]
-        else:
-            self.files = []
-
-        if "samples" in params:
-            self.samples = params["samples"]
-        else:
-            self.samples = []
-
-        if "contributors" in params:
-            self.contributors = params["contributors"]
-        else:
-            self.contributors = []
-
-        if "anatomies" in params:
-            self.anatomies = params["anatomies"]
-        else:
-            self.anatomies = []
-
-        if "taxonomies" in params:
-            self.taxonomies = params["taxonomies"]
-        else:
-            self.taxonomies = []
-
-        if "modalities" in params:
-            self.modalities = params["modalities"]
-        else:
-            self.modalities = []
-
-        if "assays" in params:
-            self.assays = params["assays"]
-        else:
-            self.assays = []
-
-        if "techniques" in params:
-            self.techniques = params["techniques"]
-        else:
-            self.techniques = []
-
-        if "projects" in params:
-            self.projects = params["projects"]
-        else:
-            self.projects = []
-
-        if "publication" in params:
-            self.publication = params["publication"]
-        else:
-            self.publication = None
-            
-        if "entity_urls" in params:
-            self.entity_urls = params["entity_urls"]
-        else:
-            self.entity_urls = None
-        
-        if "data_use_limitations" in params:
-            self._data_use_limitations = params["data_use_limitations"]
-        else:
-            self._data_use_limitations = None
-
-        if "date_added" in params:
-            self.date_added = params["date_added"]
-        else:
-            self.date_added = None
-
-
-    @property
-    def date_added(self):
-        return self._date_added
-
-    @date_added.setter
-    def date_added(self, value):
-        if value:
-            if isinstance(value, str):
-                self._date_added = date.fromisoformat(value)
-            else:
-                self._date_added = value
-        else:
-            self._date_added = value
-
-    @property
-    def attributes(self):
-        if self._read_from_db:
-            self.log.debug("Reading attributes associated with this collection from DB.")
-
-            try:
-                self._attributes = self._read_attribute_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_attribute_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._attributes
-
-    @attributes.setter
-    def attributes(self, value):
-        self._attributes = value
-
-    @property
-    def child_collections(self):
-        if self._read_from_db:
-            self.log.debug("Reading child collections associated with this collection from DB.")
-
-            try:
-                self._child_collections = self._read_child_collection_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_child_collection_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._child_collections
-
-    @child_collections.setter
-    def child_collections(self, value):
-        self._child_collections = value
-
-    @property
-    def subjects(self):
-        if self._read_from_db:
-            self.log.debug("Reading subjects associated with this collection from DB.")
-
-            try:
-                self._subjects = self._read_subject_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_subject_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._subjects
-
-    @subjects.setter
-    def subjects(self, value):
-        self._subjects = value
-
-    @property
-    def files(self):
-        if self._read_from_db:
-            self.log.debug("Reading files associated with this collection from DB.")
-
-            try:
-                self._files = self._read_file_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_file_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._files
-
-    @files.setter
-    def files(self, value):
-        self._files = value
-
-    @property
-    def samples(self):
-        if self._read_from_db:
-            self.log.debug("Reading samples associated with this collection from DB.")
-
-            try:
-                self._samples = self._read_sample_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_sample_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._samples
-
-    @samples.setter
-    def samples(self, value):
-        self._samples = value
-
-    @property
-    def contributors(self):
-        if self._read_from_db:
-            self.log.debug("Reading contributors associated with this collection from DB.")
-
-            try:
-                self._contributors = self._read_contributor_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_contributor_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._contributors
-
-    @contributors.setter
-    def contributors(self, value):
-        self._contributors = value
-
-    @property
-    def anatomies(self):
-        if self._read_from_db:
-            self.log.debug("Reading anatomies associated with this collection from DB.")
-
-            try:
-                self._anatomies = self._read_anatomy_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_anatomy_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._anatomies
-
-    @anatomies.setter
-    def anatomies(self, value):
-        self._anatomies = value
-
-    @property
-    def modalities(self):
-        if self._read_from_db:
-            self.log.debug("Reading modalities associated with this collection from DB.")
-
-            try:
-                self._modalities = self._read_modality_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_modality_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._modalities
-
-    @modalities.setter
-    def modalities(self, value):
-        self._modalities = value
-
-    @property
-    def assays(self):
-        if self._read_from_db:
-            self.log.debug("Reading assays associated with this collection from DB.")
-
-            try:
-                self._assays = self._read_assay_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_assay_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._assays
-
-    @assays.setter
-    def assays(self, value):
-        self._assays = value
-
-    @property
-    def techniques(self):
-        if self._read_from_db:
-            self.log.debug("Reading techniques associated with this collection from DB.")
-
-            try:
-                self._techniques = self._read_technique_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_technique_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._techniques
-
-    @techniques.setter
-    def techniques(self, value):
-        self._techniques = value
-
-    @property
-    def taxonomies(self):
-        self.log.debug(f"** _read_from_db is {self._read_from_db}")
-        if self._read_from_db:
-            self.log.debug("Reading taxonomies associated with this collection from DB.")
-
-            try:
-                self._taxonomies = self._read_taxonomy_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_taxonomy_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._taxonomies
-
-    @taxonomies.setter
-    def taxonomies(self, value):
-        self._taxonomies = value
-
-    @property
-    def projects(self):
-        if self._read_from_db:
-            self.log.debug("Reading projects associated with this collection from DB.")
-
-            try:
-                self._projects = self._read_project_associations(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_project_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._projects
-
-    @projects.setter
-    def projects(self, value):
-        self._projects = value
-
-    @property
-    def publication(self):
-        if self._read_from_db:
-            self.log.debug("Reading publication associated with this collection from DB.")
 
-            try:
-                self._publication = self._read_publication(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_publication() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._publication
-
-    @publication.setter
-    def publication(self, value):
-        self._publication = value
-        
-        
-    @property
-    def entity_urls(self):
-        if self._read_from_db:
-            self.log.debug("Reading entity urls associated with this collection from DB.")
-
-            try:
-                self._entity_urls = self._read_entity_urls(self.id)
-            except Exception as error:
-                self.log.error("Failed in _read_entity_urls() {}".format(error), exc_info=sys.exc_info())
-                raise error
-
-        return self._entity_urls
-
-    @entity_urls.setter
-    def entity_urls(self, value):
-        self._entity_urls = value
-
-    @property
-    def data_use_limitations(self):
-        if self._read_from_db:
-            self.log.debug("Reading data_use_limitations associated with this collection from DB.")
+    On a collection read from the database, each association property (attributes through child_collections)
+    is read on first access and then cached. The create_* functions invalidate the cached value they change;
+    use invalidate(name) or refresh() to pick up changes made elsewhere.
 
-            try:
-                self.log.debug("Assigning...")
-                self._data_use_limitations = self._read_dul_associations(self.id)
-                self.log.debug("Assigned")
-            except Exception as error:
-                self.log.error("Failed in _read_dul_associations() {}".format(error), exc_info=sys.exc_info())
-                raise error
-        
-        self.log.debug("Returning dul")
-        return self._data_use_limitations
+    As on the other models, the ref_join associations (files, subjects, projects, etc.) also have _raw / _all
+    accessors holding the internal ids of the associated records, e.g. collection.files_raw.
+    """
 
-    @data_use_limitations.setter
-    def data_use_limitations(self, value):
-        self._data_use_limitations = value
+    TABLE = "collection"
+
+    # Indicates which fields are required for this table
+    # Used for select and insert statements and validation
+    FIELDS = {"col_id" : True, "col_type" : True, "is_static" : True, "short_name" : True, "name" : False,
+              "description" : False, "access" : False, "license" : False, "is_published" : False, "doi" : False,
+              "submission_status" : False, "url_protocol" : False, "url_knowledgebase" : False, "date_added" : False}
+
+    # Values passed to add_collection() / the create_* functions for a ref_join association are the
+    # readable_field of the ref_table (e.g. file names) and are resolved to ids before inserting.
+    # child_collections joins the collection table to itself, so it can only be loaded with the
+    # "batched" association strategy, which is what the get_* functions of this class use.
+    ASSOCIATIONS = {
+        "attributes" : {
+            "table" : "collection_attributes",
+            "cols" : ["collection_id", "name", "value"],
+            "id_col" : "collection_id"
+        },
+        "child_collections" : {
+            "table" : "collection_has_collection",
+            "cols" : ["parent_collection_id", "child_collection_id"],
+            "id_col" : "parent_collection_id",
+            "ref_join" : {
+                "ref_table" : "collection",
+                "ref_field" : "child_collection_id",
+                "readable_field" : "col_id"
+            }
+        },
+        "subjects" : {
+            "table" : "subject_assoc_collection",
+            "cols" : ["collection_id", "subject_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "subject",
+                "ref_field" : "subject_id",
+                "readable_field" : "source_subject_id"
+            }
+        },
+        "files" : {
+            "table" : "file_in_collection",
+            "cols" : ["collection_id", "file_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "file",
+                "ref_field" : "file_id",
+                "readable_field" : "file_name" # not unique; names matching more than one file are rejected on insert
+            }
+        },
+        "samples" : {
+            "table" : "sample_assoc_collection",
+            "cols" : ["collection_id", "sample_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "sample",
+                "ref_field" : "sample_id",
+                "readable_field" : "source_sample_id"
+            }
+        },
+        "contributors" : {
+            "table" : "collection_has_contributor",
+            "cols" : ["collection_id", "contributor_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "contributor",
+                "ref_field" : "contributor_id",
+                "readable_field" : "email"
+            }
+        },
+        "anatomies" : {
+            "table" : "collection_assoc_anatomy",
+            "cols" : ["collection_id", "anatomy_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "anatomy",
+                "ref_field" : "anatomy_id",
+                "readable_field" : "short_name"
+            }
+        },
+        "taxonomies" : {
+            "table" : "collection_assoc_species",
+            "cols" : ["collection_id", "taxonomy_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "taxonomy",
+                "ref_field" : "taxonomy_id",
+                "readable_field" : "name"
+            }
+        },
+        "modalities" : {
+            "table" : "collection_assoc_modality",
+            "cols" : ["collection_id", "modality_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "modality",
+                "ref_field" : "modality_id",
+                "readable_field" : "name"
+            }
+        },
+        "assays" : {
+            "table" : "collection_assoc_assay",
+            "cols" : ["collection_id", "assay_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "assay",
+                "ref_field" : "assay_id",
+                "readable_field" : "name"
+            }
+        },
+        "techniques" : {
+            "table" : "collection_assoc_technique",
+            "cols" : ["collection_id", "technique_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "technique",
+                "ref_field" : "technique_id",
+                "readable_field" : "short_name"
+            }
+        },
+        "projects" : {
+            "table" : "collection_assoc_project",
+            "cols" : ["collection_id", "project_id"],
+            "id_col" : "collection_id",
+            "ref_join" : {
+                "ref_table" : "project",
+                "ref_field" : "project_id",
+                "readable_field" : "short_name" # grants and projects alike
+            }
+        },
+        "data_use_limitations" : {
+            "table" : "collection_has_data_use_condition",
+            "cols" : ["collection_id", "data_use_condition_duc_id"],
+            "id_col" : "collection_id"
+        },
+        "publication" : {
+            "table" : "publication",
+            "cols" : ["collection_id", "title", "pub_doi", "pub_year", "pubmed_id", "journal", "vol", "page", "pub_status"],
+            "id_col" : "collection_id",
+            "one_to_one" : True
+        },
+        "entity_urls" : {
+            "table" : "entity_has_urls",
+            "cols" : ["collection_id", "entity_type", "urls_type", "file_count", "size", "release", "url_readme"],
+            "id_col" : "collection_id"
+        }
+    }
+
+    SELF_JOIN_TABLE = {
+        "table" : "collection_has_collection",
+        "parent_field" : "parent_collection_id",
+        "child_field" : "child_collection_id"
+    }
+
+    # Tables holding rows owned by a collection that aren't read as associations; also cleared by delete_many()
+    DELETE_TABLES = {
+        "collection_defined_by_file" : ["collection_id"],
+        "collection_has_keywords" : ["collection_id"]
+    }
+
+    # Member associations that get_all_member_*() can expand through the collection tree
+    MEMBER_TYPES = ["files", "subjects", "samples"]
+
+    REQUIRED_PUBLICATION_KEYS = ["title", "pub_doi", "pub_year", "journal"]
+    REQUIRED_ENTITY_URL_KEYS = ["entity_type", "urls_type"]
+
+    # These are the fields allowed for use in the constructor; it includes associations
+    ATTRS = ["id"] + list(FIELDS.keys()) + list(ASSOCIATIONS.keys())
+
+    def __init__(self, log=None, params={}):
+        # Set before Base assigns the ATTRS; see _LazyAssociation
+        self._read_from_db = 0
+        super().__init__(log, Collection, params)
 
+        # Associations that weren't passed in are left unset so that they're read on first access
+        for name in self.ASSOCIATIONS:
+            if name not in params:
+                del vars(self)[name]
 
     def __str__(self):
 
@@ -485,1901 +252,711 @@ class Collection:
         mystr += f"Access: {self.access} License: {self.license} Published: {self.is_published} DOI: {self.doi}"
         return mystr
 
-    def get_all_collections(self):
-        """
-        Retrieve all collections from the database. 
-
-        :return: A list of collection objects initialized with the properties.
-        """
-
-        # This method implements lazy loading, so all associations are not loaded
-        # on creation, but loaded as needed.
-
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """ SELECT id, col_id, col_type, is_static, short_name, name, description, access, license,
-                            is_published, doi, submission_status, url_protocol, url_knowledgebase, date_added
-                        FROM collection
-                    """
-
-            self.log.debug("Executing stmt: " + stmt)
-            cursor.execute(stmt)
-
-            results = []
-            for row in cursor.fetchall():
-                col = {}
-                col["id"] = row[0]
-                col["col_id"] = row[1]
-                col["col_type"] = row[2]
-                col["is_static"] = row[3]
-                col["short_name"] = row[4]
-                col["name"] = row[5]
-                col["description"] = row[6]
-                col["access"] = row[7]
-                col["license"] = row[8]
-                col["is_published"] = row[9]
-                col["doi"] = row[10]
-                col["submission_status"] = row[11]
-                col["url_protocol"] = row[12]
-                col["url_knoweldgebase"] = row[13]
-                col["date_added"] = row[14]
-
-                results.append(Collection(self.log, col))
-
-            self.log.debug("Returning " + str(len(results)) + " results")
-            return results
-
-        except Exception as error:
-            self.log.error("Failed in get_all_collections() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def get_collection(self, col_id):
-        """
-        Read the collection from database using the asset identifier.
-
-        :param short_name: Collection asset identifier
-        :return: returns collection object
-        """
-        # This method implements lazy loading, so all associations are not loaded
-        # on creation, but loaded as needed.
-
-        mysql_cnx = None
-        self.log.debug(f"Fetching by collection ID: {col_id}")
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """ SELECT id, col_id, col_type, is_static, short_name, name, description, access, license,
-                            is_published, doi, submission_status, url_protocol, url_knowledgebase, date_added
-                        FROM collection
-                        WHERE col_id = %(col_id)s
-                    """
-
-            data = {'col_id': col_id}
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-
-            row = cursor.fetchone()
-            if row:
-                col = {}
-                col["id"] = row[0]
-                col["col_id"] = row[1]
-                col["col_type"] = row[2]
-                col["is_static"] = row[3]
-                col["short_name"] = row[4]
-                col["name"] = row[5]
-                col["description"] = row[6]
-                col["access"] = row[7]
-                col["license"] = row[8]
-                col["is_published"] = row[9]
-                col["doi"] = row[10]
-                col["submission_status"] = row[11]
-                col["url_protocol"] = row[12]
-                col["url_knoweldgebase"] = row[13]
-                col["date_added"] = row[14]
-
-                new_col = Collection(self.log, col)
-                new_col._read_from_db = 1
-                return new_col 
-            else:
-                return None
-
-        except Exception as error:
-            self.log.error("Failed in get_collection() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
+    def _empty_association(self, name):
+        details = self.ASSOCIATIONS[name]
+        if "ref_join" in details:
+            return {'human_readable' : [], 'raw' : []}
+        if name == "attributes" or details.get("one_to_one"):
+            return {}
+        return []
 
-    def get_collection_by_short_name(self, short_name):
+    def _add_assoc_value(self, instance, assoc_meta, row):
         """
-        Read the collection from database using the short name.
-
-        :param short_name: Collection short name
-        :return: returns collection object
+        Same as Base._add_assoc_value(), except that attributes are kept as a dict of name to value
+        rather than a list of rows
         """
-        # This method implements lazy loading, so all associations are not loaded
-        # on creation, but loaded as needed.
-
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """ SELECT id, col_id, col_type, is_static, short_name, name, description, access, license,
-                            is_published, doi, submission_status, url_protocol, url_knowledgebase, date_added
-                        FROM collection
-                        WHERE short_name = %(short_name)s
-                    """
+        if assoc_meta.name != "attributes":
+            return super()._add_assoc_value(instance, assoc_meta, row)
 
-            data = {'short_name': short_name}
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
+        # since we are left-joining, skip rows without an attribute
+        if row["collection_attributes.name"] is None:
+            return
 
-            row = cursor.fetchone()
-            if row:
-                col = {}
-                col["id"] = row[0]
-                col["col_id"] = row[1]
-                col["col_type"] = row[2]
-                col["is_static"] = row[3]
-                col["short_name"] = row[4]
-                col["name"] = row[5]
-                col["description"] = row[6]
-                col["access"] = row[7]
-                col["license"] = row[8]
-                col["is_published"] = row[9]
-                col["doi"] = row[10]
-                col["submission_status"] = row[11]
-                col["url_protocol"] = row[12]
-                col["url_knoweldgebase"] = row[13]
-                col["date_added"] = row[14]
-                
-                new_col = Collection(self.log, col)
-                new_col._read_from_db = 1
-                return new_col
-            
-            return None
+        attributes = getattr(instance, "attributes") or {}
+        attributes[row["collection_attributes.name"]] = row["collection_attributes.value"]
+        object.__setattr__(instance, "attributes", attributes)
 
-        except Exception as error:
-            self.log.error("Failed in get_collection_by_short_name() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-    
-    def add_collection(self, col ={}):
+    def _lazy_association(self, name):
         """
-        Creates a database entry for the collection whose properties are supplied as a dictinary.
-
-        :param col: A dictionary of the properties of this collection with the following keys
-
-            col_id: Unique alphanumeric collection identifier - String (required)
-            col_type: Collection type, i.e., files, samples, subjects - String (required)
-            is_static: Flag to indicate if this is a static collection. Values can be 0 or 1 - Integer
-            short_name: Collection short name - String (required)
-            name: Long collection name - String 
-            description: Collection description - String
-            access: A string identifying if the collection has open or controlled access - String 
-            license: A string identifying the license associated with this collection - String 
-            is_published: Flag to indicate if this collection is associated with a publication. Values can be 0 or 1 - Integer
-            doi: A DataCite digital object identifier (DOI) if one is issued for this collection. - String
-            submission_status: A controlled list of string indicating if the collection is growing. - String
-            url_knowledgebase: URL for any associated knowledgebase entry - String
-            url_protocol: URL for any associated protocol entry - String
-            publication: Information about the publication associated with this collection - Dictionary
-            entity_urls: URL associated with entity - String
-
-            projects: A list of projects specified by short name, associated with this collection - List    
-            attributes: A dictionary of key/value pairs of attributes that are associated with this collection - Dictionary    
-            contributors: A list of contributors, specified by email addresses, associated with this collection - List    
-            subjects: A list of subject_names associated with this collection - List    
-            samples: A list of sample_names associated with this collection - List    
-            files: * DEPRECATED: file_name not unique * A list of file_names associated with this collection - List    
-            anatomies: A list of anatomies_names associated with this collection - List    
-            taxonomies: A list of taxonomies, specified by common names, associated with this collection - List    
-            modalities: A list of modalities, specified by term name such as epigenome, whole genome, transcriptome, multiome, associated with this collection - List    
-            assays: A list of assays, specified by a controlled list that include transcriptome, chromatin, mythylome, etc., associated with this collection - List    
-            techniques: A list of specific techniques, such as 10xMultiome_ATACseq, 10XChromium_3', etc., associated with this collection - List    
-            child_collections: A list of child collections associated with this collection if any - List    
-
-        :return: No return value
-        """
-        mysql_cnx = None
-
-        # Verify that all required fields are specified, else raise exception
-        if ("col_id" not in col  or "col_type" not in col or "is_static" not in col or "short_name" not in col) :
-            raise Exception("Missing one of the required parameters: col_id, col_type, is_static, short_name")
-        try:
-
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-
-            # Build the query with required fields
-            ins_stmt = "INSERT INTO collection (col_id, col_type, is_static, short_name"
-            val_stmt = "VALUES(%s, %s, %s, %s"
-
-            data = (col['col_id'], col['col_type'], col['is_static'], col['short_name'])
-
-            # add to statement with optional fields
-            if 'name' in col:
-                ins_stmt = ins_stmt + ", name"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, col['name'])
-
-            if 'description' in col:
-                ins_stmt = ins_stmt + ", description"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, col['description'])
-
-            if 'access' in col:
-                ins_stmt = ins_stmt + ", access"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, col['access'])
-
-            if 'is_published' in col:
-                ins_stmt = ins_stmt + ", is_published"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, col['is_published'])
-
-            if 'license' in col:
-                ins_stmt = ins_stmt + ", license"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, col['license'])
-
-            if 'doi' in col:
-                ins_stmt = ins_stmt + ", doi"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, col['doi'])
-
-            if 'submission_status' in col:
-                ins_stmt = ins_stmt + ", submission_status"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, col['submission_status'])
-
-            if 'url_protocol' in col:
-                ins_stmt = ins_stmt + ", url_protocol"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, col['url_protocol'])
-
-            if 'url_knowledgebase' in col:
-                ins_stmt = ins_stmt + ", url_knowledgebase"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, col['url_knowledgebase'])
-
-            # Close the SQL statement
-            stmt = ins_stmt + ") " + val_stmt + ")"
-
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-
-            # Get the ID of the collection just created to add records to related tables
-            collection_id = cursor.lastrowid
-            self.log.debug(f"Collection ID: {collection_id}")
-
-            # Add collection attributes if they have been specified
-            if 'attributes' in col:
-                self.log.debug("Adding attribute associations. " + str(col['attributes']))
-                self._create_attribute_associations(collection_id, col['attributes'], cursor)
-
-            # If there are child collectionss associated with this collection create associations
-            if 'child_collections' in col:
-                self.log.debug("Adding child collections associations. " + str(col['child_collections']))
-                self._create_child_collection_associations(collection_id, col['child_collections'], cursor)
-
-            # If there are subjects associated with this collection create associations
-            if 'subjects' in col:
-                self.log.debug("Adding subject associations. " + str(col['subjects']))
-                self._create_subject_associations(collection_id, col['subjects'], cursor)
-                    
-            # If there are files associated with this collection create associations
-            if 'files' in col:
-                self.log.debug("Adding file associations. " + str(col['files']))
-                self._create_file_associations(collection_id, col['files'], cursor)
-                    
-            # If there are samples associated with this collection create associations
-            if 'samples' in col:
-                self.log.debug("Adding sample associations. " + str(col['samples']))
-                self._create_sample_associations(collection_id, col['samples'], cursor)
-                    
-            # If there are contributors associated with this collection create associations
-            if 'contributors' in col:
-                self.log.debug("Adding contributor associations. " + str(col['contributors']))
-                self._create_contributor_associations(collection_id, col['contributors'], cursor)
-                    
-            # If there are anatomies associated with this collection create associations
-            if 'anatomies' in col:
-                self.log.debug("Adding anatomy associations. " + str(col['anatomies']))
-                self._create_anatomy_associations(collection_id, col['anatomies'], cursor)
-                    
-            # If there are modalities associated with this collection create associations
-            if 'modalities' in col:
-                self.log.debug("Adding modality associations. " + str(col['modalities']))
-                self._create_modality_associations(collection_id, col['modalities'], cursor)
-                    
-            # If there are assays associated with this collection create associations
-            if 'assays' in col:
-                self.log.debug("Adding assay associations. " + str(col['assays']))
-                self._create_assay_associations(collection_id, col['assays'], cursor)
-                    
-            # If there are techniques associated with this collection create associations
-            if 'techniques' in col:
-                self.log.debug("Adding techniques associations. " + str(col['techniques']))
-                self._create_technique_associations(collection_id, col['techniques'], cursor)
-                    
-            # If there are taxonomies associated with this collection create associations
-            if 'taxonomies' in col:
-                self.log.debug("Adding taxonomy associations. " + str(col['taxonomies']))
-                self._create_taxonomy_associations(collection_id, col['taxonomies'], cursor)
-                    
-            # If there are projects associated with this collection create associations
-            if 'projects' in col:
-                self.log.debug("Adding projects associations. " + str(col['projects']))
-                self._create_project_associations(collection_id, col['projects'], cursor)
-                
-            # If there is publication associated with this collection create associations
-            if 'publication' in col:
-                self.log.debug("Adding publication. " + str(col['publication']))
-                self._add_publication(collection_id, col['publication'], cursor)
-                
-            # If there are entity urls associated with this collection create associations
-            if 'entity_urls' in col:
-                self.log.debug("Adding entity urls. " + str(col['entity_urls']))
-                self._add_entity_urls(collection_id, col['entity_urls'], cursor)
-                
-            # If there are data_use_limitations associated with this collection create associations                
-            if 'data_use_limitations' in col:
-                self.log.debug("Adding entity urls. " + str(col['data_use_limitations']))
-                self._create_dul_associations(collection_id, col['data_use_limitations'], cursor)
-
-            mysql_cnx.commit()
-            return self.get_collection(col['col_id'])
-        
-        except Exception as error:
-            mysql_cnx.rollback()
-            self.log.error("Failed in add_project() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def create_attribute_associations(self, collection_id, attributes_list):
-        """
-        Create attribute associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param attributes_list: The list of attributes as a dictionary
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_attribute_associations(collection_id, attributes_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _read_attribute_associations(self, collection_id):
-        """
-        Read attribute associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return attributes_list: returns the attributes as a dictionary.
-        """
-        self.log.debug(f"Reading attributes associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT name, value
-                        FROM collection_attributes 
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            attributes_list = {}
-            for row in cursor.fetchall():
-                name = row[0]
-                value = row[1]
-                attributes_list[name] = value
-
-            return attributes_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_attribute_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_attribute_associations(self, collection_id, attributes_list, cursor):
-        """
-        Create attribute associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param attributes_list: The list of attributes as a dictionary
-        :param cursor: An cursor object on the connection.
-        :return: returns nothing
-        """
-
-        try:
-
-            self.log.debug(str(attributes_list))
-            for key, value in attributes_list.items():
-                stmt = """INSERT INTO collection_attributes (collection_id, name, value)
-                        VALUES (%s, %s, %s)
-                        """
-                data = (collection_id, key, value)
-                self.log.debug(f"Executing stmt: {stmt} with collection_id {collection_id}, name {key}, value {value}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_attribute_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def create_child_collection_associations(self, collection_id, child_collections_list):
-        """
-        Create child collections associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param child_collections_list: The list of child collecti asset IDs
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_child_collection_associations(collection_id, child_collections_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_child_collection_associations(self, collection_id, child_collections_list, cursor):
-        """
-        Create child collections associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param child_collections_list: The list of child collection asset IDs
-        :param cursor: An cursor object on the connection.
-        :return: returns nothing
-        """
-
-        try:
-
-            self.log.debug(str(child_collections_list))
-            for col_id in child_collections_list:
-                child_collection_id = self.get_collection(col_id)
-                stmt = """INSERT INTO collection_has_collection (parent_collection_id, child_collection_id);
-                        VALUES (%s, %s)
-                        """
-                data = (collection_id, child_collection_id)
-                self.log.debug(f"Executing stmt: {stmt} with values {data}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_child_collection_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def _read_child_collection_associations(self, collection_id):
-        """
-        Read child collections associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return child_collections_list: returns the child collections as a list of asset IDs
-        """
-        self.log.debug(f"Reading child collections associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT col_id
-                        FROM collection c 
-                        JOIN collection_has_collection cac ON cac.child_collection_id = c.id
-                        WHERE cac.parent_collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            child_collections_list = []
-            for row in cursor.fetchall():
-                child_collections_list.append(row[0])
-
-            return child_collections_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_child_collection_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-
-    def create_subject_associations(self, collection_id, subjects_list):
-        """
-        Create subject associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param subjects_list: The list of source subject IDs
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_subject_associations(collection_id, subjects_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _read_subject_associations(self, collection_id):
-        """
-        Read subject associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return subjects_list: returns the subjects as a lst of source sibject IDs if any associated with this collection, else a null object
-        """
-        self.log.debug(f"Reading subjects associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT source_subject_id
-                        FROM collection c 
-                            JOIN subject_assoc_collection sac ON c.id = sac.collection_id 
-                            JOIN subject s ON sac.subject_id = s.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            subjects_list = []
-            for row in cursor.fetchall():
-                source_subject_id = row[0]
-                subjects_list.append(source_subject_id)
-
-            return subjects_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_subject_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_subject_associations(self, collection_id, subjects_list, cursor):
-        """
-        Create subject associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param subjects_list: The list of source subject IDs
-        :param cursor: An cursor object on the connection.
-        :return: returns nothing
-        """
-
-        try:
-
-            self.log.debug(subjects_list)
-            s = subject.Subject(self.log)
-            for source_subject_id in subjects_list:
-                sub = s.get_subject_by_source_subject_id(source_subject_id)
-                if not sub:
-                    self.log.error(f"Cannot find subject with source subject ID : {source_subject_id}")
-                    raise Exception(f"Cannot find subject with source subject ID : {source_subject_id}")
-                subject_id = sub.id    
-                stmt = """INSERT INTO subject_assoc_collection (collection_id, subject_id)
-                                VALUES (%s, %s)
-                            """
-                data = (collection_id, subject_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_subject_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def create_file_associations(self, collection_id, files_list):
-        """
-        Create file associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param files_list: The list of source file IDs
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_file_associations(collection_id, files_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-
-    def _read_file_associations(self, collection_id):
-        """
-        Read file associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return files_list: returns the files as a lst of source sibject IDs if any associated with this collection, else a null object
-        """
-        self.log.debug(f"Reading files associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT file_name
-                        FROM collection c 
-                            JOIN file_in_collection fic ON c.id = fic.collection_id 
-                            JOIN file f ON fic.file_id = f.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            files_list = []
-            for row in cursor.fetchall():
-                file_name = row[0]
-                files_list.append(file_name)
-
-            return files_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_file_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_file_associations(self, collection_id, files_list, cursor):
-        """
-        ** TODO ** - File names are not unique on the file table so we probably want to change 
-        this to take additional information to be certain we are linking the correct file. In the meantime,
-        the get_file_by_filename() function and other functions that internally rely on base._get_record()
-        will now raise an exception when more than one record is returned from the DB.
-
-        Create file associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param files_list: The list of source file IDs
-        :param cursor: An cursor object on the connection.
-        :return: returns nothing
-        """
-
-        try:
-
-            self.log.debug(files_list)
-            s = file.File(self.log)
-            for filename in files_list:
-                sub = s.get_file_by_filename(filename)
-                if not sub:
-                    self.log.error(f"Cannot find file with file: {filename}")
-                    raise Exception(f"Cannot find file with file: {filename}")
-                file_id = sub.id    
-                stmt = """INSERT INTO file_in_collection (collection_id, file_id)
-                                VALUES (%s, %s)
-                            """
-                data = (collection_id, file_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_file_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def create_sample_associations(self, collection_id, samples_list):
-        """
-        Create sample associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param samples_list: The list of source sample IDs
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_sample_associations(collection_id, samples_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_sample_associations(self, collection_id, samples_list, cursor):
-        """
-        Create sample associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param samples_list: The list of source sample IDs
-        :param cursor: An cursor object on the connection.
-        :return: returns nothing
-        """
-
-        try:
-
-            self.log.debug(samples_list)
-            s = sample.Sample(self.log)
-            for source_sample_id in samples_list:
-                sub = s.get_sample_by_sourceid(source_sample_id)
-                if not sub:
-                    self.log.error(f"Cannot find sample with sample: {source_sample_id}")
-                    raise Exception(f"Cannot find sample with sample: {source_sample_id}")
-                sample_id = sub.id    
-                stmt = """INSERT INTO sample_assoc_collection (collection_id, sample_id)
-                                VALUES (%s, %s)
-                            """
-                data = (collection_id, sample_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_sample_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def _read_sample_associations(self, collection_id):
-        """
-        Read sample associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return samples_list: returns the samples as a list of source sample IDs
-        """
-        self.log.debug(f"Reading samples associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT source_sample_id
-                        FROM collection c 
-                            JOIN sample_assoc_collection sac ON c.id = sac.collection_id 
-                            JOIN sample s ON sac.sample_id = s.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            samples_list = []
-            for row in cursor.fetchall():
-                source_sample_id = row[0]
-                samples_list.append(source_sample_id)
-
-            return samples_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_sample_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def create_contributor_associations(self, collection_id, contributors_list):
-        """
-        Create contributor associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param contributors_list: The list of source contributor emails
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_contributor_associations(collection_id, contributors_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_contributor_associations(self, collection_id, contributors_list, cursor):
-        """
-        Create contributor associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param contributors_list: The list of source contributor emails
-        :param cursor: An cursor object on the connection.
-        :return: returns nothing
-        """
-
-        try:
-
-            self.log.debug(contributors_list)
-            s = contributor.Contributor(self.log)
-            for contributor_email in contributors_list:
-                sub = s.get_contributor_by_email(contributor_email)
-                if not sub:
-                    self.log.error(f"Cannot find contributor with contributor: {contributor_email}")
-                    raise Exception(f"Cannot find contributor with contributor: {contributor_email}")
-                contributor_id = sub.id    
-                stmt = """INSERT INTO collection_has_contributor (collection_id, contributor_id)
-                                VALUES (%s, %s)
-                            """
-                data = (collection_id, contributor_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_contributor_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def _read_contributor_associations(self, collection_id):
-        """
-        Read contributor associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return contributors_list: returns the contributors as a list of emails
-        """
-        self.log.debug(f"Reading contributors associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT email
-                        FROM collection c 
-                            JOIN collection_has_contributor chc ON c.id = chc.collection_id 
-                            JOIN contributor co ON chc.contributor_id = co.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            contributors_list = []
-            for row in cursor.fetchall():
-                source_contributor_id = row[0]
-                contributors_list.append(source_contributor_id)
-
-            return contributors_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_contributor_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def create_anatomy_associations(self, collection_id, anatomies_list):
-        """
-        Create anatomy associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param anatomies_list: The list of source anatomy IDs
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_anatomy_associations(collection_id, anatomies_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_anatomy_associations(self, collection_id, anatomies_list, cursor):
-        """
-        Create anatomy associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param anatomies_list: The list of anatomy short names
-        :param cursor: An cursor object on the connection.
-        :return: returns nothing
-        """
-
-        try:
-
-            self.log.debug(f"Adding anatomies {anatomies_list} to collection ID: {collection_id}")
-            for anatomy_short_name in anatomies_list:
-                anatomy_id = self.db.get_anatomy_id(anatomy_short_name)
-                if not anatomy_id:
-                    self.log.error(f"Cannot find anatomy with name {anatomy_short_name}")
-                    raise Exception(f"Cannot find anatomy with name: {anatomy_short_name}")
-                stmt = """INSERT INTO collection_assoc_anatomy (collection_id, anatomy_id)
-                                VALUES (%s, %s)
-                            """
-                data = (collection_id, anatomy_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_anatomy_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def _read_anatomy_associations(self, collection_id):
-        """
-        Read anatomy associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return anatomies_list: returns the anatomies as a list of anatomy short names
-        """
-        self.log.debug(f"Reading anatomies associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT a.short_name
-                        FROM collection c 
-                            JOIN collection_assoc_anatomy cac ON c.id = cac.collection_id 
-                            JOIN anatomy a ON cac.anatomy_id = a.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            anatomies_list = []
-            for row in cursor.fetchall():
-                short_name = row[0]
-                anatomies_list.append(short_name)
-
-            return anatomies_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_anatomy_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def create_taxonomy_associations(self, collection_id, taxonomies_list):
-        """
-        Create taxonomy associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param taxonomies_list: The list of source taxonomy names
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_taxonomy_associations(collection_id, taxonomies_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_taxonomy_associations(self, collection_id, taxonomies_list, cursor):
-        """
-        Create taxonomy associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param taxonomies_list: The list of source taxonomy names
-        :param cursor: An cursor object on the connection
-        :return: returns nothing
-        """
-
-        try:
-            # Insert the taxonomies associated with this collection
-            self.log.debug(taxonomies_list)
-            for taxon in taxonomies_list:
-                self.log.debug(f"Processing taxonomy {taxon}")
-                taxonomy_id = self.db.get_taxonomy_id(taxon)
-
-                if not taxonomy_id:
-                    self.log.error(f"Cannot find taxonomy with name: {taxon}")
-                    raise Exception(f"Cannot find taxonomy with name: {taxon}")
-
-                stmt = """INSERT INTO collection_assoc_species (collection_id, taxonomy_id)
-                                VALUES (%s, %s)
-                """
-                data = (collection_id, taxonomy_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_taxonomy_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def _read_taxonomy_associations(self, collection_id):
-        """
-        Read taxonomy associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return anatomies_list: returns the taxonomies as a list of taxonomy names
-        """
-        self.log.debug(f"Reading taxonomies associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT t.name
-                        FROM collection c 
-                            JOIN collection_assoc_species cas ON c.id = cas.collection_id 
-                            JOIN taxonomy t ON cas.taxonomy_id = t.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            taxonomies_list = []
-            for row in cursor.fetchall():
-                name = row[0]
-                taxonomies_list.append(name)
-
-            return taxonomies_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_taxonomy_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def create_modality_associations(self, collection_id, modalities_list):
-        """
-        Create modality associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param modalities_list: The list of source modality names
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_modality_associations(collection_id, modalities_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_modality_associations(self, collection_id, modalities_list, cursor):
-        """
-        Create modality associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param modalities_list: The list of source modality names
-        :param cursor: An cursor object on the connection
-        :return: returns nothing
-        """
-
-        try:
-            # Insert the modalities associated with this collection
-            self.log.debug(modalities_list)
-            for modality in modalities_list:
-                self.log.debug(f"Processing modality {modality}")
-                modality_id = self.db.get_modality_id(modality)
-
-                if not modality_id:
-                    self.log.error(f"Cannot find modality with name: {modality}")
-                    raise Exception(f"Cannot find modality with name: {modality}")
-
-                stmt = """INSERT INTO collection_assoc_modality (collection_id, modality_id)
-                                VALUES (%s, %s)
-                """
-                data = (collection_id, modality_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_modality_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def _read_modality_associations(self, collection_id):
-        """
-        Read modality associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return anatomies_list: returns the modalities as a list of modality names
-        """
-        self.log.debug(f"Reading modalities associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT m.name
-                        FROM collection c 
-                            JOIN collection_assoc_modality cam ON c.id = cam.collection_id 
-                            JOIN modality m ON cam.modality_id = m.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            modalities_list = []
-            for row in cursor.fetchall():
-                name = row[0]
-                modalities_list.append(name)
-
-            return modalities_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_modality_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def create_dul_associations(self, collection_id, data_use_limitations):
-        """
-        Create data_use_limitation associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param data_use_limitations: The list of data_use_limitation IDs
-        :return: returns nothing
-        """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_dul_associations(collection_id, data_use_limitations, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-
-    def _create_dul_associations(self, collection_id, data_use_limitations, cursor):
-        """
-        Create data_use_limitation associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
-
-        :param collection_id: The internal database ID
-        :param data_use_limitations: The list of data_use_limitation IDs
-        :param cursor: An cursor object on the connection.
-        :return: returns nothing
-        """
-
-        try:
-
-            self.log.debug(f"Creating collection assocation to duls: {data_use_limitations}")
-            s = sample.Sample(self.log)
-            for dul_id in data_use_limitations:
-                # sub = s.get_sample_by_sourceid(source_sample_id)
-                # if not sub:
-                    # self.log.error(f"Cannot find sample with sample: {source_sample_id}")
-                    # raise Exception(f"Cannot find sample with sample: {source_sample_id}")
-                # sample_id = sub.id    
-                stmt = """INSERT INTO collection_has_data_use_condition (collection_id, data_use_condition_duc_id)
-                                VALUES (%s, %s)
-                            """
-                data = (collection_id, dul_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
-
-        except Exception as error:
-            self.log.error("Failed in _create_sample_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-
-    def _read_dul_associations(self, collection_id):
-        """
-        Read data_use_limitation associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :return data_use_limitation list: returns the data_use_limitation associations as a list of ids from the data_use_limitation table
-        """
-        self.log.debug(f"Reading data_use_limitation associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """
-                SELECT dul.id
-                FROM data_use_limitation dul, collection_has_data_use_condition cdul
-                WHERE dul.id = cdul.data_use_condition_duc_id and collection_id = %s
-            """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            dul_list = []
-            for row in cursor.fetchall():
-                id = row[0]
-                dul_list.append(id)
-
-            return dul_list
-
-        except Exception as error:
-            self.log.error("Failed in _read_dul_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
-            
-    def create_assay_associations(self, collection_id, assays_list):
-        """
-        Create assay associations for this collection. 
-
-        :param collection_id: The internal database ID
-        :param assays_list: The list of source assay names
-        :return: returns nothing
+        Read the association name for this collection from the DB and keep it until refresh() or invalidate(name)
         """
+        self.log.debug(f"Reading {name} associated with this collection from DB.")
+
+        mysql_cnx = None
         try:
             mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_assay_associations(collection_id, assays_list, cursor) 
-            mysql_cnx.commit()
+            self._load_associations({self.id : self}, [name], mysql_cnx.cursor(dictionary=True))
+            return vars(self)[name]
         except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
+            self.log.error("Failed in _lazy_association() {}".format(error), exc_info=sys.exc_info())
+            raise error
         finally:
             try:
                 self.db.close_connection(mysql_cnx)
             except Exception as error:
                 raise error
 
-    def _create_assay_associations(self, collection_id, assays_list, cursor):
+    def _load_associations(self, collections, include, cursor):
+        """
+        Read the associations named in include for collections (a dict of id -> Collection) with one
+        query per association per IN_CLAUSE_CHUNK_SIZE collections (see Base._load_associations_for())
+        and keep them on the collections as if they had been lazily loaded.
         """
-        Create assay associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
+        for collection in collections.values():
+            for name in include:
+                vars(collection)[name] = self._empty_association(name)
+        self._load_associations_for(collections, include, cursor)
 
-        :param collection_id: The internal database ID
-        :param assays_list: The list of source assay names
-        :param cursor: An cursor object on the connection
-        :return: returns nothing
+    def invalidate(self, name):
         """
+        Drop the cached value of one association so that the next access reads it from the DB again.
 
-        try:
-            # Insert the assays associated with this collection
-            self.log.debug(assays_list)
-            for assay in assays_list:
-                self.log.debug(f"Processing assay {assay}")
-                assay_id = self.db.get_assay_id(assay)
-
-                if not assay_id:
-                    self.log.error(f"Cannot find assay with name: {assay}")
-                    raise Exception(f"Cannot find assay with name: {assay}")
-
-                stmt = """INSERT INTO collection_assoc_assay (collection_id, assay_id)
-                                VALUES (%s, %s)
-                """
-                data = (collection_id, assay_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
+        :param name: The association, e.g. 'files'
+        """
+        self._meta.validate({}, [name])
+        vars(self).pop(name, None)
 
-        except Exception as error:
-            self.log.error("Failed in _create_assay_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
+    def refresh(self):
+        """
+        Drop the cached values of all associations so that each is read from the DB again on next access.
+        """
+        for name in self.ASSOCIATIONS:
+            vars(self).pop(name, None)
+
+    def _associations_changed(self, collection_id, name):
+        # The create_* functions are passed the collection's id, so only this collection's cached value is stale if it matches
+        if collection_id == self.id and self._read_from_db:
+            self.invalidate(name)
 
-    def _read_assay_associations(self, collection_id):
+    def _get_collections(self, params, include=[]):
         """
-        Read assay associations for this collection. 
+        Read the collections matching params. Associations named in include are loaded up front in
+        one batch on the same connection; the others are read lazily on first access.
 
-        :param collection_id: The internal database ID
-        :return assays_list: returns the assays as a list of assay names
+        :param params: field -> value to filter on, as for Base._get_records()
+        :param include: Associations to load up front, e.g. ['files', 'projects']
+        :return: A list of collection objects
         """
-        self.log.debug(f"Reading assays associated with collection ID: {collection_id}")
         mysql_cnx = None
         try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT a.name
-                        FROM collection c 
-                            JOIN collection_assoc_assay caa ON c.id = caa.collection_id 
-                            JOIN assay a ON caa.assay_id = a.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            assays_list = []
-            for row in cursor.fetchall():
-                name = row[0]
-                assays_list.append(name)
+            self._meta.validate(params, include)
+            collections = self._get_records(params)
+            for collection in collections:
+                collection._read_from_db = 1
 
-            return assays_list
+            if include and collections:
+                mysql_cnx = self.db.get_db_connection()
+                self._load_associations({collection.id : collection for collection in collections}, include, mysql_cnx.cursor(dictionary=True))
+
+            return collections
 
         except Exception as error:
-            self.log.error("Failed in _read_assay_associations() {}".format(error), exc_info=sys.exc_info())
+            self.log.error("Failed in _get_collections() {}".format(error), exc_info=sys.exc_info())
             raise error
         finally:
             try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
+                self.db.close_connection(mysql_cnx)
             except Exception as error:
                 raise error
 
-    def create_technique_associations(self, collection_id, techniques_list):
+    def get_all_collections(self, include=[]):
         """
-        Create technique associations for this collection. 
+        Retrieve all collections from the database.
 
-        :param collection_id: The internal database ID
-        :param techniques_list: The list of source technique names
-        :return: returns nothing
+        :param include: Associations to load up front for all collections, e.g. ['files', 'projects'],
+            with one query per association per IN_CLAUSE_CHUNK_SIZE collections
+        :return: A list of collection objects initialized with the properties.
         """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._create_technique_associations(collection_id, techniques_list, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
+        return self._get_collections({}, include)
 
-    def _create_technique_associations(self, collection_id, techniques_list, cursor):
+    def get_collections(self, params={}, include=[]):
         """
-        Create technique associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
+        Retrieve the collections matching params, e.g. {"col_type" : "files", "is_published" : 1}
 
-        :param collection_id: The internal database ID
-        :param techniques_list: The list of source technique names
-        :param cursor: An cursor object on the connection
-        :return: returns nothing
+        :param params: field -> value to filter on; a value of None matches NULL and a list matches any of its values
+        :param include: Associations to load up front, as for get_all_collections()
+        :return: A list of collection objects initialized with the properties.
         """
+        return self._get_collections(params, include)
 
-        try:
-            # Insert the techniques associated with this collection
-            self.log.debug(techniques_list)
-            for technique in techniques_list:
-                self.log.debug(f"Processing technique {technique}")
-                technique_id = self.db.get_technique_id_by_short_name(technique)
-
-                if not technique_id:
-                    self.log.error(f"Cannot find technique with name: {technique}")
-                    raise Exception(f"Cannot find technique with name: {technique}")
-
-                stmt = """INSERT INTO collection_assoc_technique (collection_id, technique_id)
-                                VALUES (%s, %s)
-                """
-                data = (collection_id, technique_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
+    def iter_collections(self, params={}, include=[], chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE, as_records=False):
+        """
+        Like get_collections() but yields collections chunk_size at a time; see Base._iter_records().
+        Only the associations named in include are loaded; the others are left empty.
+        """
+        return self._iter_records(params, include, chunk_size, as_records=as_records)
 
-        except Exception as error:
-            self.log.error("Failed in _create_technique_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
+    def get_collections_page(self, params={}, include=[], after_id=None, limit=100, order_by="id", descending=False, as_records=False):
+        """
+        One page of collections and the cursor for the next page; see Base._get_records_page().
+        Only the associations named in include are loaded; the others are left empty.
+        """
+        return self._get_records_page(params, include, after_id, limit, order_by, descending, as_records=as_records)
 
-    def _read_technique_associations(self, collection_id):
+    def get_collection(self, col_id, include=[]):
         """
-        Read technique associations for this collection. 
+        Read the collection from database using the asset identifier.
 
-        :param collection_id: The internal database ID
-        :return techniques_list: returns the techniques as a list of technique short names
+        :param col_id: Collection asset identifier
+        :param include: Associations to load up front, e.g. ['files', 'projects'], in one batch on the same
+            connection rather than lazily one query per property
+        :return: returns collection object
+        """
+        self.log.debug(f"Fetching by collection ID: {col_id}")
+        collections = self._get_collections({"col_id" : col_id}, include)
+        return collections[0] if collections else None
+
+    def get_collection_by_short_name(self, short_name, include=[]):
+        """
+        Read the collection from database using the short name.
+
+        :param short_name: Collection short name
+        :param include: Associations to load up front, as for get_collection()
+        :return: returns collection object
+        """
+        collections = self._get_collections({"short_name" : short_name}, include)
+        return collections[0] if collections else None
+
+    def _resolve_ids(self, table_name, field, values):
+        """
+        Look up the IDs for values with one query per chunk, reporting every value that has no
+        matching record or matches more than one at once.
+
+        :param table_name: The table to search, e.g. 'file'
+        :param field: The field the values are matched against, e.g. 'file_name'
+        :param values: The list of values
+        :return: A dict of value to internal database ID
+        """
+        ids = self.db._get_ids_for_values(table_name, field, values)
+        missing = [value for value in dict.fromkeys(values) if value not in ids]
+        ambiguous = [value for value, matches in ids.items() if len(matches) > 1]
+        if missing or ambiguous:
+            message = f"Cannot resolve {table_name} {field} values."
+            if missing:
+                message += f" Not found: {missing}."
+            if ambiguous:
+                message += f" Matched more than one record: {ambiguous}."
+            self.log.error(message)
+            raise Exception(message)
+        return {value : matches[0] for value, matches in ids.items()}
+
+    def _resolve_member_ids(self, collections):
+        """
+        Resolve the names given for every ref_join association across a batch of collections, with
+        one lookup per association rather than one per name
+
+        :param collections: dicts that each represent a collection, as passed to add_collection()
+        :return: A dict of association name to a dict of name to internal database ID
+        """
+        member_ids = {}
+        for assoc, details in self.ASSOCIATIONS.items():
+            if "ref_join" not in details:
+                continue
+            values = [value for col in collections for value in (col.get(assoc) or [])]
+            if values:
+                member_ids[assoc] = self._resolve_ids(details["ref_join"]["ref_table"], details["ref_join"]["readable_field"], values)
+        return member_ids
+
+    def _assoc_values(self, col, collection_id, member_ids):
+        """
+        Build the rows to insert into the association tables for one collection
+
+        :param col: A dict that represents the collection, as passed to add_collection()
+        :param collection_id: The collection's internal id
+        :param member_ids: The names resolved by _resolve_member_ids()
+        :return: A dict of association name to the list of column / value dicts for that association
+        """
+        assoc_values = {}
+
+        for assoc, details in self.ASSOCIATIONS.items():
+            if assoc not in col or not col[assoc]:
+                continue
+            self.log.debug(f"Processing association: {assoc}")
+
+            owner_col = self._owner_col(assoc)
+            if assoc == "attributes":
+                values_list = [{owner_col : collection_id, "name" : key, "value" : value} for key, value in col[assoc].items()]
+            elif assoc == "publication":
+                if not all(key in col[assoc] for key in self.REQUIRED_PUBLICATION_KEYS):
+                    raise Exception(f"Missing one of the required parameters: {', '.join(self.REQUIRED_PUBLICATION_KEYS)}")
+                values_list = [dict(col[assoc], collection_id=collection_id)]
+            elif assoc == "entity_urls":
+                entity_urls = col[assoc] if isinstance(col[assoc], list) else [col[assoc]]
+                if not all(key in entity_url for entity_url in entity_urls for key in self.REQUIRED_ENTITY_URL_KEYS):
+                    raise Exception(f"Missing one of the required parameters: {', '.join(self.REQUIRED_ENTITY_URL_KEYS)}")
+                values_list = [dict(entity_url, collection_id=collection_id) for entity_url in entity_urls]
+            elif "ref_join" in details:
+                ids = member_ids[assoc]
+                values_list = [{owner_col : collection_id, details["ref_join"]["ref_field"] : ids[value]} for value in col[assoc]]
+            else:
+                member_col = [c for c in details["cols"] if c != owner_col][0]
+                values_list = [{owner_col : collection_id, member_col : value} for value in col[assoc]]
+
+            assoc_values[assoc] = values_list
+
+        return assoc_values
+
+    def add_collection(self, col ={}):
+        """
+        Creates a database entry for the collection whose properties are supplied as a dictinary.
+
+        :param col: A dictionary of the properties of this collection with the following keys
+
+            col_id: Unique alphanumeric collection identifier - String (required)
+            col_type: Collection type, i.e., files, samples, subjects - String (required)
+            is_static: Flag to indicate if this is a static collection. Values can be 0 or 1 - Integer (required)
+            short_name: Collection short name - String (required)
+            name: Long collection name - String
+            description: Collection description - String
+            access: A string identifying if the collection has open or controlled access - String
+            license: A string identifying the license associated with this collection - String
+            is_published: Flag to indicate if this collection is associated with a publication. Values can be 0 or 1 - Integer
+            doi: A DataCite digital object identifier (DOI) if one is issued for this collection. - String
+            submission_status: A controlled list of string indicating if the collection is growing. - String
+            url_knowledgebase: URL for any associated knowledgebase entry - String
+            url_protocol: URL for any associated protocol entry - String
+            publication: Information about the publication associated with this collection - Dictionary
+            entity_urls: URLs associated with entity - Dictionary or list of dictionaries
+
+            projects: A list of projects specified by short name, associated with this collection - List
+            attributes: A dictionary of key/value pairs of attributes that are associated with this collection - Dictionary
+            contributors: A list of contributors, specified by email addresses, associated with this collection - List
+            subjects: A list of subject_names associated with this collection - List
+            samples: A list of sample_names associated with this collection - List
+            files: * DEPRECATED: file_name not unique * A list of file_names associated with this collection - List
+            anatomies: A list of anatomies_names associated with this collection - List
+            taxonomies: A list of taxonomies, specified by common names, associated with this collection - List
+            modalities: A list of modalities, specified by term name such as epigenome, whole genome, transcriptome, multiome, associated with this collection - List
+            assays: A list of assays, specified by a controlled list that include transcriptome, chromatin, mythylome, etc., associated with this collection - List
+            techniques: A list of specific techniques, such as 10xMultiome_ATACseq, 10XChromium_3', etc., associated with this collection - List
+            data_use_limitations: A list of ids from the data_use_limitation table - List
+            child_collections: A list of child collections associated with this collection if any - List
+
+        :return: The new collection
         """
-        self.log.debug(f"Reading techniques associated with collection ID: {collection_id}")
         mysql_cnx = None
+
         try:
             mysql_cnx = self.db.get_db_connection()
             cursor = mysql_cnx.cursor()
-            stmt = """SELECT t.short_name
-                        FROM collection c 
-                            JOIN collection_assoc_technique cat ON c.id = cat.collection_id 
-                            JOIN technique t ON cat.technique_id = t.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
+            stmt, data = self._build_insert_stmt(col)
             self.log.debug(f"Executing stmt {stmt} with data {data}")
             cursor.execute(stmt, data)
-            techniques_list = []
-            for row in cursor.fetchall():
-                short_name = row[0]
-                techniques_list.append(short_name)
 
-            return techniques_list
+            # Get the ID of the collection just created to add records to related tables
+            collection_id = cursor.lastrowid
+            self.log.debug(f"Collection ID: {collection_id}")
+
+            self._create_assocs_for([col], [collection_id], cursor, db_utils.INSERT_CHUNK_SIZE, self._resolve_member_ids([col]))
+
+            mysql_cnx.commit()
+            return self.get_collection(col['col_id'])
 
         except Exception as error:
-            self.log.error("Failed in _read_technique_associations() {}".format(error), exc_info=sys.exc_info())
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in add_collection() {}".format(error), exc_info=sys.exc_info())
             raise error
         finally:
             try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
+                self.db.close_connection(mysql_cnx)
             except Exception as error:
                 raise error
 
-    def create_project_associations(self, collection_id, projects_list):
+    def _add_associations(self, collection_id, name, values):
         """
-        Create project associations for this collection. 
+        Add rows to one association of a collection in a single transaction, and drop this collection's
+        cached value of it if it is the same collection.
 
         :param collection_id: The internal database ID
-        :param projects_list: The list of source project names
-        :return: returns nothing
+        :param name: The association, e.g. 'files'
+        :param values: As for the same key of add_collection(), e.g. a list of file names
         """
+        mysql_cnx = None
+
         try:
+            self._meta.validate({}, [name])
+            col = {name : values}
+
             mysql_cnx = self.db.get_db_connection()
             cursor = mysql_cnx.cursor()
-            self._create_project_associations(collection_id, projects_list, cursor) 
+            self._create_assocs_for([col], [collection_id], cursor, db_utils.INSERT_CHUNK_SIZE, self._resolve_member_ids([col]))
             mysql_cnx.commit()
+
+            self._associations_changed(collection_id, name)
+
         except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in _add_associations() {}".format(error), exc_info=sys.exc_info())
+            raise error
         finally:
             try:
                 self.db.close_connection(mysql_cnx)
             except Exception as error:
                 raise error
 
-    def _create_project_associations(self, collection_id, projects_list, cursor):
+    def create_attribute_associations(self, collection_id, attributes_list):
         """
-        Create project associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
+        Create attribute associations for this collection.
 
         :param collection_id: The internal database ID
-        :param projects_list: The list of project short names
-        :param cursor: An cursor object on the connection
-        :return: returns nothing
+        :param attributes_list: The list of attributes as a dictionary
         """
+        self._add_associations(collection_id, "attributes", attributes_list)
 
-        try:
-            # Insert the projects associated with this collection
-            self.log.debug(projects_list)
-            for short_name in projects_list:
-                self.log.debug(f"Processing project {short_name}")
-                p = project.Project(self.log)
-                proj = p.get_grant_or_project_by_name(short_name)
-                if not proj:
-                    self.log.error(f"Cannot find project with name: {short_name}")
-                    raise Exception(f"Cannot find project with name: {short_name}")
-
-                project_id = proj.id
-
-                stmt = """INSERT INTO collection_assoc_project (collection_id, project_id)
-                                VALUES (%s, %s)
-                """
-                data = (collection_id, project_id)
-                self.log.debug(f"Executing stmt {stmt} with data {data}")
-                cursor.execute(stmt, data)
+    def create_child_collection_associations(self, collection_id, child_collections_list):
+        """
+        Create child collections associations for this collection.
 
-        except Exception as error:
-            self.log.error("Failed in _create_project_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
+        :param collection_id: The internal database ID
+        :param child_collections_list: The list of child collections as asset IDs
+        """
+        self._add_associations(collection_id, "child_collections", child_collections_list)
 
-    def _read_project_associations(self, collection_id):
+    def create_subject_associations(self, collection_id, subjects_list):
         """
-        Read project associations for this collection. 
+        Create subject associations for this collection.
 
         :param collection_id: The internal database ID
-        :return projects_list: returns the projects as a list of project short names
+        :param subjects_list: The list of subjects as source subject IDs
         """
-        self.log.debug(f"Reading projects associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT p.short_name
-                        FROM collection c 
-                            JOIN collection_assoc_project cat ON c.id = cat.collection_id 
-                            JOIN project p ON cat.project_id = p.id
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            projects_list = []
-            for row in cursor.fetchall():
-                short_name = row[0]
-                projects_list.append(short_name)
+        self._add_associations(collection_id, "subjects", subjects_list)
+
+    def create_file_associations(self, collection_id, files_list):
+        """
+        Create file associations for this collection.
 
-            return projects_list
+        TODO: files_list is a list of file names, which are not unique. File names that match more than
+        one file record are reported as ambiguous and nothing is inserted.
 
-        except Exception as error:
-            self.log.error("Failed in _read_project_associations() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
+        :param collection_id: The internal database ID
+        :param files_list: The list of files as file names
+        """
+        self._add_associations(collection_id, "files", files_list)
 
-    def add_publication(self, collection_id, publication):
+    def create_sample_associations(self, collection_id, samples_list):
         """
-        Add publication for this collection. 
+        Create sample associations for this collection.
 
         :param collection_id: The internal database ID
-        :param publication: The publication information
-        :return: returns nothing
+        :param samples_list: The list of samples as source sample IDs
         """
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._add_publication(collection_id, publication, mysql_cnx, cursor) 
-            mysql_cnx.commit()
-        except Exception as error:
-            mysql_cnx.rollback()
-            raise error                 
-        finally:
-            try:
-                self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
+        self._add_associations(collection_id, "samples", samples_list)
 
-    def _add_publication(self, collection_id, publication, cursor):
+    def create_contributor_associations(self, collection_id, contributors_list):
         """
-        Create publication associations for this collection. This method is called in the context of an existing 
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
+        Create contributor associations for this collection.
 
         :param collection_id: The internal database ID
-        :param publication: The publication
-        :param cursor: An cursor object on the connection
-        :return: returns nothing
+        :param contributors_list: The list of contributors as email addresses
         """
-        # Verify that all required fields are specified, else raise exception
-        if ("title" not in publication  or "pub_doi" not in publication or "pub_year" not in publication or "journal" not in publication) :
-            raise Exception("Missing one of the required parameters: title, pub_doi, pub_year, journal, collection_id") 
+        self._add_associations(collection_id, "contributors", contributors_list)
 
-        try:
-            # Insert the publication associated with this collection
-            self.log.debug(publication)
+    def create_anatomy_associations(self, collection_id, anatomies_list):
+        """
+        Create anatomy associations for this collection.
+
+        :param collection_id: The internal database ID
+        :param anatomies_list: The list of anatomies as short names
+        """
+        self._add_associations(collection_id, "anatomies", anatomies_list)
 
-            stmt = """INSERT INTO publication (title, pub_doi, pub_year, journal, collection_id)
-                                VALUES (%s, %s, %s, %s, %s)
-                """
-            data = (publication['title'], publication['pub_doi'], publication['pub_year'], publication['journal'], collection_id)
+    def create_taxonomy_associations(self, collection_id, taxonomies_list):
+        """
+        Create taxonomy associations for this collection.
 
-            # add to statement with optional fields
-            if 'pubmed_id' in publication:
-                ins_stmt = ins_stmt + ", pubmed_id"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, publication['pubmed_id'])
+        :param collection_id: The internal database ID
+        :param taxonomies_list: The list of taxonomies as names
+        """
+        self._add_associations(collection_id, "taxonomies", taxonomies_list)
 
-            if 'vol' in publication:
-                ins_stmt = ins_stmt + ", vol"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, publication['vol'])
+    def create_modality_associations(self, collection_id, modalities_list):
+        """
+        Create modality associations for this collection.
 
-            if 'page' in publication:
-                ins_stmt = ins_stmt + ", page"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, publication['page'])
+        :param collection_id: The internal database ID
+        :param modalities_list: The list of modalities as names
+        """
+        self._add_associations(collection_id, "modalities", modalities_list)
 
-            if 'pub_status' in publication:
-                ins_stmt = ins_stmt + ", pub_status"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, publication['pub_status'])
+    def create_dul_associations(self, collection_id, data_use_limitations):
+        """
+        Create data_use_limitation associations for this collection.
 
+        :param collection_id: The internal database ID
+        :param data_use_limitations: The list of ids from the data_use_limitation table
+        """
+        self._add_associations(collection_id, "data_use_limitations", data_use_limitations)
 
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
+    def create_assay_associations(self, collection_id, assays_list):
+        """
+        Create assay associations for this collection.
 
-        except Exception as error:
-            self.log.error("Failed in _add_publication() {}".format(error), exc_info=sys.exc_info())
-            raise error
+        :param collection_id: The internal database ID
+        :param assays_list: The list of assays as names
+        """
+        self._add_associations(collection_id, "assays", assays_list)
 
-    def _read_publication(self, collection_id):
+    def create_technique_associations(self, collection_id, techniques_list):
         """
-        Read publication associations for this collection. 
+        Create technique associations for this collection.
 
         :param collection_id: The internal database ID
-        :return publication: returns the publication as a dictionary.
+        :param techniques_list: The list of techniques as short names
         """
-        self.log.debug(f"Reading publication associated with collection ID: {collection_id}")
-        mysql_cnx = None
-        try:
-            mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT title, pub_doi, pub_year, pubmed_id, journal, vol, page, pub_status
-                        FROM publication 
-                        WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            publication = {}
-            for row in cursor.fetchall():
-                publication['title'] = row[0]
-                publication['pub_doi'] = row[1]
-                publication['pub_year'] = row[2]
-                publication['pubmed_id'] = row[3]
-                publication['journal'] = row[4]
-                publication['vol'] = row[5]
-                publication['page'] = row[6]
-                publication['pub_status'] = row[7]
+        self._add_associations(collection_id, "techniques", techniques_list)
 
-            return publication
+    def create_project_associations(self, collection_id, projects_list):
+        """
+        Create project associations for this collection.
 
-        except Exception as error:
-            self.log.error("Failed in _read_publication() {}".format(error), exc_info=sys.exc_info())
-            raise error
-        finally:
-            try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
-            except Exception as error:
-                raise error
+        :param collection_id: The internal database ID
+        :param projects_list: The list of projects (or grants) as short names
+        """
+        self._add_associations(collection_id, "projects", projects_list)
+
+    def add_publication(self, collection_id, publication):
+        """
+        Add publication for this collection.
 
+        :param collection_id: The internal database ID
+        :param publication: The publication information as a dictionary with the keys title, pub_doi,
+            pub_year, journal and optionally pubmed_id, vol, page, pub_status
+        """
+        self._add_associations(collection_id, "publication", publication)
 
     def add_entity_url(self, collection_id, entity_url):
         """
         Add entity urls for this collection.
 
         :param collection_id: The internal database ID
-        :param entity_url: The entity url information passed as a dictionary
-        :return: returns nothing
+        :param entity_url: The entity url information as a dictionary with the keys entity_type,
+            urls_type and optionally file_count, size, release, url_readme
+        """
+        self._add_associations(collection_id, "entity_urls", [entity_url])
+
+    def get_collection_descendants(self, flattened=True):
+        """
+        Internal ids of every collection below this one; see Base._get_descendant()
+        """
+        return self._get_descendant(flattened)
+
+    def _member_ids_stmt(self, assoc, recursive):
+        """
+        :return: a tuple of the statement selecting the distinct member ids of this collection (and, if
+            recursive, of every collection below it) for a MEMBER_TYPES association, and its params
+        """
+        details = self.ASSOCIATIONS[assoc]
+        member_col = details['ref_join']['ref_field']
+        if not recursive:
+            stmt = f"SELECT DISTINCT {member_col} FROM {details['table']} WHERE {details['id_col']} = %(id)s"
+            return stmt, {"id" : self.id}
+
+        # UNION (rather than UNION ALL) visits each collection once however many branches lead to it,
+        # which also ends the recursion if collection_has_collection ever contains a cycle
+        stmt = f"""
+            WITH RECURSIVE tree (collection_id) AS (
+                SELECT %(id)s
+                UNION
+                SELECT edge.{self.SELF_JOIN_TABLE['child_field']}
+                FROM {self.SELF_JOIN_TABLE['table']} edge
+                JOIN tree ON edge.{self.SELF_JOIN_TABLE['parent_field']} = tree.collection_id
+            )
+            SELECT DISTINCT member.{member_col}
+            FROM tree
+            JOIN {details['table']} member ON member.{details['id_col']} = tree.collection_id
+        """
+        return stmt, {"id" : self.id}
+
+    def _iter_member_ids(self, assoc, recursive, chunk_size):
+        """
+        Yield the distinct member ids of this collection (and, if recursive, of its whole tree) for a
+        MEMBER_TYPES association, reading chunk_size rows at a time. Outside a transaction the rows are
+        streamed from an unbuffered cursor; see Base._iter_records().
+
+        On servers without recursive CTEs the tree is walked with Base's breadth-first search instead,
+        and the members are read for chunks of its collections.
         """
+        mysql_cnx = None
         try:
+            if not self.id:
+                raise Exception("Instance does not have required attribute set: 'id'")
+            if assoc not in self.MEMBER_TYPES:
+                raise ValueError(f"Expected one of {self.MEMBER_TYPES}, but recieved {assoc}")
+
+            streaming = not db_utils.is_transaction_state()
             mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            self._add_entity_url(collection_id, entity_url, mysql_cnx, cursor)
-            mysql_cnx.commit()
+            cursor = mysql_cnx.cursor(buffered=not streaming)
+
+            if recursive and not (base.LINEAGE_ENGINE == "cte" and base._cte_supported):
+                yield from self._iter_member_ids_walked(assoc, cursor)
+                return
+
+            stmt, params = self._member_ids_stmt(assoc, recursive)
+            self.log.debug(f"Executing stmt: {stmt} with params {params}")
+            try:
+                cursor.execute(stmt, params)
+            except mysql.connector.errors.ProgrammingError as error:
+                if not recursive or not base._is_cte_unsupported(error):
+                    raise error
+                self.log.warning(f"Recursive CTEs not supported by this server ({error}). Falling back to breadth-first search.")
+                base._cte_supported = False
+                yield from self._iter_member_ids_walked(assoc, cursor)
+                return
+
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0]
+
         except Exception as error:
-            mysql_cnx.rollback()
+            self.log.error("Failed in _iter_member_ids() {}".format(error), exc_info=sys.exc_info())
             raise error
         finally:
             try:
+                # A connection left with unread rows is discarded rather than returned to the pool
                 self.db.close_connection(mysql_cnx)
             except Exception as error:
                 raise error
 
-    def _add_entity_url(self, collection_id, entity_url, cursor):
-        """
-        Create entity_url associations for this collection. This method is called in the context of an existing
-        transaction, so it does not commit the changes. The calling method should ensure changes are committed.
+    def _iter_member_ids_walked(self, assoc, cursor):
+        details = self.ASSOCIATIONS[assoc]
+        member_col = details['ref_join']['ref_field']
 
-        :param collection_id: The internal database ID
-        :param entity_url: The entity_url passed as a dictionary
-        :param cursor: An cursor object on the connection
-        :return: returns nothing
+        seen = set()
+        for chunk in db_utils.chunked([self.id] + self._get_descendant(True)):
+            placeholders, params = db_utils.build_in_clause(chunk)
+            stmt = f"SELECT DISTINCT {member_col} FROM {details['table']} WHERE {details['id_col']} IN ({placeholders})"
+            self.log.debug(f"Executing stmt: {stmt} for {len(chunk)} collections")
+            cursor.execute(stmt, params)
+            for row in cursor.fetchall():
+                if row[0] not in seen:
+                    seen.add(row[0])
+                    yield row[0]
+
+    def _get_all_member_ids(self, assoc, recursive, stream, chunk_size):
+        if stream:
+            return self._iter_member_ids(assoc, recursive, chunk_size)
+        return list(self._iter_member_ids(assoc, recursive, chunk_size))
+
+    def get_all_member_files(self, recursive=True, stream=False, chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE):
         """
-        # Verify that all required fields are specified, else raise exception
-        if ("entity_type" not in entity_url  or "urls_type" not in entity_url or "collection_id" not in entity_url) :
-            raise Exception("Missing one of the required parameters: enity_type, entity_url, collection_id")
+        Internal ids of the files in this collection and, if recursive, in every collection below it,
+        resolved in one recursive query. A file reachable through several child collections is listed
+        once. Ids are in no particular order.
 
-        try:
-            # Insert the entity_url associated with this collection
-            self.log.debug(entity_url)
-
-            stmt = """INSERT INTO entity_has_urls (entity_type,urls_type,collection_id)
-                                VALUES (%s, %s, %s)
-                """
-            data = (entity_url['entity_type'], entity_url['urls_type'], collection_id)
-
-            # add to statement with optional fields
-            if 'file_count' in entity_url:
-                ins_stmt = ins_stmt + ", file_count"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, entity_url['file_count'])
-
-            if 'size' in entity_url:
-                ins_stmt = ins_stmt + ", size"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, entity_url['size'])
-
-            if 'release' in entity_url:
-                ins_stmt = ins_stmt + ", release"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, entity_url['release'])
-
-            if 'url_readme' in entity_url:
-                ins_stmt = ins_stmt + ", url_readme"
-                val_stmt = val_stmt + ", %s"
-                data = (*data, entity_url['url_readme'])
+        :param recursive: Include the files of all descendant collections
+        :param stream: Return an iterator that reads the ids chunk_size at a time instead of a list
+        :param chunk_size: Rows fetched at a time
+        :return: A list (or iterator) of file ids
+        """
+        return self._get_all_member_ids("files", recursive, stream, chunk_size)
 
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
+    def get_all_member_subjects(self, recursive=True, stream=False, chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE):
+        """
+        Internal ids of the subjects in this collection and, if recursive, in every collection below it;
+        see get_all_member_files()
+        """
+        return self._get_all_member_ids("subjects", recursive, stream, chunk_size)
 
-        except Exception as error:
-            self.log.error("Failed in _add_entity_url() {}".format(error), exc_info=sys.exc_info())
-            raise error
+    def get_all_member_samples(self, recursive=True, stream=False, chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE):
+        """
+        Internal ids of the samples in this collection and, if recursive, in every collection below it;
+        see get_all_member_files()
+        """
+        return self._get_all_member_ids("samples", recursive, stream, chunk_size)
 
-    def _read_entity_urls(self, collection_id):
+    def _set_operation_stmt(self, operation, other_collections, col_type):
+        """
+        :return: a tuple of the statement selecting the member ids of this collection combined with
+            other_collections by operation, and its params. Only the membership table is read.
         """
-        Read entity_url associations for this collection.
+        if not self.id:
+            raise Exception("Instance does not have required attribute set: 'id'")
+        if col_type not in self.MEMBER_TYPES:
+            raise ValueError(f"Expected col_type to be one of {self.MEMBER_TYPES}, but recieved {col_type}")
+        if not isinstance(other_collections, list) or not other_collections:
+            raise ValueError("other_collections must be a non-empty list of collections or collection ids")
+
+        other_ids = list(dict.fromkeys(other.id if isinstance(other, Collection) else other for other in other_collections))
+        if None in other_ids:
+            # e.g. a Collection that was never saved or read; it would silently match nothing
+            raise ValueError("Every collection in other_collections must have an id")
+
+        details = self.ASSOCIATIONS[col_type]
+        table = details['table']
+        id_col = details['id_col']
+        member_col = details['ref_join']['ref_field']
+
+        placeholders, params = db_utils.build_in_clause(other_ids, "c")
+        params["id"] = self.id
+
+        if operation == "union":
+            stmt = f"SELECT DISTINCT {member_col} FROM {table} WHERE {id_col} = %(id)s OR {id_col} IN ({placeholders})"
+        elif operation == "intersect":
+            # A member of every collection appears once per collection
+            stmt = f"""
+                SELECT {member_col} FROM {table}
+                WHERE {id_col} = %(id)s OR {id_col} IN ({placeholders})
+                GROUP BY {member_col}
+                HAVING COUNT(DISTINCT {id_col}) = %(collection_count)s
+            """
+            params["collection_count"] = len(set(other_ids) | {self.id})
+        else:
+            stmt = f"""
+                SELECT DISTINCT mine.{member_col} FROM {table} mine
+                WHERE mine.{id_col} = %(id)s AND NOT EXISTS (
+                    SELECT 1 FROM {table} other
+                    WHERE other.{member_col} = mine.{member_col} AND other.{id_col} IN ({placeholders})
+                )
+            """
+        return stmt, params
 
-        :param collection_id: The internal database ID
-        :return entity_urls: returns the entity_urls as a dictionary.
+    def _stream_ids(self, stmt, params, chunk_size):
+        """
+        Yield the first column of the rows of stmt, reading chunk_size rows at a time. Outside a
+        transaction the rows are streamed from an unbuffered cursor; see Base._iter_records().
         """
-        self.log.debug(f"Reading entity_urls associated with collection ID: {collection_id}")
         mysql_cnx = None
         try:
+            streaming = not db_utils.is_transaction_state()
             mysql_cnx = self.db.get_db_connection()
-            cursor = mysql_cnx.cursor()
-            stmt = """SELECT entity_type, urls_type, file_count, size, `release`, url_readme
-                FROM entity_has_urls
-                WHERE collection_id = %s
-                    """
-            data = (collection_id, )
-            self.log.debug(f"Executing stmt {stmt} with data {data}")
-            cursor.execute(stmt, data)
-            
-            entity_url_list = []
-            for row in cursor.fetchall():
-                entity_url = {}
-                entity_url['entity_type'] = row[0]
-                entity_url['urls_type'] = row[1]
-                entity_url['file_count'] = row[2]
-                entity_url['size'] = row[3]
-                entity_url['release'] = row[4]
-                entity_url['url_readme'] = row[5]
-                entity_url_list.append(entity_url)
-            return entity_url_list
-            
+            cursor = mysql_cnx.cursor(buffered=not streaming)
+
+            self.log.debug(f"Executing stmt: {stmt} with params {params}")
+            cursor.execute(stmt, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0]
 
         except Exception as error:
-            self.log.error("Failed in _read_entity_urls() {}".format(error), exc_info=sys.exc_info())
+            self.log.error("Failed in _stream_ids() {}".format(error), exc_info=sys.exc_info())
             raise error
         finally:
             try:
-                if mysql_cnx:
-                    self.db.close_connection(mysql_cnx)
+                # A connection left with unread rows is discarded rather than returned to the pool
+                self.db.close_connection(mysql_cnx)
             except Exception as error:
                 raise error
-    
-
-    def delete(self):
-        """
-        Used to delete a collection and associated records in related tables.
 
-        Parameters: None
-        Returns: None
-        """
-        
+    def _count_rows(self, stmt, params):
         mysql_cnx = None
-
-        if not self.id:
-            raise Exception("Instance does not have required attribute set: 'id'")
-
         try:
             mysql_cnx = self.db.get_db_connection()
             cursor = mysql_cnx.cursor()
-
-            TABLE = "collection"
-            ASSOCIATIONS = {
-                "anatomies" : {
-                    "table" : "collection_assoc_anatomy",
-                    "id_col" : "collection_id"
-                },
-                "files" : {
-                    "table" : "file_in_collection",
-                    "id_col" : "collection_id"
-                },
-                "assays" : {
-                    "table" : "collection_assoc_assay",
-                    "id_col" : "collection_id"
-                },
-                "modalities" : {
-                    "table" : "collection_assoc_modality",
-                    "id_col" : "collection_id"
-                },
-                "projects" : {
-                    "table" : "collection_assoc_project",
-                    "id_col" : "collection_id"
-                },
-                "taxonomies" : {
-                    "table" : "collection_assoc_species",
-                    "id_col" : "collection_id"
-                },
-                "techniques" : {
-                    "table" : "collection_assoc_technique",
-                    "id_col" : "collection_id"
-                },
-                "attributes" : {
-                    "table" : "collection_attributes",
-                    "id_col" : "collection_id"
-                },
-                "collection_defined_by" : {
-                    "table" : "collection_defined_by_file",
-                    "id_col" : "collection_id"
-                },
-                "child_collections" : {
-                    "table" : "collection_has_collection",
-                    "id_col" : "parent_collection_id"
-                },
-                "parent_collections" : {
-                    "table" : "collection_has_collection",
-                    "id_col" : "child_collection_id"
-                },                
-                "contributors" : {
-                    "table" : "collection_has_contributor",
-                    "id_col" : "collection_id"
-                },
-                "subjects" : {
-                    "table" : "subject_assoc_collection",
-                    "id_col" : "collection_id"
-                },
-                "samples" : {
-                    "table" : "sample_assoc_collection",
-                    "id_col" : "collection_id"
-                },
-                "data_use_limitations" : {
-                    "table" : "collection_has_data_use_condition",
-                    "id_col" : "collection_id"
-                },
-                "keywords" : {
-                    "table" : "collection_has_keywords",
-                    "id_col" : "collection_id"
-                }
-            }
-            
-            for assoc_name in ASSOCIATIONS:
-                assoc_details = ASSOCIATIONS[assoc_name]
-                stmt = f"DELETE FROM {assoc_details['table']} WHERE {assoc_details['id_col']} = %({assoc_details['id_col']})s"
-                self.log.debug(f"Executing stmt: {stmt} with value = {self.id}")
-                cursor.execute(stmt, {f"{assoc_details['id_col']}" : self.id})
-            
-            stmt = f"DELETE FROM {TABLE} WHERE id = %(id)s"
-            self.log.debug(f"Executing stmt: {stmt} with id: {self.id}")
-            cursor.execute(stmt, {"id" : self.id})
-            mysql_cnx.commit()
+            stmt = f"SELECT COUNT(*) FROM ({stmt}) AS result"
+            self.log.debug(f"Executing stmt: {stmt} with params {params}")
+            cursor.execute(stmt, params)
+            return cursor.fetchone()[0]
 
         except Exception as error:
-            mysql_cnx.rollback()
-            self.log.error("Failed in delete() {}".format(error), exc_info=sys.exc_info())
+            self.log.error("Failed in _count_rows() {}".format(error), exc_info=sys.exc_info())
             raise error
         finally:
             try:
@@ -2387,3 +964,48 @@ class Collection:
             except Exception as error:
                 raise error
 
+    def _set_operation(self, operation, other_collections, col_type, count, stream, chunk_size):
+        stmt, params = self._set_operation_stmt(operation, other_collections, col_type)
+        if count:
+            return self._count_rows(stmt, params)
+        if stream:
+            return self._stream_ids(stmt, params, chunk_size)
+        return list(self._stream_ids(stmt, params, chunk_size))
+
+    def union(self, other_collections, col_type, count=False, stream=False, chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE):
+        """
+        Internal ids of the members that are in this collection or any of other_collections, computed
+        in the database from the membership table. Ids are distinct and in no particular order.
+
+        :param other_collections: List of Collection instances or internal collection ids
+        :param col_type: The kind of member to compare; one of MEMBER_TYPES, e.g. 'files'
+        :param count: Return only the number of ids
+        :param stream: Return an iterator that reads the ids chunk_size at a time instead of a list
+        :param chunk_size: Rows fetched at a time
+        :return: A list (or iterator) of ids, or their count
+        """
+        return self._set_operation("union", other_collections, col_type, count, stream, chunk_size)
+
+    def intersect(self, other_collections, col_type, count=False, stream=False, chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE):
+        """
+        Internal ids of the members that are in this collection and in every one of other_collections;
+        see union() for the parameters
+        """
+        return self._set_operation("intersect", other_collections, col_type, count, stream, chunk_size)
+
+    def difference(self, other_collections, col_type, count=False, stream=False, chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE):
+        """
+        Internal ids of the members that are in this collection but in none of other_collections;
+        see union() for the parameters
+        """
+        return self._set_operation("difference", other_collections, col_type, count, stream, chunk_size)
+
+    def _delete_tables(self):
+        tables = super()._delete_tables()
+        tables.update(self.DELETE_TABLES)
+        return tables
+
+
+# Replaced in an instance's __dict__ once loaded or assigned; see _LazyAssociation
+for _name in Collection.ASSOCIATIONS:
+    setattr(Collection, _name, _LazyAssociation(_name))
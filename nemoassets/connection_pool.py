@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import deque
+import mysql.connector
+import config
+
+
+conf = config.Config.get_config()
+
+###############################################################################
+# A small connection pool sitting underneath db_utils.Db. Connections are
+# checked out by Db.get_db_connection() and returned to the pool by
+# CustomConnector.close_connection() instead of being torn down, so the
+# TCP + auth handshake is only paid when the pool has to grow.
+#
+# Settings come from the [pool] section of conf/assets.ini:
+#   pool_size     - number of connections kept open while idle
+#   max_overflow  - extra connections allowed under load; closed on check-in
+#   pool_timeout  - seconds to wait for a connection before giving up
+#   idle_timeout  - seconds an idle connection may sit before it is recycled
+#   pre_ping      - ping idle connections at check-out and reconnect if dead
+###############################################################################
+
+class ConnectionPool():
+
+    def __init__(self, connect_args, pool_size=5, max_overflow=10, pool_timeout=30,
+                 idle_timeout=300, pre_ping=True, log=None):
+        self.connect_args = connect_args
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.log = log
+
+        # Idle connections as (connection, time returned to the pool)
+        self._idle = deque()
+        # Number of connections currently open, idle or checked out
+        self._open = 0
+        self._cond = threading.Condition()
+
+        self._stats = {
+            "checkouts" : 0,
+            "checkins" : 0,
+            "connects" : 0,
+            "reconnects" : 0,
+            "waits" : 0,
+            "wait_time" : 0.0,
+            "timeouts" : 0,
+            "discards" : 0,
+            "overflow_closes" : 0,
+            "idle_closes" : 0
+        }
+
+    def _debug(self, msg):
+        if self.log:
+            self.log.debug(msg)
+
+    def _connect(self):
+        cnx = mysql.connector.connect(**self.connect_args)
+        cnx.autocommit = False
+        return cnx
+
+    def _close_quietly(self, cnx):
+        try:
+            cnx.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, cnx):
+        try:
+            cnx.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def checkout(self):
+        """
+        Return an open connection, re-using an idle one when possible.
+
+        Waits up to pool_timeout seconds when pool_size + max_overflow connections
+        are already checked out.
+        """
+        wait_started = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    cnx, returned_at = self._idle.pop()
+                    break
+                if self._open < self.pool_size + self.max_overflow:
+                    # Reserve the slot before releasing the lock to connect
+                    self._open += 1
+                    cnx = None
+                    break
+
+                if wait_started is None:
+                    wait_started = time.monotonic()
+                    self._stats["waits"] += 1
+                remaining = self.pool_timeout - (time.monotonic() - wait_started)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise Exception(f"Timed out after {self.pool_timeout}s waiting for a database connection. "
+                                    f"All {self.pool_size + self.max_overflow} pooled connections are in use.")
+                self._cond.wait(remaining)
+
+            if wait_started is not None:
+                self._stats["wait_time"] += time.monotonic() - wait_started
+            self._stats["checkouts"] += 1
+
+        if cnx is None:
+            try:
+                cnx = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["connects"] += 1
+            self._debug(f"Opened new pooled connection {cnx}")
+            return cnx
+
+        # Recycle connections that have been idle too long, or that fail the health check
+        stale = self.idle_timeout and (time.monotonic() - returned_at) > self.idle_timeout
+        if stale or (self.pre_ping and not self._is_alive(cnx)):
+            self._debug(f"Replacing {'idle' if stale else 'dead'} pooled connection {cnx}")
+            self._close_quietly(cnx)
+            try:
+                cnx = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                if stale:
+                    self._stats["idle_closes"] += 1
+                self._stats["reconnects"] += 1
+        return cnx
+
+    def checkin(self, cnx):
+        """
+        Return a connection to the pool. Any open transaction is rolled back so the
+        next borrower doesn't inherit uncommitted work or a stale read snapshot.
+        """
+        try:
+            cnx.rollback()
+        except Exception:
+            self.discard(cnx)
+            return
+
+        with self._cond:
+            self._stats["checkins"] += 1
+            if len(self._idle) >= self.pool_size:
+                self._open -= 1
+                self._stats["overflow_closes"] += 1
+                self._cond.notify()
+                overflow = True
+            else:
+                self._idle.append((cnx, time.monotonic()))
+                self._cond.notify()
+                overflow = False
+
+        if overflow:
+            self._close_quietly(cnx)
+
+    def discard(self, cnx):
+        """
+        Close a connection that should not go back into the pool, e.g. one
+        with an unread result set or a broken socket.
+        """
+        self._close_quietly(cnx)
+        with self._cond:
+            self._open -= 1
+            self._stats["discards"] += 1
+            self._cond.notify()
+
+    def dispose(self):
+        """Close all idle connections. Checked out connections are unaffected."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for cnx, returned_at in idle:
+            self._close_quietly(cnx)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["open"] = self._open
+            stats["idle"] = len(self._idle)
+            stats["checked_out"] = self._open - len(self._idle)
+        return stats
+
+    def reset_stats(self):
+        with self._cond:
+            for key in self._stats:
+                self._stats[key] = 0.0 if key == "wait_time" else 0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool(log=None):
+    """
+    Return the process-wide pool, creating it from conf/assets.ini on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                connect_args = {
+                    "user" : conf['database']['user'],
+                    "password" : conf['database']['passwd'],
+                    "host" : conf['database']['host'],
+                    "database" : conf['database']['db']
+                }
+                if conf.has_option('database', 'port'):
+                    connect_args["port"] = conf.getint('database', 'port')
+
+                _pool = ConnectionPool(
+                    connect_args,
+                    pool_size=conf.getint('pool', 'pool_size', fallback=5),
+                    max_overflow=conf.getint('pool', 'max_overflow', fallback=10),
+                    pool_timeout=conf.getfloat('pool', 'pool_timeout', fallback=30),
+                    idle_timeout=conf.getfloat('pool', 'idle_timeout', fallback=300),
+                    pre_ping=conf.getboolean('pool', 'pre_ping', fallback=True),
+                    log=log
+                )
+    return _pool
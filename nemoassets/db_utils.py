@@ -1,7 +1,11 @@
 from typing import Any
 import mysql.connector
 import sys
+import time
+import unicodedata
 import config
+import connection_pool
+import lookup_cache
 import transaction_manager
 
 
@@ -12,6 +16,10 @@ conf = config.Config.get_config()
 # Doing it this way because we don't want to import transaction_manager here and in __main__ where
 # it would cause two instances of the transaction_manager module to be instantiated. 
 # Instead, we're relying on the fact that a singly-imported python module is a singleton
+#
+# The transaction itself is scoped to the calling thread / asyncio task (see
+# transaction_manager), so independent loaders can run concurrently in one process,
+# each with its own connection and transaction.
 ###############################################################################
 def begin_txn():
     # print("Beginning transaction")
@@ -39,6 +47,98 @@ def get_connector():
         return transaction_manager.get_connector()
     return None
 
+def is_transaction_state():
+    return transaction_manager.is_transaction_state()
+
+def get_pool_stats():
+    """
+    Return the connection pool counters (checkouts, waits, reconnects, etc.) so the
+    pool can be sized under load. See the [pool] section of conf/assets.ini.
+    """
+    return connection_pool.get_pool().stats()
+
+def get_cache_stats():
+    """
+    Return hit/miss statistics for the reference-data lookup cache.
+    """
+    return lookup_cache.get_cache().stats()
+
+def invalidate_cache(table_name=None):
+    """
+    Drop cached lookups for table_name, or for every table if not specified.
+    Call this after changing reference data outside of this package.
+    """
+    lookup_cache.get_cache().invalidate(table_name)
+
+# Maximum number of values bound into a single "IN (...)" clause. Keeps statements
+# well under max_allowed_packet when querying for thousands of ids at once.
+IN_CLAUSE_CHUNK_SIZE = 1000
+
+# Rows written per multi-row INSERT / executemany() call by the add_*s() bulk loaders
+INSERT_CHUNK_SIZE = 1000
+
+def chunked(values, size=IN_CLAUSE_CHUNK_SIZE):
+    """
+    Yield successive lists of at most size items from values
+    """
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def build_in_clause(values, prefix="v"):
+    """
+    Build the placeholder list for an "IN (...)" clause
+
+    :param: values (list): The values to bind
+    :param: prefix (str): Prefix for the generated parameter names, so several clauses can share one params dict
+
+    :return: a tuple of the placeholder string, e.g. "%(v0)s, %(v1)s", and the matching params dict
+    """
+    params = {f"{prefix}{i}" : value for i, value in enumerate(values)}
+    placeholders = ", ".join(f"%({name})s" for name in params)
+    return placeholders, params
+
+def collation_key(value):
+    """
+    A stand-in for value under MySQL's default case and accent insensitive, PAD SPACE string
+    collations, so that a value read back from the database can be matched to the value that
+    was asked for. Tuples are keyed element by element; other types are returned unchanged.
+    """
+    if isinstance(value, tuple):
+        return tuple(collation_key(element) for element in value)
+    if not isinstance(value, str):
+        return value
+    value = unicodedata.normalize("NFKD", value.rstrip(" "))
+    return "".join(c for c in value if not unicodedata.combining(c)).casefold()
+
+def match_requested(requested, rows, key):
+    """
+    Pair the rows returned by a "WHERE field IN (...)" lookup with the values that were asked for.
+    The database matches under the column's collation, so "TestCohort" may come back as the stored
+    "testcohort"; a row is matched to the requested values equal to it, or failing that equal to it
+    under collation_key().
+
+    :param requested: The values bound in the IN list (tuples for a multi-column key)
+    :param rows: The rows returned
+    :param key: A function returning a row's value (or tuple of values) for the looked up field(s)
+
+    :return: a dict of requested value to the list of rows it matches, in the order of rows.
+        Requested values with no matching row are left out.
+    """
+    exact = {}
+    folded = {}
+    for row in rows:
+        value = key(row)
+        exact.setdefault(value, []).append(row)
+        folded.setdefault(collation_key(value), []).append(row)
+
+    matches = {}
+    for value in requested:
+        found = exact.get(value) or folded.get(collation_key(value))
+        if found:
+            matches[value] = found
+    return matches
+
 class SysOutLog():
     def debug(self, *args, **kwargs):
         print(args)
@@ -77,16 +177,21 @@ class CustomConnector():
         self.base_obj = base_obj
         self.log = log
         self.transaction_state = False
+        self.pool = kwargs.get("pool")
 
     def commit_transaction(self):
         self.log.debug("Committing txn")
-        self.base_obj.commit()
+        if self.base_obj is not None:
+            self.base_obj.commit()
         transaction_manager.set_transaction_state(False)
         self.close_connection()
 
     def rollback_transaction(self):
         self.log.debug("Rollback txn")
-        self.base_obj.rollback()
+        if self.base_obj is not None:
+            self.base_obj.rollback()
+        # Lookups cached during the txn may refer to rows that no longer exist
+        lookup_cache.get_cache().invalidate()
         transaction_manager.set_transaction_state(False)
         self.close_connection()
     
@@ -95,23 +200,186 @@ class CustomConnector():
             self.log.debug("Skipping the close. Inside a txn")
         else:
             self.log.debug("Handling the close.")
-            self.base_obj.cursor().close()
-            self.base_obj.close()
+            self.release()
+
+    def release(self):
+        # Hand the underlying connection back to the pool (or close it if it didn't
+        # come from one). After this the wrapper reports itself as disconnected so
+        # it is never re-used by get_db_connection().
+        base_obj = self.base_obj
+        if base_obj is None:
+            return
+        self.base_obj = None
+        if self.pool:
+            if base_obj.unread_result:
+                # A partially read result set can't be rolled back; drop the connection
+                self.pool.discard(base_obj)
+            else:
+                self.pool.checkin(base_obj)
+        else:
+            base_obj.close()
+
+    def discard(self):
+        # Close the underlying connection rather than returning it to the pool
+        base_obj = self.base_obj
+        if base_obj is None:
+            return
+        self.base_obj = None
+        if self.pool:
+            self.pool.discard(base_obj)
+        else:
+            base_obj.close()
+
+    def is_connected(self):
+        if self.base_obj is None:
+            return False
+        return self.base_obj.is_connected()
 
 
     def commit(self):
         if transaction_manager.is_transaction_state():
-            self.log.debug("Skipping the commit. Inside a txn")
+            batch = transaction_manager.get_batch()
+            if batch:
+                # Each add_*/update_* call commits once when it's done, so inside a
+                # batched transaction a commit marks the end of one entity write
+                batch.record_written()
+            else:
+                self.log.debug("Skipping the commit. Inside a txn")
         else:
             self.log.debug("Handling the commit.")
             self.base_obj.commit()
 
+    def rollback(self):
+        batch = transaction_manager.get_batch()
+        if batch:
+            # Only undo the entity write that failed, not the whole batch
+            batch.rollback_record()
+        else:
+            self.base_obj.rollback()
+            if transaction_manager.is_transaction_state():
+                # Lookups cached during the txn may refer to rows that no longer exist
+                lookup_cache.get_cache().invalidate()
+
     def __getattr__(self, name):
         if name == "transaction_state" or name == "log":
             return object.__getattribute__(self, name)
         return object.__getattribute__(self.base_obj, name)
 
 
+class BatchedTransaction():
+    """
+    Context manager returned by Db.transaction(). Groups entity writes into batches
+    of batch_size per commit and sets a SAVEPOINT before each write so that a single
+    failed add_*/update_* call is rolled back without aborting the rest of the batch.
+
+        with db.transaction(batch_size=1000) as txn:
+            for record in records:
+                try:
+                    file_util.add_file(record)
+                except Exception:
+                    ...  # only this record was rolled back
+        print(txn.stats())
+
+    Batches that were committed before an exception escapes the with block stay
+    committed; only the current, uncommitted batch is rolled back.
+    """
+
+    SAVEPOINT_NAME = "nemo_record"
+
+    def __init__(self, db, batch_size=None):
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f"batch_size must be a positive integer. Received {batch_size}")
+        self.db = db
+        self.log = db.log
+        self.batch_size = batch_size
+        self.cnx = None
+        self._pending = 0
+        self._stats = {
+            "records_written" : 0,
+            "records_rolled_back" : 0,
+            "commits" : 0,
+            "commit_time_total" : 0.0,
+            "commit_time_max" : 0.0,
+            "commit_time_last" : 0.0
+        }
+
+    def __enter__(self):
+        # The transaction state has to be set first so that get_db_connection() makes the
+        # connection the transaction's connector
+        transaction_manager.begin_txn()
+        try:
+            transaction_manager.set_batch(self)
+            # Pin the transaction's connection now so the first savepoint can be set
+            self.cnx = self.db.get_db_connection()
+            self._savepoint()
+        except Exception as error:
+            # __exit__ won't run, so end the transaction here rather than leave this
+            # thread / task in it with no usable connection
+            self.log.error("Failed in BatchedTransaction.__enter__() {}".format(error), exc_info=sys.exc_info())
+            transaction_manager.set_transaction_state(False)
+            if self.cnx is not None:
+                self.cnx.release()
+                self.cnx = None
+            raise error
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self._commit()
+            else:
+                self.log.debug(f"Rolling back uncommitted batch of {self._pending} records")
+                self.cnx.base_obj.rollback()
+                lookup_cache.get_cache().invalidate()
+        finally:
+            transaction_manager.set_transaction_state(False)
+            self.cnx.close_connection()
+            self.log.info(f"Transaction finished: {self.stats()}")
+        return False
+
+    def _execute(self, stmt):
+        cursor = self.cnx.base_obj.cursor()
+        try:
+            cursor.execute(stmt)
+        finally:
+            cursor.close()
+
+    def _savepoint(self):
+        self._execute(f"SAVEPOINT {self.SAVEPOINT_NAME}")
+
+    def _commit(self):
+        started = time.perf_counter()
+        self.cnx.base_obj.commit()
+        elapsed = time.perf_counter() - started
+
+        self._stats["commits"] += 1
+        self._stats["commit_time_total"] += elapsed
+        self._stats["commit_time_last"] = elapsed
+        self._stats["commit_time_max"] = max(self._stats["commit_time_max"], elapsed)
+        self.log.debug(f"Committed batch of {self._pending} records in {elapsed:.4f}s")
+        self._pending = 0
+
+    def record_written(self):
+        self._stats["records_written"] += 1
+        self._pending += 1
+        if self.batch_size and self._pending >= self.batch_size:
+            self._commit()
+        # Everything up to here is kept if the next record fails
+        self._savepoint()
+
+    def rollback_record(self):
+        self.log.debug(f"Rolling back to savepoint {self.SAVEPOINT_NAME}")
+        self._execute(f"ROLLBACK TO SAVEPOINT {self.SAVEPOINT_NAME}")
+        lookup_cache.get_cache().invalidate()
+        self._stats["records_rolled_back"] += 1
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["pending"] = self._pending
+        stats["commit_time_avg"] = stats["commit_time_total"] / stats["commits"] if stats["commits"] else 0.0
+        return stats
+
+
 class Db:
 
     def __init__(self, log=None):
@@ -125,35 +393,57 @@ class Db:
         cnx = get_connector()
 
         if not cnx or not cnx.is_connected(): 
-            self.log.debug("Connecting to assets database.")
-            
-            mysql_cnx = mysql.connector.connect(
-                user=conf['database']['user'],
-                password=conf['database']['passwd'],
-                host=conf['database']['host'],
-                database=conf['database']['db']
-            )
-            
+            self.log.debug("Checking out a connection to assets database.")
+
+            # Connections come from a process-wide pool and go back to it when
+            # close_connection() is called, rather than being torn down each time.
+            pool = connection_pool.get_pool(self.log)
+            mysql_cnx = pool.checkout()
+
             self.log.debug(f"Connected. Connection is {mysql_cnx}")
-            mysql_cnx.autocommit = False
-            custom_connector = CustomConnector(mysql_cnx, self.log)
-            set_connector(custom_connector)
+            custom_connector = CustomConnector(mysql_cnx, self.log, pool=pool)
+            if transaction_manager.is_transaction_state():
+                # Only a connection opened inside a txn becomes the txn's connector.
+                # Outside a txn each caller gets (and releases) its own connection.
+                set_connector(custom_connector)
             self.log.debug("Connected.")
             return custom_connector
         
         # Re-using connector
         return cnx
 
+    def transaction(self, batch_size=None):
+        """
+        Start a batched transaction for use in a with statement.
+
+        :param batch_size: Number of entity writes per commit. None commits once at the end.
+        :return: A BatchedTransaction; call stats() on it for commit counts and latency.
+        """
+        return BatchedTransaction(self, batch_size)
+
     def close_connection(self, cnx):
         try:
-            if(cnx is not None and cnx.is_connected()):
+            if cnx is not None:
                 cnx.close_connection()
         except Exception:
             self.log.error("Failed to close database connection. Squashing this exception.")
+            try:
+                cnx.discard()
+            except Exception:
+                pass
  
     def _get_id_from_unique_value(self, table_name, field, value):
 
         self.log.debug(f"Retrieving {table_name} {field} {value}")
+
+        cache = lookup_cache.get_cache()
+        cache_key = ("id", table_name, field, value)
+        if cache.is_cacheable(table_name):
+            cached_id = cache.get(cache_key)
+            if cached_id is not lookup_cache.MISSING:
+                self.log.debug(f"Returning cached {table_name} ID: {cached_id}")
+                return cached_id
+
         mysql_cnx = None
         try:
             mysql_cnx = self.get_db_connection()
@@ -178,6 +468,8 @@ class Db:
             if results:
                 if len(results) == 1:
                     self.log.debug(f"Returning {table_name} ID: {results[0]['id']}")
+                    if cache.is_cacheable(table_name):
+                        cache.put(cache_key, results[0]['id'])
                     return results[0]['id']
                 else:
                     raise ValueError(f"Retrieved multiple records using {field} from {table_name}. Please use a field that has a unique constraint.")
@@ -193,9 +485,109 @@ class Db:
                 raise error
             
  
+    def _get_ids_for_values(self, table_name, field, values):
+        """
+        Look up the records of table_name whose field is one of values, with one query per
+        IN_CLAUSE_CHUNK_SIZE values that aren't already in the lookup cache.
+
+        :return: A dict of value to the list of IDs with that value. Values with no matching record are left out.
+        """
+        self.log.debug(f"Retrieving {table_name} {field} for {len(values)} values")
+
+        cache = lookup_cache.get_cache()
+        cacheable = cache.is_cacheable(table_name)
+        ids = {}
+        to_fetch = []
+        for value in dict.fromkeys(values):
+            cached_id = cache.get(("id", table_name, field, value)) if cacheable else lookup_cache.MISSING
+            if cached_id is lookup_cache.MISSING:
+                to_fetch.append(value)
+            elif cached_id is not None:
+                ids[value] = [cached_id]
+
+        if not to_fetch:
+            return ids
+
+        mysql_cnx = None
+        try:
+            mysql_cnx = self.get_db_connection()
+            cursor = mysql_cnx.cursor(dictionary=True)
+
+            for chunk in chunked(to_fetch):
+                placeholders, params = build_in_clause(chunk)
+                stmt = f"SELECT id, {field} FROM {table_name} WHERE {field} IN ({placeholders})"
+                self.log.debug(f"Executing stmt {stmt} with params {params}")
+                cursor.execute(stmt, params)
+                # Keyed by the caller's value rather than the stored spelling the collation matched
+                for value, rows in match_requested(chunk, cursor.fetchall(), lambda row : row[field]).items():
+                    ids[value] = [row['id'] for row in rows]
+
+            if cacheable:
+                for value in to_fetch:
+                    # Only unique values are cached, as in _get_id_from_unique_value()
+                    if value in ids and len(ids[value]) == 1:
+                        cache.put(("id", table_name, field, value), ids[value][0])
+            return ids
+
+        except Exception as error:
+            self.log.error("Failed in _get_ids_for_values() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def _get_ids_from_unique_values(self, table_name, field, values):
+        """
+        Batched form of _get_id_from_unique_value()
+
+        :return: A dict of value to ID. Values with no matching record are left out.
+        """
+        ids = self._get_ids_for_values(table_name, field, values)
+        ambiguous = [value for value, matches in ids.items() if len(matches) > 1]
+        if ambiguous:
+            raise ValueError(f"Retrieved multiple records using {field} from {table_name} for {ambiguous}. Please use a field that has a unique constraint.")
+        return {value : matches[0] for value, matches in ids.items()}
+
+    def _delete_where_in(self, cursor, table_name, cols, ids, dry_run=False, chunk_size=IN_CLAUSE_CHUNK_SIZE):
+        """
+        Delete the rows of table_name where any of cols holds one of ids, with one statement
+        per chunk_size ids. Called inside an existing transaction; the caller commits.
+
+        :param cols: Column names, e.g. ['parent_file_id', 'child_file_id'] for an edge table
+        :param dry_run: Count the rows that would be deleted instead of deleting them
+        :return: The number of rows deleted (or that would be)
+        """
+        count = 0
+        for chunk in chunked(ids, chunk_size):
+            placeholders, params = build_in_clause(chunk)
+            where_stmt = " OR ".join(f"{col} IN ({placeholders})" for col in cols)
+            if dry_run:
+                stmt = f"SELECT COUNT(*) FROM {table_name} WHERE {where_stmt}"
+                self.log.debug(f"Executing stmt {stmt} for {len(chunk)} ids")
+                cursor.execute(stmt, params)
+                row = cursor.fetchone()
+                count += list(row.values())[0] if isinstance(row, dict) else row[0]
+            else:
+                stmt = f"DELETE FROM {table_name} WHERE {where_stmt}"
+                self.log.debug(f"Executing stmt {stmt} for {len(chunk)} ids")
+                cursor.execute(stmt, params)
+                count += cursor.rowcount
+        return count
+
     def _get_field_value_for_id(self, table_name, field, id):
 
         self.log.debug(f"Retrieving {table_name} {field}")
+
+        cache = lookup_cache.get_cache()
+        cache_key = ("value", table_name, field, id)
+        if cache.is_cacheable(table_name):
+            cached_value = cache.get(cache_key)
+            if cached_value is not lookup_cache.MISSING:
+                self.log.debug(f"Returning cached {table_name} {field}: {cached_value}")
+                return cached_value
+
         mysql_cnx = None
         try:
             mysql_cnx = self.get_db_connection()
@@ -211,6 +603,8 @@ class Db:
             row = cursor.fetchone()
             if row:
                 self.log.debug(f"Returning {table_name} ID: {row[0]}")
+                if cache.is_cacheable(table_name):
+                    cache.put(cache_key, row[0])
                 return row[0]
             else:
                 return None
@@ -224,6 +618,63 @@ class Db:
             except Exception as error:
                 raise error
             
+    def warm_reference_cache(self, tables=None):
+        """
+        Load whole reference tables (attributes, taxonomy, modality, assay, technique,
+        anatomy, lab) into the lookup cache with one query per table, so later
+        get_*_id() calls are answered without touching the database.
+
+        :param tables: Optional list of table names from lookup_cache.REFERENCE_TABLES. Defaults to all of them.
+        :return: A dict of table name to the number of rows loaded.
+        """
+        cache = lookup_cache.get_cache()
+        if tables is None:
+            tables = list(lookup_cache.REFERENCE_TABLES.keys())
+
+        loaded = {}
+        mysql_cnx = None
+        try:
+            mysql_cnx = self.get_db_connection()
+            cursor = mysql_cnx.cursor(dictionary=True)
+
+            for table_name in tables:
+                if table_name not in lookup_cache.REFERENCE_TABLES:
+                    raise ValueError(f"Expected only the following tables {list(lookup_cache.REFERENCE_TABLES.keys())}, but received {table_name}")
+                if not cache.is_cacheable(table_name):
+                    self.log.debug(f"Not warming {table_name}. Caching is disabled for it.")
+                    continue
+
+                fields = lookup_cache.REFERENCE_TABLES[table_name]
+                stmt = f"SELECT id, {', '.join(fields)} FROM {table_name}"
+                self.log.debug(f"Executing stmt {stmt}")
+                cursor.execute(stmt)
+                rows = cursor.fetchall()
+
+                for field in fields:
+                    ids_by_value = {}
+                    for row in rows:
+                        if row[field] is not None:
+                            ids_by_value.setdefault(row[field], []).append(row['id'])
+                        cache.put(("value", table_name, field, row['id']), row[field])
+                    for value, ids in ids_by_value.items():
+                        # Non-unique values raise in _get_id_from_unique_value(), so leave them uncached
+                        if len(ids) == 1:
+                            cache.put(("id", table_name, field, value), ids[0])
+
+                loaded[table_name] = len(rows)
+
+            self.log.debug(f"Warmed reference cache: {loaded}")
+            return loaded
+
+        except Exception as error:
+            self.log.error("Failed in warm_reference_cache() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
     def get_anatomy_id_by_short_name(self, anatomy):
         """
         Return the database anatomy ID for the anatomy.
@@ -250,6 +701,15 @@ class Db:
         :return: Internal database taxonmy ID
         """
         return self._get_id_from_unique_value("taxonomy", "name", taxonomy)
+
+    def get_taxonomy_ids(self, taxonomies):
+        """
+        Return the database taxonomy IDs for a list of taxonomies
+
+        :param taxonomies: Common taxonomy names such as human, or mouse
+        :return: A dict of taxonomy name to internal database taxonomy ID. Unknown names are left out.
+        """
+        return self._get_ids_from_unique_values("taxonomy", "name", taxonomies)
     
     def get_modality_id(self, modality):
         """
@@ -291,6 +751,9 @@ class Db:
     def get_attribute_id_by_name(self, attribute):
         return self._get_id_from_unique_value("attributes", "attr_name", attribute)
 
+    def get_attribute_ids_by_names(self, attributes):
+        return self._get_ids_from_unique_values("attributes", "attr_name", attributes)
+
     def get_lab_name_by_id(self, id):
         """
         Return the laboratory name for the laboratory ID.
@@ -371,3 +834,12 @@ class Db:
         :return: Internal database collection ID.
         """
         return self._get_id_from_unique_value("collection", "short_name", short_name)
+
+    def get_collection_ids_by_short_names(self, short_names):
+        """
+        Return the collection IDs for a list of collection short names
+
+        :param short_names: The collection short_names
+        :return: A dict of short_name to internal database collection ID. Unknown names are left out.
+        """
+        return self._get_ids_from_unique_values("collection", "short_name", short_names)
@@ -1,4 +1,5 @@
 import sys
+import db_utils
 from base import Base
 
 
@@ -32,14 +33,24 @@ class Event(Base):
     def __init__(self, log=None, params={}):   
         super().__init__(log, Event, params)
 
-    def _load_associations(self, event, event_id, delete_before_insert, cursor):
+    def _assoc_values(self, event, event_id, attribute_ids=None):
+        """
+        Build the rows to insert into the association tables for one event
+
+        :param event: A dict that represents the event object
+        :param event_id: The event's internal id
+        :param attribute_ids: Optional dict of attr_name to attributes id, as resolved once per
+            batch by add_events(). When not given, each attr_name is looked up individually.
+        :return: A dict of association name to the list of column / value dicts for that association
+        """
 
         REQUIRED_ATTRIBUTE_KEYS = ['attr_name', 'value', 'unit']
 
+        assoc_values = {}
+
         # Iterate over the allowed associations
-        # if the association is in the library dict
+        # if the association is in the event dict
         #   Build the specific dict of column names / values needed for this particular association
-        #   Call create_assoc with the assocation info and the column / values dict
         for assoc in self.ASSOCIATIONS:
             values_list = []
             if assoc in event and event[assoc]:
@@ -52,7 +63,10 @@ class Event(Base):
                         if not all(key in attr for key in REQUIRED_ATTRIBUTE_KEYS):
                             raise ValueError(f"Attributes require the following keys: {REQUIRED_ATTRIBUTE_KEYS}")
                         self.log.debug(f"Processing attribute {attr['attr_name']}")
-                        attributes_id = self.db.get_attribute_id_by_name(attr['attr_name'])
+                        if attribute_ids is None:
+                            attributes_id = self.db.get_attribute_id_by_name(attr['attr_name'])
+                        else:
+                            attributes_id = attribute_ids.get(attr['attr_name'])
                         if not attributes_id:
                             self.log.error(f"Cannot find attribute with name: {attr['attr_name']}")
                             raise Exception(f"Cannot find attribute with name: {attr['attr_name']}")
@@ -62,16 +76,36 @@ class Event(Base):
                         values_list.append(values)
                 else:
                     raise NotImplementedError("This association has not yet been implemented")
-                
-                if assoc in delete_before_insert:
-                    self._delete_assoc(self.ASSOCIATIONS[assoc], cursor)
 
-                for values in values_list:
-                    self._create_assoc(self.ASSOCIATIONS[assoc], values, cursor)
+                assoc_values[assoc] = values_list
+
+        return assoc_values
+
+    def _load_associations(self, event, event_id, delete_before_insert, cursor):
+
+        # Call create_assoc with the assocation info and the column / values dict
+        for assoc, values_list in self._assoc_values(event, event_id).items():
+            if assoc in delete_before_insert:
+                self._delete_assoc(self.ASSOCIATIONS[assoc], self.ASSOCIATIONS[assoc]['id_col'], event_id, cursor)
+
+            for values in values_list:
+                self._create_assoc(self.ASSOCIATIONS[assoc], values, cursor)
 
     
     def get_all_events(self):
         return self._get_records()
+
+    def iter_events(self, params={}, assoc=[], chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE, as_records=False):
+        """
+        Yields Event instances chunk_size at a time; see Base._iter_records()
+        """
+        return self._iter_records(params, assoc, chunk_size, as_records=as_records)
+
+    def get_events_page(self, params={}, assoc=[], after_id=None, limit=100, order_by="id", descending=False, as_records=False):
+        """
+        One page of Event records and the cursor for the next page; see Base._get_records_page()
+        """
+        return self._get_records_page(params, assoc, after_id, limit, order_by, descending, as_records=as_records)
     
     def get_event(self, params, assoc=[]):
         return self._get_record(params, assoc)
@@ -139,6 +173,47 @@ class Event(Base):
             except Exception as error:
                 raise error
     
+    def add_events(self, events:list, chunk_size=db_utils.INSERT_CHUNK_SIZE):
+        """
+        Bulk form of add_event(). Attribute names are resolved once for the whole batch, and
+        event rows and association rows are written with multi-row inserts in a single transaction.
+
+        Parameters:
+            events (list): dicts that each represent an event, as for add_event(). Event names
+                are only unique per subject, so each (subject_id, event_name) pair may appear once.
+            chunk_size (int): Rows per INSERT statement
+
+        Returns:
+            A dict of (subject_id, event_name) to the new event's internal id, in the order of events
+        """
+        mysql_cnx = None
+
+        try:
+            attribute_ids = self._attribute_ids_for(events, "subject_attributes")
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            rows = [{field : evt[field] for field in self.FIELDS if field in evt} for evt in events]
+            ids = self._insert_rows(rows, ["subject_id", "event_name"], cursor, chunk_size)
+            self.log.debug(f"Inserted {len(ids)} events")
+
+            self._create_assocs_for(events, list(ids.values()), cursor, chunk_size, attribute_ids)
+
+            mysql_cnx.commit()
+            return ids
+
+        except Exception as error:
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in add_events() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
     def update_event(self, evt={}):
         raise NotImplementedError("The event.update_event() function hasn't yet been implemented")
     
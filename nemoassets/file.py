@@ -1,4 +1,5 @@
 import sys
+import db_utils
 from datetime import date
 from base import Base
 import library
@@ -34,7 +35,8 @@ class File(Base):
         "file_parents" : {
             "table" : "file_assoc_file",
             "cols" : ["child_file_id", "parent_file_id", "relationship"],
-            "id_col" : "parent_file_id"
+            "id_col" : "parent_file_id",
+            "owner_col" : "child_file_id" # A file owns the edges to its parents; used when deleting or syncing them
         },
         "libraries" : {
             "table" : "library_assoc_file",
@@ -62,7 +64,8 @@ class File(Base):
     SELF_JOIN_TABLE = {
         "table" : "file_assoc_file",
         "parent_field" : "parent_file_id",
-        "child_field" : "child_file_id"
+        "child_field" : "child_file_id",
+        "closure_table" : "file_closure" # see lineage_closure.py
     }
 
     ATTRS = ["id"] + list(FIELDS.keys()) + list(ASSOCIATIONS.keys())
@@ -70,17 +73,26 @@ class File(Base):
     def __init__(self, log=None, params={}):
         super().__init__(log, File, params)
 
-    def _load_associations(self, file, file_id, delete_before_insert, cursor):
+    def _assoc_values(self, file, file_id, collection_ids=None):
+        """
+        Build the rows to insert into the association tables for one file
+
+        :param file: A dict that represents the file object
+        :param file_id: The file's internal id
+        :param collection_ids: Optional dict of collection short_name to id, as resolved once per
+            batch by add_files(). When not given, each short_name is looked up individually.
+        :return: A dict of association name to the list of column / value dicts for that association
+        """
         
         REQUIRED_FILE_ATTRIBUTE_KEYS = ['key', 'value']
         REQUIRED_ANALYSIS_ATTRIBUTE_KEYS = ['name', 'value', 'analysis_id']
         REQUIRED_ASSOC_FILE_KEYS = ['parent_file_id']
         
+        assoc_values = {}
 
         # Iterate over the allowed associations
         # if the association is in the file dict
         #   Build the specific dict of column names / values needed for this particular association
-        #   Call create_assoc with the assocation info and the column / values dict
         for assoc in self.ASSOCIATIONS:
             values_list = []
             if assoc in file and file[assoc]:
@@ -131,7 +143,10 @@ class File(Base):
                     raise NotImplementedError(f"This association has not yet been implemented: {assoc}")
                 elif assoc == "collections":
                     for short_name in file[assoc]:
-                        col_id = self.db.get_collection_id_by_short_name(short_name)
+                        if collection_ids is None:
+                            col_id = self.db.get_collection_id_by_short_name(short_name)
+                        else:
+                            col_id = collection_ids[short_name]
                         values = { "collection_id" : col_id, "file_id" : file_id }
                         values_list.append(values)
                 elif assoc == "data_use_limitations":
@@ -140,12 +155,21 @@ class File(Base):
                         values_list.append(values)
                 else:
                     raise NotImplementedError(f"This association has not yet been implemented: {assoc}")
-                
-                if assoc in delete_before_insert:
-                    self._delete_assoc(self.ASSOCIATIONS[assoc], cursor)
 
-                for values in values_list:
-                    self._create_assoc(self.ASSOCIATIONS[assoc], values, cursor)
+                assoc_values[assoc] = values_list
+
+        return assoc_values
+
+    def _load_associations(self, file, file_id, delete_before_insert, cursor):
+
+        # Call create_assoc with the assocation info and the column / values dict
+        for assoc, values_list in self._assoc_values(file, file_id).items():
+            if assoc in delete_before_insert:
+                key_field = self._owner_col(assoc)
+                self._delete_assoc(self.ASSOCIATIONS[assoc], key_field, file_id, cursor)
+
+            for values in values_list:
+                self._create_assoc(self.ASSOCIATIONS[assoc], values, cursor)
 
 
     @property
@@ -168,8 +192,20 @@ class File(Base):
     def get_file(self, params:dict, assoc=[]):
         return self._get_record(params, assoc)
     
-    def get_files(self, params={}, assoc={}):
-        return self._get_records(params, assoc)
+    def get_files(self, params={}, assoc={}, as_records=False, as_frame=False, as_arrow=False):
+        return self._get_records(params, assoc, as_records=as_records, as_frame=as_frame, as_arrow=as_arrow)
+
+    def iter_files(self, params={}, assoc=[], chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE, as_records=False):
+        """
+        Like get_files() but yields File instances chunk_size at a time; see Base._iter_records()
+        """
+        return self._iter_records(params, assoc, chunk_size, as_records=as_records)
+
+    def get_files_page(self, params={}, assoc=[], after_id=None, limit=100, order_by="id", descending=False, as_records=False):
+        """
+        One page of File records and the cursor for the next page; see Base._get_records_page()
+        """
+        return self._get_records_page(params, assoc, after_id, limit, order_by, descending, as_records=as_records)
     
     def get_file_by_filename(self, file_name):
         """
@@ -180,6 +216,22 @@ class File(Base):
     
     def get_file_ancestors(self, flattened=True):
         return self._get_ancestors(flattened)
+
+    def get_file_ancestors_for(self, file_ids:list, flattened=False):
+        """
+        Ancestors of many files at once; see Base._batched_lineage_search()
+
+        :return: a dict of file ID to its ancestors, as a list per level unless flattened
+        """
+        return self._get_ancestors_for(file_ids, flattened)
+
+    def get_file_descendants_for(self, file_ids:list, flattened=False):
+        """
+        Descendants of many files at once; see Base._batched_lineage_search()
+
+        :return: a dict of file ID to its descendants, as a list per level unless flattened
+        """
+        return self._get_descendants_for(file_ids, flattened)
     
     def add_file(self, file):
         mysql_cnx = None
@@ -212,6 +264,119 @@ class File(Base):
                 raise error
 
 
+    def add_files(self, files:list, chunk_size=db_utils.INSERT_CHUNK_SIZE, reread=True):
+        """
+        Bulk form of add_file(). File rows are written with multi-row INSERTs, grouped by
+        which optional fields they supply, and the association rows (file_attributes,
+        analysis_attributes, file_parents, libraries, collections, data_use_limitations)
+        with one executemany() per table and chunk, all in a single transaction.
+
+        Parameters:
+            files (list): dicts that each represent a file object, as for add_file(). The
+                file_id values must be unique; they are used to read back the generated ids.
+            chunk_size (int): Rows per INSERT statement
+            reread (bool): Re-read the new files once they are committed. Set to False to
+                skip that query when loading large manifests.
+
+        Returns:
+            A list of File instances in the order of files if reread is set, otherwise a
+            dict of file_id to the new file's internal id
+        """
+        mysql_cnx = None
+
+        try:
+            # Resolve every collection short_name used by the batch with one query per chunk
+            short_names = [short_name for f in files for short_name in (f.get("collections") or [])]
+            collection_ids = self.db.get_collection_ids_by_short_names(short_names) if short_names else {}
+            unknown = [short_name for short_name in dict.fromkeys(short_names) if short_name not in collection_ids]
+            if unknown:
+                raise Exception(f"Unable to retrieve collections: {unknown}")
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            rows = [{field : f[field] for field in self.FIELDS if field in f} for f in files]
+            ids = self._insert_rows(rows, ["file_id"], cursor, chunk_size)
+            self.log.debug(f"Inserted {len(ids)} files")
+
+            self._create_assocs_for(files, list(ids.values()), cursor, chunk_size, collection_ids)
+
+            mysql_cnx.commit()
+
+            if not reread:
+                return ids
+            # Re-read in IN_CLAUSE_CHUNK_SIZE slices so a large manifest doesn't build one huge IN (...)
+            by_id = {}
+            for chunk in db_utils.chunked(list(ids.values())):
+                by_id.update({f.id : f for f in self.get_files({"id" : chunk})})
+            return [by_id[file_id] for file_id in ids.values()]
+
+        except Exception as error:
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in add_files() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+
+    def upsert_files(self, files:list, chunk_size=db_utils.INSERT_CHUNK_SIZE, sync:list=[]):
+        """
+        Insert new files and update existing ones, matched on file_id, without reading each
+        file first; see Base._upsert_rows(). Associations (attributes, parents, libraries,
+        collections, data use limitations) are only written for the files that are inserted;
+        those of existing files are left as they are unless named in sync.
+
+        Parameters:
+            files (list): dicts that each represent a file object. New files need the required
+                fields; existing ones only file_id and the fields to change.
+            chunk_size (int): Rows per statement
+            sync (list): Associations, such as 'attributes', to bring in line with the lists given
+                for existing files; see Base._sync_associations(). Only the rows that differ are
+                deleted or inserted.
+
+        Returns:
+            A dict with keys 'inserted', 'changed' and 'untouched', each a dict of file_id to internal id.
+            With sync, files whose association rows changed count as changed, and 'associations'
+            holds the rows inserted and deleted per association.
+        """
+        mysql_cnx = None
+
+        try:
+            short_names = [short_name for f in files for short_name in (f.get("collections") or [])]
+            collection_ids = self.db.get_collection_ids_by_short_names(short_names) if short_names else {}
+            unknown = [short_name for short_name in dict.fromkeys(short_names) if short_name not in collection_ids]
+            if unknown:
+                raise Exception(f"Unable to retrieve collections: {unknown}")
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            rows = [{field : f[field] for field in self.FIELDS if field in f} for f in files]
+            report = self._upsert_rows(rows, "file_id", cursor, chunk_size)
+
+            inserted = [f for f in files if f["file_id"] in report["inserted"]]
+            self._create_assocs_for(inserted, [report["inserted"][f["file_id"]] for f in inserted], cursor, chunk_size, collection_ids)
+            if sync:
+                self._sync_upserted(files, "file_id", report, sync, cursor, chunk_size, collection_ids)
+
+            mysql_cnx.commit()
+            return report
+
+        except Exception as error:
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in upsert_files() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
     def update_file(self, file:dict, delete_before_insert:list=[]):
         """
         Used to update a file record and associated records in related tables.
@@ -1,4 +1,5 @@
 import sys
+import db_utils
 import itertools
 from base import Base
 
@@ -28,7 +29,8 @@ class Library(Base):
         "lib_assoc_lib_pool" : {
             "table" : "library_assoc_library_pool",
             "cols" : ["library_id", "library_pool_id"],
-            "id_col" : "id" # id_col only required for queries so that the generic base.py can figure out the join stmt
+            "id_col" : "id", # id_col only required for queries so that the generic base.py can figure out the join stmt
+            "owner_col" : "library_id" # column holding this library's id when deleting or syncing rows
         },
         "attributes" : { 
             "table" : "library_attributes",
@@ -69,7 +71,8 @@ class Library(Base):
     SELF_JOIN_TABLE = {
         "table" : "library_assoc_library",
         "parent_field" : "parent_library_id",
-        "child_field" : "child_library_id"
+        "child_field" : "child_library_id",
+        "closure_table" : "library_closure" # see lineage_closure.py
     }
 
     # These are the fields allowed for use in the constructor; it includes associations
@@ -78,15 +81,25 @@ class Library(Base):
     def __init__(self, log=None, params={}):   
         super().__init__(log, Library, params)
 
-    def _load_associations(self, library, lib_id, delete_before_insert, cursor):
+    def _assoc_values(self, library, lib_id, attribute_ids=None):
+        """
+        Build the rows to insert into the association tables for one library
+
+        :param library: A dict that represents the library object
+        :param lib_id: The library's internal id
+        :param attribute_ids: Optional dict of attr_name to attributes id, as resolved once per
+            batch by add_libraries(). When not given, each attr_name is looked up individually.
+        :return: A dict of association name to the list of column / value dicts for that association
+        """
         
         REQUIRED_LIB_ASSOC_LIB_KEYS = ['child_library_id', 'parent_library_id']
         REQUIRED_ATTRIBUTE_KEYS = ['attr_name', 'value', 'unit']
 
+        assoc_values = {}
+
         # Iterate over the allowed associations
         # if the association is in the library dict
         #   Build the specific dict of column names / values needed for this particular association
-        #   Call create_assoc with the assocation info and the column / values dict
         for assoc in self.ASSOCIATIONS:
             values_list = []
             if assoc in library and library[assoc]:
@@ -113,7 +126,10 @@ class Library(Base):
                         if not all(key in attr for key in REQUIRED_ATTRIBUTE_KEYS):
                             raise ValueError(f"Attributes require the following keys: {REQUIRED_ATTRIBUTE_KEYS}")
                         self.log.debug(f"Processing attribute {attr['attr_name']}")
-                        attributes_id = self.db.get_attribute_id_by_name(attr['attr_name'])
+                        if attribute_ids is None:
+                            attributes_id = self.db.get_attribute_id_by_name(attr['attr_name'])
+                        else:
+                            attributes_id = attribute_ids.get(attr['attr_name'])
                         if not attributes_id:
                             self.log.error(f"Cannot find attribute with name: {attr['attr_name']}")
                             raise Exception(f"Cannot find attribute with name: {attr['attr_name']}")
@@ -123,18 +139,39 @@ class Library(Base):
                         values_list.append(values)                
                 else:
                     raise NotImplementedError(f"This {assoc} association has not yet been implemented")
-                
-                if assoc in delete_before_insert:
-                    self._delete_assoc(self.ASSOCIATIONS[assoc], cursor)
 
-                for values in values_list:
-                    self._create_assoc(self.ASSOCIATIONS[assoc], values, cursor)
+                assoc_values[assoc] = values_list
+
+        return assoc_values
+
+    def _load_associations(self, library, lib_id, delete_before_insert, cursor):
+
+        # Call create_assoc with the assocation info and the column / values dict
+        for assoc, values_list in self._assoc_values(library, lib_id).items():
+            if assoc in delete_before_insert:
+                key_field = self._owner_col(assoc)
+                self._delete_assoc(self.ASSOCIATIONS[assoc], key_field, lib_id, cursor)
+
+            for values in values_list:
+                self._create_assoc(self.ASSOCIATIONS[assoc], values, cursor)
 
     def get_all_libraries(self):
         return self._get_records()
 
-    def get_libraries(self, params={}, assoc=[]):
-        return self._get_records(params, assoc)
+    def get_libraries(self, params={}, assoc=[], as_records=False, as_frame=False, as_arrow=False):
+        return self._get_records(params, assoc, as_records=as_records, as_frame=as_frame, as_arrow=as_arrow)
+
+    def iter_libraries(self, params={}, assoc=[], chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE, as_records=False):
+        """
+        Like get_libraries() but yields Library instances chunk_size at a time; see Base._iter_records()
+        """
+        return self._iter_records(params, assoc, chunk_size, as_records=as_records)
+
+    def get_libraries_page(self, params={}, assoc=[], after_id=None, limit=100, order_by="id", descending=False, as_records=False):
+        """
+        One page of Library records and the cursor for the next page; see Base._get_records_page()
+        """
+        return self._get_records_page(params, assoc, after_id, limit, order_by, descending, as_records=as_records)
     
     def get_library(self, params:dict, assoc=[]):
         return self._get_record(params, assoc)
@@ -145,6 +182,22 @@ class Library(Base):
     def get_library_ancestors(self, flattened=True):
         return self._get_ancestors(flattened)
 
+    def get_library_ancestors_for(self, library_ids:list, flattened=False):
+        """
+        Ancestors of many libraries at once; see Base._batched_lineage_search()
+
+        :return: a dict of library ID to its ancestors, as a list per level unless flattened
+        """
+        return self._get_ancestors_for(library_ids, flattened)
+
+    def get_library_descendants_for(self, library_ids:list, flattened=False):
+        """
+        Descendants of many libraries at once; see Base._batched_lineage_search()
+
+        :return: a dict of library ID to its descendants, as a list per level unless flattened
+        """
+        return self._get_descendants_for(library_ids, flattened)
+
     def add_library(self, library = {}):
         mysql_cnx = None
 
@@ -175,6 +228,47 @@ class Library(Base):
             except Exception as error:
                 raise error
 
+    def add_libraries(self, libraries:list, chunk_size=db_utils.INSERT_CHUNK_SIZE):
+        """
+        Bulk form of add_library(). Attribute names are resolved once for the whole batch, and
+        library rows and association rows are written with multi-row inserts in a single transaction.
+
+        Parameters:
+            libraries (list): dicts that each represent a library object, as for add_library().
+                The lib_id values must be unique.
+            chunk_size (int): Rows per INSERT statement
+
+        Returns:
+            A dict of lib_id to the new library's internal id, in the order of libraries
+        """
+        mysql_cnx = None
+
+        try:
+            attribute_ids = self._attribute_ids_for(libraries, "attributes")
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            rows = [{field : lib[field] for field in self.FIELDS if field in lib} for lib in libraries]
+            ids = self._insert_rows(rows, ["lib_id"], cursor, chunk_size)
+            self.log.debug(f"Inserted {len(ids)} libraries")
+
+            self._create_assocs_for(libraries, list(ids.values()), cursor, chunk_size, attribute_ids)
+
+            mysql_cnx.commit()
+            return ids
+
+        except Exception as error:
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in add_libraries() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
     def update_library(self, lib={}):
         raise NotImplementedError("The library.update_library() function hasn't yet been implemented")
 
@@ -0,0 +1,334 @@
+import sys
+import argparse
+import itertools
+import config
+import db_utils
+
+
+conf = config.Config.get_config()
+
+###############################################################################
+# Optional closure tables for the lineage graphs of File and Library.
+#
+# For each SELF_JOIN_TABLE that names a 'closure_table', that table holds one
+# (ancestor_id, descendant_id, depth) row for every pair of records connected
+# by a path in the edge table, with depth being the shortest such path. An
+# ancestor/descendant lookup then becomes a single indexed read.
+#
+# When the [lineage] 'closure' option is set, Base._create_assoc() and
+# Base._delete_assoc() keep the closure in step with the edge table inside the
+# same transaction, and the lineage getters read from it. That only works for
+# models whose edges are written through those functions, i.e. whose edge table
+# is one of their ASSOCIATIONS; enabled_for() refuses any other model. Edges
+# written outside this library (including before the option was turned on) are
+# only picked up by a rebuild. Rebuild or check a closure table from the
+# command line with:
+#   python lineage_closure.py rebuild|check|create file|library
+###############################################################################
+
+CLOSURE_ENABLED = conf.getboolean('lineage', 'closure', fallback=False)
+
+# Checked by check(); at most this many discrepancies are returned per category
+CHECK_SAMPLE_SIZE = 20
+
+
+class LineageClosure():
+
+    def __init__(self, model):
+        """
+        :param: model: A File or Library instance; its SELF_JOIN_TABLE describes the graph
+        """
+        if not LineageClosure.supported_for(model):
+            raise NotImplementedError(f"No closure table has been set up for {model.TABLE}")
+
+        self.model = model
+        self.log = model.log
+        self.db = model.db
+
+        self.edge_table = model.SELF_JOIN_TABLE['table']
+        self.parent_field = model.SELF_JOIN_TABLE['parent_field']
+        self.child_field = model.SELF_JOIN_TABLE['child_field']
+        self.table = model.SELF_JOIN_TABLE['closure_table']
+
+    @staticmethod
+    def supported_for(model):
+        """
+        Whether model has a closure table that this library can keep up to date: one is named in its
+        SELF_JOIN_TABLE, and the edge table is one of its ASSOCIATIONS so edges are written through
+        Base._create_assoc() / _create_assocs() / _delete_assoc()
+        """
+        if not hasattr(model, "SELF_JOIN_TABLE") or "closure_table" not in model.SELF_JOIN_TABLE:
+            return False
+        edge_table = model.SELF_JOIN_TABLE['table']
+        return any(details['table'] == edge_table for details in getattr(model, "ASSOCIATIONS", {}).values())
+
+    @staticmethod
+    def enabled_for(model):
+        return CLOSURE_ENABLED and LineageClosure.supported_for(model)
+
+    def _execute(self, cursor, stmt, params=None):
+        self.log.debug(f"Executing stmt: {stmt} with params {params}")
+        cursor.execute(stmt, params)
+
+    def _select_column(self, cursor, stmt, params, field):
+        self._execute(cursor, stmt, params)
+        return [row[field] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+    def create_table(self, cursor):
+        stmt = f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                ancestor_id INT NOT NULL,
+                descendant_id INT NOT NULL,
+                depth INT NOT NULL,
+                PRIMARY KEY (ancestor_id, descendant_id),
+                KEY {self.table}_descendant (descendant_id, depth)
+            )
+        """
+        self._execute(cursor, stmt)
+
+    def add_edge(self, parent_id, child_id, cursor):
+        """
+        Record a new parent -> child edge: every ancestor of the parent (and the parent itself)
+        becomes an ancestor of the child and all of its descendants. Existing pairs keep the
+        shorter of their current and new depth.
+        """
+        stmt = f"""
+            INSERT INTO {self.table} (ancestor_id, descendant_id, depth)
+            SELECT up.node_id, down.node_id, up.node_depth + down.node_depth + 1
+            FROM (
+                SELECT ancestor_id AS node_id, depth AS node_depth FROM {self.table} WHERE descendant_id = %(parent_id)s
+                UNION ALL
+                SELECT %(parent_id)s, 0
+            ) up
+            CROSS JOIN (
+                SELECT descendant_id AS node_id, depth AS node_depth FROM {self.table} WHERE ancestor_id = %(child_id)s
+                UNION ALL
+                SELECT %(child_id)s, 0
+            ) down
+            WHERE up.node_id <> down.node_id
+            ON DUPLICATE KEY UPDATE depth = LEAST(depth, VALUES(depth))
+        """
+        self._execute(cursor, stmt, {"parent_id" : parent_id, "child_id" : child_id})
+
+    def refresh_descendants(self, node_ids, cursor):
+        """
+        Recompute the closure rows of node_ids and everything below them from the edge table.
+        Called after edges into node_ids have been deleted: only paths ending at or below those
+        nodes can have changed.
+        """
+        node_ids = list(dict.fromkeys(node_ids))
+        affected = set(node_ids)
+        for chunk in db_utils.chunked(node_ids):
+            placeholders, params = db_utils.build_in_clause(chunk)
+            stmt = f"SELECT DISTINCT descendant_id FROM {self.table} WHERE ancestor_id IN ({placeholders})"
+            affected.update(self._select_column(cursor, stmt, params, "descendant_id"))
+
+        for chunk in db_utils.chunked(sorted(affected)):
+            placeholders, params = db_utils.build_in_clause(chunk)
+            self._execute(cursor, f"DELETE FROM {self.table} WHERE descendant_id IN ({placeholders})", params)
+            self._insert_lineage(chunk, cursor)
+
+    def remove_node(self, node_id, cursor):
+        """
+        Drop a deleted record from the closure and recompute its former descendants.
+        Call after the record's edges have been deleted.
+        """
+        self.remove_nodes([node_id], cursor)
+
+    def remove_nodes(self, node_ids, cursor):
+        """
+        Batched form of remove_node()
+        """
+        node_ids = list(dict.fromkeys(node_ids))
+        removed = set(node_ids)
+        descendants = set()
+        for chunk in db_utils.chunked(node_ids):
+            placeholders, params = db_utils.build_in_clause(chunk)
+            stmt = f"SELECT DISTINCT descendant_id FROM {self.table} WHERE ancestor_id IN ({placeholders})"
+            descendants.update(self._select_column(cursor, stmt, params, "descendant_id"))
+            self._execute(cursor, f"DELETE FROM {self.table} WHERE ancestor_id IN ({placeholders}) OR descendant_id IN ({placeholders})", params)
+
+        descendants -= removed
+        if descendants:
+            self.refresh_descendants(sorted(descendants), cursor)
+
+    def _insert_lineage(self, node_ids, cursor):
+        """
+        Insert closure rows for node_ids, computed from the edge table on the same cursor
+        """
+        ancestors = self.model._batched_lineage_search(node_ids, True, False, cursor)
+        rows = []
+        for node_id, levels in ancestors.items():
+            for level, ancestor_ids in enumerate(levels):
+                rows.extend((ancestor_id, node_id, level + 1) for ancestor_id in ancestor_ids)
+
+        stmt = f"INSERT INTO {self.table} (ancestor_id, descendant_id, depth) VALUES (%s, %s, %s)"
+        for chunk in db_utils.chunked(rows):
+            self.log.debug(f"Executing stmt: {stmt} for {len(chunk)} rows")
+            cursor.executemany(stmt, chunk)
+
+    def get_lineage(self, record_ids:list, find_ancestors:bool, flatten_results:bool):
+        """
+        Same return shape as Base._batched_lineage_search(), read from the closure table
+        """
+        mysql_cnx = None
+
+        try:
+            if find_ancestors:
+                this_node_field, next_node_field = "descendant_id", "ancestor_id"
+            else:
+                this_node_field, next_node_field = "ancestor_id", "descendant_id"
+
+            record_ids = list(dict.fromkeys(record_ids))
+            results = {record_id : [] for record_id in record_ids}
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor(dictionary=True)
+
+            for chunk in db_utils.chunked(record_ids):
+                placeholders, params = db_utils.build_in_clause(chunk)
+                stmt = f"""
+                    SELECT {this_node_field} AS record_id, {next_node_field} AS node_id, depth
+                    FROM {self.table}
+                    WHERE {this_node_field} IN ({placeholders})
+                    ORDER BY depth, node_id
+                """
+                self._execute(cursor, stmt, params)
+                for row in cursor.fetchall():
+                    levels = results[row["record_id"]]
+                    while len(levels) < row["depth"]:
+                        levels.append([])
+                    levels[row["depth"] - 1].append(row["node_id"])
+
+            if flatten_results:
+                return {record_id : list(itertools.chain.from_iterable(levels)) for record_id, levels in results.items()}
+            return results
+
+        except Exception as error:
+            self.log.error("Failed in get_lineage() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def _graph_node_ids(self, cursor):
+        stmt = f"""
+            SELECT {self.child_field} AS node_id FROM {self.edge_table}
+            UNION
+            SELECT descendant_id FROM {self.table}
+        """
+        return sorted(self._select_column(cursor, stmt, None, "node_id"))
+
+    def rebuild(self):
+        """
+        Recreate the whole closure table from the edge table in one transaction
+        """
+        mysql_cnx = None
+
+        try:
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            self.create_table(cursor)
+            self._execute(cursor, f"DELETE FROM {self.table}")
+            stmt = f"SELECT DISTINCT {self.child_field} FROM {self.edge_table}"
+            node_ids = sorted(self._select_column(cursor, stmt, None, self.child_field))
+            for chunk in db_utils.chunked(node_ids):
+                self._insert_lineage(chunk, cursor)
+
+            mysql_cnx.commit()
+            self.log.info(f"Rebuilt {self.table} for {len(node_ids)} records")
+
+        except Exception as error:
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in rebuild() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def check(self):
+        """
+        Compare the closure table against the lineage computed from the edge table
+
+        :return: a dict with the number of records checked, counts of missing, extra and
+            wrong-depth (ancestor_id, descendant_id, depth) rows, and a sample of each
+        """
+        mysql_cnx = None
+
+        try:
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor(dictionary=True)
+
+            report = {"checked" : 0, "missing" : 0, "extra" : 0, "wrong_depth" : 0, "samples" : {"missing" : [], "extra" : [], "wrong_depth" : []}}
+
+            for chunk in db_utils.chunked(self._graph_node_ids(cursor)):
+                expected = {}
+                for node_id, levels in self.model._batched_lineage_search(chunk, True, False, cursor).items():
+                    for level, ancestor_ids in enumerate(levels):
+                        for ancestor_id in ancestor_ids:
+                            expected[(ancestor_id, node_id)] = level + 1
+
+                placeholders, params = db_utils.build_in_clause(chunk)
+                stmt = f"SELECT ancestor_id, descendant_id, depth FROM {self.table} WHERE descendant_id IN ({placeholders})"
+                self._execute(cursor, stmt, params)
+                stored = {(row["ancestor_id"], row["descendant_id"]) : row["depth"] for row in cursor.fetchall()}
+
+                problems = {
+                    "missing" : [key + (depth,) for key, depth in expected.items() if key not in stored],
+                    "extra" : [key + (depth,) for key, depth in stored.items() if key not in expected],
+                    "wrong_depth" : [key + (depth,) for key, depth in stored.items() if key in expected and expected[key] != depth]
+                }
+                for problem, rows in problems.items():
+                    report[problem] += len(rows)
+                    sample = report["samples"][problem]
+                    sample.extend(rows[:CHECK_SAMPLE_SIZE - len(sample)])
+                report["checked"] += len(chunk)
+
+            return report
+
+        except Exception as error:
+            self.log.error("Failed in check() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+
+def main():
+    # Imported here since the models import base, which imports this module
+    import file
+    import library
+
+    models = {"file" : file.File, "library" : library.Library}
+
+    parser = argparse.ArgumentParser(description="Maintain lineage closure tables")
+    parser.add_argument("command", choices=["create", "rebuild", "check"])
+    parser.add_argument("model", choices=list(models.keys()))
+    args = parser.parse_args()
+
+    closure = LineageClosure(models[args.model](db_utils.SysOutLog()))
+    if args.command == "create":
+        mysql_cnx = closure.db.get_db_connection()
+        try:
+            closure.create_table(mysql_cnx.cursor())
+            mysql_cnx.commit()
+        finally:
+            closure.db.close_connection(mysql_cnx)
+    elif args.command == "rebuild":
+        closure.rebuild()
+    else:
+        report = closure.check()
+        print(report)
+        if report["missing"] or report["extra"] or report["wrong_depth"]:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+import config
+
+
+conf = config.Config.get_config()
+
+###############################################################################
+# In-process cache in front of Db._get_id_from_unique_value() and
+# Db._get_field_value_for_id(). Loaders resolve the same handful of attribute,
+# taxonomy, modality, etc. names once per attribute per record; this turns all
+# but the first of those lookups into a dict hit.
+#
+# Entries are evicted least-recently-used once max_size is reached and expire
+# after ttl seconds. Only tables listed in the [cache] section of
+# conf/assets.ini are cached, and only positive results are stored, so a row
+# inserted after a miss is always found.
+###############################################################################
+
+# Small dimension tables loaded by Db.warm_reference_cache(), with the unique
+# fields that the Db.get_*_id() helpers look them up by
+REFERENCE_TABLES = {
+    "attributes" : ["attr_name"],
+    "taxonomy" : ["name"],
+    "modality" : ["name"],
+    "assay" : ["name"],
+    "technique" : ["name", "short_name"],
+    "anatomy" : ["short_name", "cv_list_id"],
+    "lab" : ["lab_name"]
+}
+
+# Only the reference tables are cached by default. Tables such as collection, contributor,
+# library_pool and ins_cert are written by the loaders (and by other clients) and nothing
+# invalidates their entries on those writes, so caching them could serve stale values.
+DEFAULT_CACHED_TABLES = list(REFERENCE_TABLES.keys())
+
+MISSING = object()
+
+
+class LookupCache():
+
+    def __init__(self, max_size=10000, ttl=600, tables=None, enabled=True):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.tables = set(tables if tables is not None else DEFAULT_CACHED_TABLES)
+        self.enabled = enabled
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits" : 0, "misses" : 0, "expired" : 0, "evictions" : 0, "invalidations" : 0}
+
+    def is_cacheable(self, table_name):
+        return self.enabled and table_name in self.tables
+
+    def get(self, key):
+        """
+        Return the cached value for key or MISSING. Keys are tuples whose second
+        element is the table name, e.g. ("id", "taxonomy", "name", "human").
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return MISSING
+            value, expires_at = entry
+            if self.ttl and time.monotonic() > expires_at:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (self.ttl or 0))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, table_name=None):
+        """Drop every entry, or only the entries for table_name."""
+        with self._lock:
+            self._stats["invalidations"] += 1
+            if table_name is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[1] == table_name]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """
+    Return the process-wide cache, creating it from conf/assets.ini on first use.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                tables = None
+                if conf.has_option('cache', 'tables'):
+                    tables = [t.strip() for t in conf.get('cache', 'tables').split(",") if t.strip()]
+                _cache = LookupCache(
+                    max_size=conf.getint('cache', 'max_size', fallback=10000),
+                    ttl=conf.getfloat('cache', 'ttl', fallback=600),
+                    tables=tables,
+                    enabled=conf.getboolean('cache', 'enabled', fallback=True)
+                )
+    return _cache
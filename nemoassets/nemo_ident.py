@@ -1,5 +1,6 @@
 
-import random
+import secrets
+import threading
 import db_utils
 
 VALID_CHARS="0123456789abcdefghijkmnopqrstuvwxyz"
@@ -20,6 +21,11 @@ PREFIX_TABLE_FIELD_MAP = {
     "lib": ("library", "lib_id")
 }
 
+# IDs handed out by create_nemo_ids(reserve=True) in this process. They are never handed out
+# again, so workers sharing the process can't race on an ID before its record is inserted.
+_reserved = set()
+_reserved_lock = threading.Lock()
+
 def generate_id(prefix):
     return NEMO_PREFIX + ":" + prefix + "-" + generate_random_string(VALID_CHARS, NUM_RANDOM_CHARS)
 
@@ -29,19 +35,51 @@ def create_nemo_id(prefix):
     returning it. Because the chances of a collision are very low, the code generally doesn't 
     loop at all
     """
+    return create_nemo_ids(prefix, 1)[0]
+
+def create_nemo_ids(prefix, n, reserve=False):
+    """
+    Create n unique IDs for prefix. Candidates are generated in bulk and checked against the
+    prefix's table with one IN query per chunk; only the ones that collide (with the table,
+    with each other or with IDs already reserved) are regenerated and checked again.
+
+    :param prefix: One of the PREFIX_TABLE_FIELD_MAP keys, e.g. 'sbj'
+    :param n: Number of IDs to create
+    :param reserve: Remember the IDs in this process so that later calls, from any thread, never
+        return them again. Call release_nemo_ids() once the records using them are committed.
+    :return: A list of n IDs
+    """
     if prefix not in PREFIX_TABLE_FIELD_MAP:
         raise ValueError(f"Cannot create identifier for prefix '{prefix}'. It is not one of the allowable prefixes.")
-    
+
+    table_name, field_name = PREFIX_TABLE_FIELD_MAP[prefix]
     db = db_utils.Db()
-    while True:
-        nemo_id = generate_id(prefix)
-        table_name, field_name = PREFIX_TABLE_FIELD_MAP[prefix]
+    nemo_ids = []
+    while len(nemo_ids) < n:
+        candidates = set()
+        while len(candidates) < n - len(nemo_ids):
+            candidates.add(generate_id(prefix))
+        candidates -= set(nemo_ids)
+
         # Calling this 'single underscore' function from within this same pacakge 
         # so treating it as a package-level function
-        result = db._get_id_from_unique_value(table_name, field_name, nemo_id)
-        if not result:
-            return nemo_id
+        taken = db._get_ids_from_unique_values(table_name, field_name, list(candidates))
+
+        with _reserved_lock:
+            for nemo_id in candidates:
+                if nemo_id not in taken and nemo_id not in _reserved:
+                    if reserve:
+                        _reserved.add(nemo_id)
+                    nemo_ids.append(nemo_id)
+    return nemo_ids
+
+def release_nemo_ids(nemo_ids):
+    """
+    Forget IDs reserved by create_nemo_ids(), e.g. once their records are in the database
+    """
+    with _reserved_lock:
+        _reserved.difference_update(nemo_ids)
 
 def generate_random_string(alphabet, num_chars):
     """Generate a random number of alphanumeric characters based on the passed-in alphabet."""
-    return ''.join(random.choice(alphabet) for i in range(num_chars))
\ No newline at end of file
+    return ''.join(secrets.choice(alphabet) for i in range(num_chars))
\ No newline at end of file
@@ -75,6 +75,8 @@ class Project(Base):
         "table" : "project_assoc_project",
         "parent_field" : "parent_project_id",
         "child_field" : "child_project_id"
+        # No closure_table: project_assoc_project edges are written outside this library, so a
+        # closure table would go stale (see lineage_closure.py)
     }
 
     # These are the fields allowed for use in the constructor
@@ -90,13 +92,43 @@ class Project(Base):
         params["is_grant"] = 0
         return self._get_record(params, assoc)
     
-    def get_projects(self, params={}, assoc=[]):
+    def get_projects(self, params={}, assoc=[], as_records=False, as_frame=False, as_arrow=False):
         params["is_grant"] = 0
-        return self._get_records(params, assoc)
+        return self._get_records(params, assoc, as_records=as_records, as_frame=as_frame, as_arrow=as_arrow)
+
+    def iter_projects(self, params={}, assoc=[], chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE, as_records=False):
+        """
+        Like get_projects() but yields Project instances chunk_size at a time; see Base._iter_records()
+        """
+        params = dict(params, is_grant=0)
+        return self._iter_records(params, assoc, chunk_size, as_records=as_records)
+
+    def get_projects_page(self, params={}, assoc=[], after_id=None, limit=100, order_by="id", descending=False, as_records=False):
+        """
+        One page of Project records and the cursor for the next page; see Base._get_records_page()
+        """
+        params = dict(params, is_grant=0)
+        return self._get_records_page(params, assoc, after_id, limit, order_by, descending, as_records=as_records)
     
     def get_project_ancestors(self, flattened=True):
         return self._get_ancestors(flattened)
 
+    def get_project_ancestors_for(self, project_ids:list, flattened=False):
+        """
+        Ancestors of many projects at once; see Base._batched_lineage_search()
+
+        :return: a dict of project ID to its ancestors, as a list per level unless flattened
+        """
+        return self._get_ancestors_for(project_ids, flattened)
+
+    def get_project_descendants_for(self, project_ids:list, flattened=False):
+        """
+        Descendants of many projects at once; see Base._batched_lineage_search()
+
+        :return: a dict of project ID to its descendants, as a list per level unless flattened
+        """
+        return self._get_descendants_for(project_ids, flattened)
+
 
     #######################################################################################
     # Original functions from prior to refactoring this class to extend the Base class    #
@@ -0,0 +1,197 @@
+import threading
+
+###############################################################################
+# Per-class query metadata, compiled once when a Base subclass is defined
+# (see Base.__init_subclass__) and stored on the class as _meta.
+#
+# Everything that only depends on TABLE / FIELDS / ASSOCIATIONS is worked out
+# here up front: select lists, association join fragments, the columns each
+# row is mapped from, and insert statements per set of optional fields. SQL
+# that also depends on the shape of the query parameters (which keys, NULL or
+# not, how many list values) is rendered on first use and cached under that
+# shape, so repeated calls with the same kind of params skip string building.
+###############################################################################
+
+# Rendered statements kept per class before the cache is cleared and refilled
+SQL_CACHE_SIZE = 1024
+
+
+class AssocMeta():
+    """
+    Compiled form of one entry in a class's ASSOCIATIONS
+    """
+
+    def __init__(self, table_name, name, details):
+        self.name = name
+        self.details = details
+        self.table = details['table']
+        self.id_col = details['id_col']
+        self.assoc_id_col = details.get('assoc_id_col')
+        self.ref = details.get('ref_join')
+        self.one_to_one = bool(details.get('one_to_one'))
+
+        # The id_col is left out so that an association with a single remaining column
+        # comes back as a list of values rather than a list of dicts.
+        # TODO: Should change all ASSOICATIONS to have a retrieve list of columns and a load_associations list of columns
+        self.assoc_cols = [f"{self.table}.{col}" for col in details['cols'] if col != self.id_col]
+        self.ref_cols = []
+        if self.ref and "ref_cols" in self.ref:
+            self.ref_cols = [f"{self.ref['ref_table']}.{col}" for col in self.ref['ref_cols'] if col != self.id_col]
+
+        # Every column is aliased to `table.column` so rows look the same whatever the loading strategy
+        self.aliased_cols = [f"{col} AS `{col}`" for col in self.assoc_cols]
+        self.human_key = None
+        if self.ref:
+            if "ref_cols" in self.ref:
+                self.aliased_cols += [f"{self.ref['ref_table']}.{col} AS `{self.ref['ref_table']}.{col}`" for col in self.ref['ref_cols']]
+            else:
+                self.aliased_cols += [f"{self.ref['ref_table']}.{self.ref['readable_field']} AS `{self.ref['ref_table']}.{self.ref['readable_field']}`"]
+            self.human_key = f"{self.ref['ref_table']}.{self.ref['readable_field']}"
+
+        # (row key, attribute key) pairs making up each raw association value
+        if self.ref_cols:
+            self.raw_cols = [(col, col[len(self.ref['ref_table'])+1:]) for col in self.ref_cols]
+        else:
+            self.raw_cols = [(col, col[len(self.table)+1:]) for col in self.assoc_cols]
+
+        ref_join_stmt = ""
+        if self.ref:
+            ref_join_stmt = f" join {self.ref['ref_table']} on {self.ref['ref_table']}.id = {self.table}.{self.ref['ref_field']} "
+
+        # "join" strategy: left join from the main table (see Base._get_records_joined())
+        parent_col = self.assoc_id_col if self.assoc_id_col else f"{table_name}.id"
+        self.join_stmt = f" left join {self.table} on {self.table}.{self.id_col} = {parent_col} " + ref_join_stmt
+
+        # "batched" strategy: select association rows for a list of parent ids
+        if self.assoc_id_col:
+            # The association hangs off a column of the main table (e.g. library.technique_id), so go through it
+            self.parent_id_col = f"{table_name}.id"
+            from_stmt = f" FROM {table_name} join {self.table} on {self.table}.{self.id_col} = {table_name}.{self.assoc_id_col} "
+        else:
+            self.parent_id_col = f"{self.table}.{self.id_col}"
+            from_stmt = f" FROM {self.table} "
+        self.batched_stmt = f""" SELECT {", ".join([self.parent_id_col + " AS `_parent_id`"] + self.aliased_cols)} """ + from_stmt + ref_join_stmt
+
+
+class QueryMeta():
+
+    def __init__(self, cls):
+        self.table = cls.TABLE
+        self.fields = list(cls.FIELDS.keys())
+        self.required_fields = [field for field in cls.FIELDS if cls.FIELDS[field]]
+        self.optional_fields = [field for field in cls.FIELDS if not cls.FIELDS[field]]
+        self.params_allowed = self.fields + ["id"]
+        self._params_allowed = set(self.params_allowed)
+
+        self.table_cols = [f"{self.table}.id"] + [f"{self.table}.{field}" for field in self.fields]
+        self.select_stmt = f""" SELECT {", ".join(self.table_cols)} FROM {self.table} """
+        self.aliased_table_cols = [f"{col} AS `{col}`" for col in self.table_cols]
+        # (row key, attribute name) pairs for rows selected with aliased_table_cols
+        self.entity_cols = [(col, col[len(self.table)+1:]) for col in self.table_cols]
+
+        associations = getattr(cls, "ASSOCIATIONS", {})
+        self.assoc_names = list(associations.keys())
+        self.assocs = {name : AssocMeta(self.table, name, details) for name, details in associations.items()}
+
+        self._insert_stmts = {}
+        self._sql = {}
+        self._lock = threading.Lock()
+
+    def validate(self, params, assoc=[]):
+        if not isinstance(params, dict):
+            raise ValueError(f"params must be dict. Received {params} with type {type(params)}")
+        if not all(field in self._params_allowed for field in params):
+            raise ValueError(f"Expected only the following parameters {self.params_allowed}, but recieved params {list(params.keys())}")
+        if not isinstance(assoc, list):
+            raise ValueError(f"Associations must be provided as a list")
+        if not all(assoc_key in self.assocs for assoc_key in assoc):
+            raise ValueError(f"Expected only the following associations {self.assoc_names}, but recieved params {assoc}")
+
+    def params_shape(self, params):
+        """
+        The parts of params that decide what the where clause looks like: the keys in order, and for
+        each whether it is matched against NULL, a single value or a list of n values
+        """
+        return tuple((field, None if value is None else len(value) if isinstance(value, list) else "=") for field, value in params.items())
+
+    def cached_sql(self, key, build):
+        """
+        Return the statement cached under key, calling build() to render it on a miss
+        """
+        stmt = self._sql.get(key)
+        if stmt is None:
+            stmt = build()
+            with self._lock:
+                if len(self._sql) >= SQL_CACHE_SIZE:
+                    self._sql.clear()
+                self._sql[key] = stmt
+        return stmt
+
+    def _render_where(self, shape):
+        where_stmt = ""
+        for field, kind in shape:
+            where_stmt += " and " if where_stmt else " WHERE "
+            if kind is None:
+                where_stmt += f"{self.table}.{field} is %({field})s"
+            elif kind == "=":
+                where_stmt += f"{self.table}.{field} = %({field})s"
+            else:
+                where_stmt += f"{self.table}.{field} in ({', '.join(f'%({field}_{index})s' for index in range(kind))})"
+        return where_stmt
+
+    def where(self, params):
+        """
+        Build the where clause for params, which have already been validated
+
+        :param: params (dict): field -> value, where a value of None matches NULL and a list matches any of its values
+
+        :return: a tuple of the where clause (empty if there are no params) and the params dict to execute it with
+        """
+        shape = self.params_shape(params)
+        where_stmt = self.cached_sql(("where", shape), lambda: self._render_where(shape))
+
+        bound_params = {}
+        for field, value in params.items():
+            if isinstance(value, list):
+                for index, list_value in enumerate(value):
+                    bound_params[f"{field}_{index}"] = list_value
+            else:
+                bound_params[field] = value
+        return where_stmt, bound_params
+
+    def insert_stmt(self, params):
+        """
+        :return: a tuple of the INSERT statement for the required fields plus the optional fields present
+            in params, and the tuple of values to execute it with
+        """
+        optional = tuple(field for field in self.optional_fields if field in params)
+        stmt = self._insert_stmts.get(optional)
+        if stmt is None:
+            cols = self.required_fields + list(optional)
+            stmt = f"INSERT INTO {self.table} ({','.join(self.required_fields)}{''.join(', ' + field for field in optional)} ) VALUES({', '.join(['%s'] * len(cols))} )"
+            with self._lock:
+                self._insert_stmts[optional] = stmt
+        data = tuple(params[field] for field in self.required_fields) + tuple(params[field] for field in optional)
+        return stmt, data
+
+    def insert_rows_stmt(self, optional, row_count):
+        """
+        :return: a multi-row INSERT for row_count rows of the required fields plus the given
+            optional fields, with one %s per value in the same order as insert_stmt()
+        """
+        def build():
+            cols = self.required_fields + list(optional)
+            row = f"({', '.join(['%s'] * len(cols))})"
+            return f"INSERT INTO {self.table} ({', '.join(cols)}) VALUES {', '.join([row] * row_count)}"
+        return self.cached_sql(("insert_rows", optional, row_count), build)
+
+    def upsert_rows_stmt(self, optional, row_count, key_field):
+        """
+        :return: insert_rows_stmt() with an ON DUPLICATE KEY UPDATE clause that overwrites every
+            column but key_field, the unique natural key the rows are matched on
+        """
+        def build():
+            cols = self.required_fields + list(optional)
+            updates = ", ".join(f"{col} = VALUES({col})" for col in cols if col != key_field)
+            return self.insert_rows_stmt(optional, row_count) + f" ON DUPLICATE KEY UPDATE {updates}"
+        return self.cached_sql(("upsert_rows", optional, row_count, key_field), build)
@@ -0,0 +1,98 @@
+###############################################################################
+# Compact, read-only result records. Base._get_records() and friends return
+# these instead of full model instances when called with as_records=True.
+#
+# A record class is generated for each Base subclass (see
+# Base.__init_subclass__). It has a __slots__ entry per ATTRS name, so there is
+# no per-instance __dict__, log, db or ctype, and plain fields are read
+# straight from their slot rather than through Base.__getattribute__.
+#
+# ref_join associations keep the {'human_readable': [...], 'raw': [...]} dict
+# in a hidden slot behind a property, so record.libraries returns the human
+# readable list and record.libraries_raw / record.libraries_all work exactly
+# as they do on model instances.
+###############################################################################
+
+
+class Record():
+
+    __slots__ = ()
+
+    # Filled in by make_record_type()
+    _attrs = ()
+    _ref_assocs = frozenset()
+    _setters = ()
+
+    def __init__(self, params={}):
+        get = params.get
+        # Each setter is the __set__ of the field's slot (or ref_join property), which skips __setattr__
+        for setter, field in self._setters:
+            setter(self, get(field))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __getattr__(self, name):
+        # Only called when normal lookup fails, i.e. for the _raw / _all accessors
+        if name.endswith("_raw") and name[0:-4] in self._attrs:
+            return self._all_value(name[0:-4])["raw"]
+        if name.endswith("_all") and name[0:-4] in self._attrs:
+            return self._all_value(name[0:-4])
+        raise AttributeError(f"{type(self).__name__} has no attribute {name}")
+
+    def _all_value(self, name):
+        if name in self._ref_assocs:
+            return object.__getattribute__(self, "_" + name + "_all")
+        return object.__getattribute__(self, name)
+
+    def as_dict(self):
+        """
+        :return: the record's values as a dict, with ref_join associations in their full
+            human_readable / raw form
+        """
+        return {field : self._all_value(field) for field in self._attrs}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.as_dict()})"
+
+    __str__ = __repr__
+
+
+def _ref_property(name):
+    hidden = "_" + name + "_all"
+
+    def get(self):
+        value = object.__getattribute__(self, hidden)
+        if isinstance(value, dict) and 'human_readable' in value:
+            return value['human_readable']
+        return value
+
+    def set(self, value):
+        # Only reachable through object.__setattr__, i.e. while the loader populates the record
+        object.__setattr__(self, hidden, value)
+
+    return property(get, set)
+
+
+def make_record_type(cls):
+    """
+    Generate the record class for a Base subclass, named e.g. FileRecord
+    """
+    attrs = tuple(cls.ATTRS)
+    ref_assocs = frozenset(name for name, details in getattr(cls, "ASSOCIATIONS", {}).items() if "ref_join" in details)
+
+    namespace = {
+        "__slots__" : tuple(("_" + attr + "_all") if attr in ref_assocs else attr for attr in attrs),
+        "__module__" : cls.__module__,
+        "_attrs" : attrs,
+        "_ref_assocs" : ref_assocs
+    }
+    for name in ref_assocs:
+        namespace[name] = _ref_property(name)
+
+    record_type = type(cls.__name__ + "Record", (Record,), namespace)
+    record_type._setters = tuple((record_type.__dict__[attr].__set__, attr) for attr in attrs)
+    return record_type
@@ -1,4 +1,5 @@
 import sys
+import db_utils
 import project
 import event
 from base import Base
@@ -53,14 +54,24 @@ class Sample(Base):
     def __init__(self, log=None, params={}):   
         super().__init__(log, Sample, params)
 
-    def _load_associations(self, sample, sample_id, delete_before_insert, cursor):
+    def _assoc_values(self, sample, sample_id, attribute_ids=None):
+        """
+        Build the rows to insert into the association tables for one sample
+
+        :param sample: A dict that represents the sample object
+        :param sample_id: The sample's internal id
+        :param attribute_ids: Optional dict of attr_name to attributes id, as resolved once per
+            batch by add_samples(). When not given, each attr_name is looked up individually.
+        :return: A dict of association name to the list of column / value dicts for that association
+        """
 
         REQUIRED_ATTRIBUTE_KEYS = ['attr_name', 'value', 'unit']
 
+        assoc_values = {}
+
         # Iterate over the allowed associations
         # if the association is in the sample dict
         #   Build the specific dict of column names / values needed for this particular association
-        #   Call create_assoc with the assocation info and the column / values dict
         for assoc in self.ASSOCIATIONS:
             if assoc in sample and sample[assoc]:
                 self.log.debug(f"Processing association: {assoc}")
@@ -77,7 +88,10 @@ class Sample(Base):
                         if not all(key in attr for key in REQUIRED_ATTRIBUTE_KEYS):
                             raise ValueError(f"Attributes require the following keys: {REQUIRED_ATTRIBUTE_KEYS}")
                         self.log.debug(f"Processing attribute {attr['attr_name']}")
-                        attributes_id = self.db.get_attribute_id_by_name(attr['attr_name'])
+                        if attribute_ids is None:
+                            attributes_id = self.db.get_attribute_id_by_name(attr['attr_name'])
+                        else:
+                            attributes_id = attribute_ids.get(attr['attr_name'])
                         if not attributes_id:
                             self.log.error(f"Cannot find attribute with name: {attr['attr_name']}")
                             raise Exception(f"Cannot find attribute with name: {attr['attr_name']}")
@@ -96,21 +110,41 @@ class Sample(Base):
                                             "relationship" : parent_dict["relationship"]})
                 else:
                     raise NotImplementedError("This association has not yet been implemented")
-                
-                if assoc in delete_before_insert:
-                    deletion_key = self.ASSOCIATIONS[assoc]['id_col']
-                    self.log.debug(f"Deletion key: {deletion_key}")
-                    self._delete_assoc(self.ASSOCIATIONS[assoc], deletion_key, sample_id, cursor)
-                
-                for values in values_list:
-                    self._create_assoc(self.ASSOCIATIONS[assoc], values, cursor)
+
+                assoc_values[assoc] = values_list
+
+        return assoc_values
+
+    def _load_associations(self, sample, sample_id, delete_before_insert, cursor):
+
+        # Call create_assoc with the assocation info and the column / values dict
+        for assoc, values_list in self._assoc_values(sample, sample_id).items():
+            if assoc in delete_before_insert:
+                deletion_key = self.ASSOCIATIONS[assoc]['id_col']
+                self.log.debug(f"Deletion key: {deletion_key}")
+                self._delete_assoc(self.ASSOCIATIONS[assoc], deletion_key, sample_id, cursor)
+            
+            for values in values_list:
+                self._create_assoc(self.ASSOCIATIONS[assoc], values, cursor)
 
                     
     def get_all_samples(self):
         return self._get_records()
 
-    def get_samples(self, params, assoc=[]):
-        return self._get_records(params, assoc)
+    def get_samples(self, params, assoc=[], as_records=False, as_frame=False, as_arrow=False):
+        return self._get_records(params, assoc, as_records=as_records, as_frame=as_frame, as_arrow=as_arrow)
+
+    def iter_samples(self, params={}, assoc=[], chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE, as_records=False):
+        """
+        Like get_samples() but yields Sample instances chunk_size at a time; see Base._iter_records()
+        """
+        return self._iter_records(params, assoc, chunk_size, as_records=as_records)
+
+    def get_samples_page(self, params={}, assoc=[], after_id=None, limit=100, order_by="id", descending=False, as_records=False):
+        """
+        One page of Sample records and the cursor for the next page; see Base._get_records_page()
+        """
+        return self._get_records_page(params, assoc, after_id, limit, order_by, descending, as_records=as_records)
     
     def get_sample(self, params, assoc=[]):
         return self._get_record(params, assoc)
@@ -190,6 +224,97 @@ class Sample(Base):
             except Exception as error:
                 raise error
    
+    def add_samples(self, samples:list, chunk_size=db_utils.INSERT_CHUNK_SIZE):
+        """
+        Bulk form of add_sample(). Attribute names are resolved once for the whole batch, and
+        sample rows and association rows are written with multi-row inserts in a single transaction.
+
+        Parameters:
+            samples (list): dicts that each represent a sample object, as for add_sample(). The
+                smp_id values must be unique.
+            chunk_size (int): Rows per INSERT statement
+
+        Returns:
+            A dict of smp_id to the new sample's internal id, in the order of samples
+        """
+        mysql_cnx = None
+
+        try:
+            attribute_ids = self._attribute_ids_for(samples, "attributes")
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            rows = [{field : smp[field] for field in self.FIELDS if field in smp} for smp in samples]
+            ids = self._insert_rows(rows, ["smp_id"], cursor, chunk_size)
+            self.log.debug(f"Inserted {len(ids)} samples")
+
+            self._create_assocs_for(samples, list(ids.values()), cursor, chunk_size, attribute_ids)
+
+            mysql_cnx.commit()
+            return ids
+
+        except Exception as error:
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in add_samples() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def upsert_samples(self, samples:list, chunk_size=db_utils.INSERT_CHUNK_SIZE, sync:list=[]):
+        """
+        Insert new samples and update existing ones, matched on smp_id, without reading each
+        sample first; see Base._upsert_rows(). Associations (subjects, attributes, anatomies,
+        parent samples) are only written for the samples that are inserted; those of existing
+        samples are left as they are unless named in sync.
+
+        Parameters:
+            samples (list): dicts that each represent a sample object. New samples need the required
+                fields; existing ones only smp_id and the fields to change.
+            chunk_size (int): Rows per statement
+            sync (list): Associations, such as 'attributes', to bring in line with the lists given
+                for existing samples; see Base._sync_associations(). Only the rows that differ are
+                deleted or inserted.
+
+        Returns:
+            A dict with keys 'inserted', 'changed' and 'untouched', each a dict of smp_id to internal id.
+            With sync, samples whose association rows changed count as changed, and 'associations'
+            holds the rows inserted and deleted per association.
+        """
+        mysql_cnx = None
+
+        try:
+            attribute_ids = self._attribute_ids_for(samples, "attributes")
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            rows = [{field : smp[field] for field in self.FIELDS if field in smp} for smp in samples]
+            report = self._upsert_rows(rows, "smp_id", cursor, chunk_size)
+
+            inserted = [smp for smp in samples if smp["smp_id"] in report["inserted"]]
+            self._create_assocs_for(inserted, [report["inserted"][smp["smp_id"]] for smp in inserted], cursor, chunk_size, attribute_ids)
+            if sync:
+                self._sync_upserted(samples, "smp_id", report, sync, cursor, chunk_size, attribute_ids)
+
+            mysql_cnx.commit()
+            return report
+
+        except Exception as error:
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in upsert_samples() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
     def update_sample(self, smp:dict, delete_before_insert:list=[]):
         """
         Used to update a sample record and associated records in related tables.
@@ -1,4 +1,5 @@
 import sys
+import db_utils
 import project, cohort
 from base import Base
 
@@ -120,8 +121,20 @@ class Subject(Base):
     def get_subject(self, params:dict, assoc=[]):
         return self._get_record(params, assoc)
     
-    def get_subjects(self, params:dict, assoc=[]):
-        return self._get_records(params, assoc)
+    def get_subjects(self, params:dict, assoc=[], as_records=False, as_frame=False, as_arrow=False):
+        return self._get_records(params, assoc, as_records=as_records, as_frame=as_frame, as_arrow=as_arrow)
+
+    def iter_subjects(self, params={}, assoc=[], chunk_size=db_utils.IN_CLAUSE_CHUNK_SIZE, as_records=False):
+        """
+        Like get_subjects() but yields Subject instances chunk_size at a time; see Base._iter_records()
+        """
+        return self._iter_records(params, assoc, chunk_size, as_records=as_records)
+
+    def get_subjects_page(self, params={}, assoc=[], after_id=None, limit=100, order_by="id", descending=False, as_records=False):
+        """
+        One page of Subject records and the cursor for the next page; see Base._get_records_page()
+        """
+        return self._get_records_page(params, assoc, after_id, limit, order_by, descending, as_records=as_records)
     
     def get_subject_by_source_subject_id(self, source_subject_id):
         return self.get_subjects({"source_subject_id" : source_subject_id})
@@ -230,6 +243,178 @@ class Subject(Base):
 
 
 
+    def _assoc_values(self, sbj, subject_id, taxonomy_ids, attribute_ids):
+        """
+        Build the rows to insert into the association tables for one subject of a batch
+
+        :param sbj: A dict that represents the subject object
+        :param subject_id: The subject's internal id
+        :param taxonomy_ids: Dict of taxonomy name to id, resolved once per batch
+        :param attribute_ids: Dict of attr_name to attributes id, resolved once per batch
+        :return: A dict of association name to the list of column / value dicts for that association
+        """
+        required_keys = ['attr_name', 'value', 'unit']
+
+        assoc_values = {}
+        if sbj.get("taxonomies"):
+            assoc_values["taxonomies"] = [{"subject_id" : subject_id, "taxonomy_id" : taxonomy_ids[taxon]} for taxon in sbj["taxonomies"]]
+        if sbj.get("attributes"):
+            values_list = []
+            for attr in sbj["attributes"]:
+                # if missing any of these required keys...
+                if not all(key in attr for key in required_keys):
+                    raise ValueError(f"attributes require the following keys: {required_keys}. Received {attr}")
+                values_list.append({"value" : attr['value'], "unit" : attr['unit'], "subject_id" : subject_id,
+                                    "attributes_id" : attribute_ids[attr['attr_name']], "source_value" : attr.get('source_value')})
+            assoc_values["attributes"] = values_list
+        return assoc_values
+
+    def _resolve_batch(self, subjects):
+        """
+        Resolve the project and cohort names, taxonomies and attribute names used by a batch of
+        subjects, with one lookup per kind rather than one per subject
+
+        :return: A tuple of the subject table rows (with project_id and cohort_id filled in),
+            the taxonomy ids and the attribute ids
+        """
+        project_names = list(dict.fromkeys(sbj["project"] for sbj in subjects if "project_id" not in sbj and "project" in sbj))
+        project_ids = {}
+        if project_names:
+            # Keyed by the requested name, which may differ from the stored one in case or trailing spaces
+            projects = project.Project(self.log).get_projects({"short_name" : project_names})
+            matches = db_utils.match_requested(project_names, projects, lambda proj : proj.short_name)
+            project_ids = {name : projs[0].id for name, projs in matches.items()}
+        unknown = [name for name in project_names if name not in project_ids]
+        if unknown:
+            raise Exception(f"Unable to retrieve projects {unknown}")
+
+        cohort_names = list(dict.fromkeys(sbj["cohort"] for sbj in subjects if "cohort_id" not in sbj and "cohort" in sbj))
+        cohort_ids = {}
+        if cohort_names:
+            cohorts = cohort.Cohort(self.log).get_cohorts({"cohort_name" : cohort_names})
+            for name, cohs in db_utils.match_requested(cohort_names, cohorts, lambda coh_obj : coh_obj.cohort_name).items():
+                if len(cohs) > 1:
+                    raise ValueError(f"Retrieved multiple cohorts named {name}. Use cohort_id instead.")
+                cohort_ids[name] = cohs[0].id
+        unknown = [name for name in cohort_names if name not in cohort_ids]
+        if unknown:
+            raise Exception(f"Unable to retrieve cohorts {unknown}")
+
+        taxa = [taxon for sbj in subjects for taxon in (sbj.get("taxonomies") or [])]
+        taxonomy_ids = self.db.get_taxonomy_ids(taxa) if taxa else {}
+        unknown = [taxon for taxon in dict.fromkeys(taxa) if taxon not in taxonomy_ids]
+        if unknown:
+            self.log.error(f"Cannot find taxonomies with names: {unknown}")
+            raise Exception(f"Cannot find taxonomies with names: {unknown}")
+
+        attribute_ids = self._attribute_ids_for(subjects, "attributes")
+
+        rows = []
+        for sbj in subjects:
+            row = {field : sbj[field] for field in self.FIELDS if field in sbj}
+            if "project_id" not in sbj and "project" in sbj:
+                row["project_id"] = project_ids[sbj["project"]]
+            if "cohort_id" not in sbj and "cohort" in sbj:
+                row["cohort_id"] = cohort_ids[sbj["cohort"]]
+            rows.append(row)
+
+        return rows, taxonomy_ids, attribute_ids
+
+    def add_subjects(self, subjects:list, chunk_size=db_utils.INSERT_CHUNK_SIZE):
+        """
+        Bulk form of add_subject(). Projects, cohorts, taxonomies and attribute names are each
+        resolved once for the whole batch, and subject rows and association rows are written
+        with multi-row inserts in a single transaction.
+
+        Parameters:
+            subjects (list): dicts that each represent a subject object, as for add_subject().
+                The sbj_id values must be unique.
+            chunk_size (int): Rows per INSERT statement
+
+        Returns:
+            A dict of sbj_id to the new subject's internal id, in the order of subjects
+        """
+        mysql_cnx = None
+
+        # Verify that all required fields are specified, else raise exception
+        for sbj in subjects:
+            if not self._validate_add_keys(sbj):
+                raise Exception(f"Missing one of required params: {self.REQUIRED_KEYS_FOR_ADD}. Received: {sbj}")
+
+        try:
+            rows, taxonomy_ids, attribute_ids = self._resolve_batch(subjects)
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            ids = self._insert_rows(rows, ["sbj_id"], cursor, chunk_size)
+            self.log.debug(f"Inserted {len(ids)} subjects")
+
+            self._create_assocs_for(subjects, list(ids.values()), cursor, chunk_size, taxonomy_ids, attribute_ids)
+
+            mysql_cnx.commit()
+            return ids
+
+        except Exception as error:
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in add_subjects() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
+    def upsert_subjects(self, subjects:list, chunk_size=db_utils.INSERT_CHUNK_SIZE, sync:list=[]):
+        """
+        Insert new subjects and update existing ones, matched on sbj_id, without reading each
+        subject first; see Base._upsert_rows(). Taxonomies and attributes are only written for
+        the subjects that are inserted; the associations of existing subjects are left as they are
+        unless named in sync.
+
+        Parameters:
+            subjects (list): dicts that each represent a subject object. New subjects need the
+                fields required by add_subject(); existing ones only sbj_id and the fields to change.
+            chunk_size (int): Rows per statement
+            sync (list): Associations, such as 'attributes', to bring in line with the lists given
+                for existing subjects; see Base._sync_associations(). Only the rows that differ are
+                deleted or inserted.
+
+        Returns:
+            A dict with keys 'inserted', 'changed' and 'untouched', each a dict of sbj_id to internal id.
+            With sync, subjects whose association rows changed count as changed, and 'associations'
+            holds the rows inserted and deleted per association.
+        """
+        mysql_cnx = None
+
+        try:
+            rows, taxonomy_ids, attribute_ids = self._resolve_batch(subjects)
+
+            mysql_cnx = self.db.get_db_connection()
+            cursor = mysql_cnx.cursor()
+
+            report = self._upsert_rows(rows, "sbj_id", cursor, chunk_size)
+
+            inserted = [sbj for sbj in subjects if sbj["sbj_id"] in report["inserted"]]
+            self._create_assocs_for(inserted, [report["inserted"][sbj["sbj_id"]] for sbj in inserted], cursor, chunk_size, taxonomy_ids, attribute_ids)
+            if sync:
+                self._sync_upserted(subjects, "sbj_id", report, sync, cursor, chunk_size, taxonomy_ids, attribute_ids)
+
+            mysql_cnx.commit()
+            return report
+
+        except Exception as error:
+            if mysql_cnx is not None:
+                mysql_cnx.rollback()
+            self.log.error("Failed in upsert_subjects() {}".format(error), exc_info=sys.exc_info())
+            raise error
+        finally:
+            try:
+                self.db.close_connection(mysql_cnx)
+            except Exception as error:
+                raise error
+
     def update_subject(self, sbj = {}, delete_then_insert=[]):
         """
         Used to update a subject record and associated records in related tables.
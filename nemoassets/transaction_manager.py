@@ -1,40 +1,97 @@
-global _transaction_state
-_transaction_state = False
+import asyncio
+import contextvars
+import threading
 
-global _singleton_connector
-_singleton_connector = None
+###############################################################################
+# Transaction state is kept per session rather than in module globals. A
+# session is stored in a ContextVar, so every thread (and every asyncio task
+# that calls begin_txn() itself) owns its own connector and transaction flag.
+# Two loaders running side by side in one process therefore never commit,
+# roll back or close each other's connection.
+###############################################################################
+
+class _Session():
+
+    def __init__(self):
+        self.transaction_state = False
+        self.connector = None
+        # Set while a db_utils.BatchedTransaction is active in this session
+        self.batch = None
+        # The thread / asyncio task that began the transaction
+        self.owner = _current_owner()
+
+
+def _current_owner():
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        # No running event loop in this thread
+        task = None
+    return task if task is not None else threading.get_ident()
+
+
+_session = contextvars.ContextVar("nemoassets_txn_session", default=None)
+
+def _get_session():
+    session = _session.get()
+    if session is None:
+        session = _Session()
+        _session.set(session)
+    return session
 
 def begin_txn():
-    global _transaction_state
-    _transaction_state = True
+    # Beginning again before the commit / rollback would drop the open transaction's
+    # connector, leaving its connection checked out and its writes uncommitted.
+    current = _session.get()
+    if current is not None and current.transaction_state and current.owner == _current_owner():
+        raise Exception("A transaction is already in progress. Commit or roll it back before beginning another.")
+
+    # Otherwise start a fresh session. A task that inherited its parent's context
+    # would otherwise share (and commit) the parent's connector.
+    session = _Session()
+    session.transaction_state = True
+    _session.set(session)
 
 def commit_txn():
-    global _singleton_connector
-    if _singleton_connector:
-        _singleton_connector.commit_transaction()
+    session = _get_session()
+    if session.connector:
+        session.connector.commit_transaction()
     else:
+        session.transaction_state = False
         print("Can't commit transaction. Not yet connected to DB")
 
 def rollback_txn():
-    global _singleton_connector
-    if _singleton_connector:
-        _singleton_connector.rollback_transaction()
+    session = _get_session()
+    if session.connector:
+        session.connector.rollback_transaction()
     else:
+        session.transaction_state = False
         print("Can't rollback transaction. Not yet connected to DB")
-    
+
 
 def set_connector(cnx):
-    global _singleton_connector
-    _singleton_connector = cnx
+    _get_session().connector = cnx
 
 def get_connector():
-    return _singleton_connector
+    return _get_session().connector
+
+def set_batch(batch):
+    _get_session().batch = batch
+
+def get_batch():
+    session = _session.get()
+    if session is None or not session.transaction_state:
+        return None
+    return session.batch
 
 def is_transaction_state():
-    return _transaction_state
+    session = _session.get()
+    return session is not None and session.transaction_state
 
 def set_transaction_state(b):
-    global _transaction_state
-    _transaction_state = b
-
-    
\ No newline at end of file
+    session = _get_session()
+    session.transaction_state = b
+    if not b:
+        # The transaction is over; its connector is released by the caller
+        session.connector = None
+        session.batch = None
@@ -0,0 +1,62 @@
+import os
+import sys
+import pytest
+
+# The modules use flat imports from nemoassets/, as when run from that directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "nemoassets"))
+
+try:
+    import mysql.connector
+except ImportError:
+    # Every model imports db_utils, which needs the MySQL driver
+    collect_ignore_glob = ["test_*.py"]
+
+
+class FakeCursor():
+    """
+    Stands in for a mysql.connector cursor. Every statement is recorded in statements as a
+    (stmt, params) tuple (an executemany() as one entry with the list of params), and
+    responder(stmt, params) decides the result of execute(): a list is returned by
+    fetchall() (with rowcount set to its length), an int is taken as the rowcount.
+    """
+
+    def __init__(self, responder=None):
+        self.responder = responder
+        self.statements = []
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, stmt, params=None):
+        self.statements.append((stmt, params))
+        result = self.responder(stmt, params) if self.responder else None
+        if isinstance(result, int):
+            self.rows, self.rowcount = [], result
+        else:
+            self.rows = list(result or [])
+            self.rowcount = len(self.rows)
+
+    def executemany(self, stmt, seq_params):
+        seq_params = list(seq_params)
+        self.statements.append((stmt, seq_params))
+        self.rows, self.rowcount = [], len(seq_params)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def close(self):
+        pass
+
+    def matching(self, prefix):
+        """
+        :return: the (stmt, params) tuples whose statement starts with prefix
+        """
+        return [(stmt, params) for stmt, params in self.statements if stmt.lstrip().startswith(prefix)]
+
+
+@pytest.fixture
+def make_cursor():
+    return FakeCursor
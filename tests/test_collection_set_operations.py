@@ -0,0 +1,27 @@
+import pytest
+import collection
+
+
+@pytest.mark.parametrize("operation", ["union", "intersect", "difference"])
+def test_set_operation_stmt_reads_other_collection_ids(operation):
+    col = collection.Collection(params={"id" : 1})
+    other = collection.Collection(params={"id" : 2})
+
+    stmt, params = col._set_operation_stmt(operation, [other, 3, other], "files")
+
+    assert "file_in_collection" in stmt
+    assert params["id"] == 1
+    assert sorted(value for key, value in params.items() if key[1:].isdigit()) == [2, 3]
+
+
+@pytest.mark.parametrize("other_collections", [[collection.Collection()], [2, None]])
+def test_set_operation_stmt_rejects_collections_without_ids(other_collections):
+    col = collection.Collection(params={"id" : 1})
+
+    with pytest.raises(ValueError, match="must have an id"):
+        col._set_operation_stmt("union", other_collections, "files")
+
+
+def test_set_operation_stmt_rejects_empty_other_collections():
+    with pytest.raises(ValueError):
+        collection.Collection(params={"id" : 1})._set_operation_stmt("union", [], "files")
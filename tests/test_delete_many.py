@@ -0,0 +1,95 @@
+import pytest
+import re
+from unittest import mock
+import db_utils
+import file
+import library
+
+
+def _table(stmt):
+    return re.search(r"FROM (\w+)", stmt).group(1)
+
+
+@pytest.fixture
+def connect(monkeypatch, make_cursor):
+    """
+    Route delete_many()'s connection to a recording cursor. Each table reports rows[table] rows
+    per statement, as a DELETE's rowcount or a dry run's COUNT(*).
+    """
+    def connect(rows={}):
+        def responder(stmt, params):
+            count = rows.get(_table(stmt), 0)
+            return [(count,)] if stmt.startswith("SELECT COUNT(*)") else count
+        cnx = mock.MagicMock()
+        cnx.cursor.return_value = make_cursor(responder)
+        monkeypatch.setattr(db_utils.Db, "get_db_connection", lambda self : cnx)
+        return cnx
+    return connect
+
+
+def test_delete_many_clears_association_tables_before_the_record(connect):
+    cnx = connect({"library_assoc_library" : 2, "library_attributes" : 5, "library" : 3})
+
+    counts = library.Library().delete_many([1, 2, 2, 3])
+
+    statements = cnx.cursor.return_value.statements
+    assert [_table(stmt) for stmt, _ in statements] == ["library_assoc_library", "library_assoc_library_pool", "library_attributes", "library"]
+    assert all(stmt.startswith("DELETE FROM") for stmt, _ in statements)
+    assert list(statements[-1][1].values()) == [1, 2, 3]
+    assert counts == {"library_assoc_library" : 2, "library_assoc_library_pool" : 0, "library_attributes" : 5, "library" : 3}
+    cnx.commit.assert_called_once()
+
+
+def test_delete_many_skips_reference_tables(connect):
+    # modality, assay, technique, ... are joined through assoc_id_col and shared with other libraries
+    cnx = connect()
+
+    counts = library.Library().delete_many([1])
+
+    assert set(counts) == {"library_assoc_library", "library_assoc_library_pool", "library_attributes", "library"}
+    for stmt, _ in cnx.cursor.return_value.statements:
+        assert not re.search(r"\b(modality|assay|technique|specimen_type)\b", stmt)
+
+
+def test_delete_many_removes_edges_in_both_directions(connect):
+    cnx = connect()
+
+    file.File().delete_many([7])
+
+    [(stmt, params)] = cnx.cursor.return_value.matching("DELETE FROM file_assoc_file")
+    assert stmt == "DELETE FROM file_assoc_file WHERE child_file_id IN (%(v0)s) OR parent_file_id IN (%(v0)s)"
+    assert params == {"v0" : 7}
+    [(stmt, _)] = cnx.cursor.return_value.matching("DELETE FROM file_has_data_use_limitation")
+    assert stmt.endswith("WHERE file_id IN (%(v0)s)")
+
+
+def test_delete_many_chunks_ids(connect):
+    cnx = connect({"library_attributes" : 1, "library" : 2})
+
+    counts = library.Library().delete_many([1, 2, 3, 4, 5], chunk_size=2)
+
+    statements = cnx.cursor.return_value.statements
+    assert len(statements) == 4 * 3
+    assert [len(params) for stmt, params in statements if _table(stmt) == "library"] == [2, 2, 1]
+    assert counts["library_attributes"] == 3 and counts["library"] == 6
+
+
+def test_delete_many_dry_run_only_counts(connect):
+    cnx = connect({"library_assoc_library" : 4, "library" : 1})
+
+    counts = library.Library().delete_many([1, 2], dry_run=True)
+
+    statements = cnx.cursor.return_value.statements
+    assert all(stmt.startswith("SELECT COUNT(*) FROM") for stmt, _ in statements)
+    assert counts == {"library_assoc_library" : 4, "library_assoc_library_pool" : 0, "library_attributes" : 0, "library" : 1}
+    cnx.commit.assert_not_called()
+
+
+def test_delete_many_rolls_back_on_error(connect):
+    cnx = connect()
+    cnx.cursor.return_value.responder = mock.Mock(side_effect=Exception("lock wait timeout"))
+
+    with pytest.raises(Exception, match="lock wait timeout"):
+        library.Library().delete_many([1])
+    cnx.rollback.assert_called_once()
+    cnx.commit.assert_not_called()
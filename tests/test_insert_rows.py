@@ -0,0 +1,101 @@
+import pytest
+from unittest import mock
+import db_utils
+import file
+
+
+def _file_row(file_id, **optional):
+    return dict({"file_id" : file_id, "data_type_id" : 1, "file_format_id" : 2, "project_id" : 3, "file_name" : f"{file_id}.bam"}, **optional)
+
+
+def _read_back(first_id=100):
+    """
+    A responder that answers the key read-back with ids first_id, first_id + 1, ... in the order the keys are bound
+    """
+    def responder(stmt, params):
+        if stmt.startswith("SELECT id, file_id FROM file"):
+            return [(first_id + index, key) for index, key in enumerate(params.values())]
+    return responder
+
+
+def test_insert_rows_reads_back_ids_in_row_order(make_cursor):
+    cursor = make_cursor(_read_back())
+    rows = [_file_row(f"f{i}") for i in range(5)]
+
+    ids = file.File()._insert_rows(rows, ["file_id"], cursor, chunk_size=2)
+
+    assert list(ids.items()) == [("f0", 100), ("f1", 101), ("f2", 102), ("f3", 103), ("f4", 104)]
+    inserts = cursor.matching("INSERT")
+    assert [len(params) for _, params in inserts] == [10, 10, 5]
+    assert len(cursor.matching("SELECT")) == 1
+
+
+def test_insert_rows_groups_rows_by_optional_fields(make_cursor):
+    cursor = make_cursor(_read_back())
+    rows = [_file_row("a", md5="m1"), _file_row("b"), _file_row("c", md5="m3"), _file_row("d", size=9, md5="m4")]
+
+    file.File()._insert_rows(rows, ["file_id"], cursor)
+
+    inserts = cursor.matching("INSERT")
+    required = "file_id, data_type_id, file_format_id, project_id, file_name"
+    assert [stmt.split(" VALUES")[0] for stmt, _ in inserts] == [
+        f"INSERT INTO file ({required}, md5)",
+        f"INSERT INTO file ({required})",
+        f"INSERT INTO file ({required}, md5, size)"
+    ]
+    assert inserts[0][1] == ("a", 1, 2, 3, "a.bam", "m1", "c", 1, 2, 3, "c.bam", "m3")
+    assert inserts[1][1] == ("b", 1, 2, 3, "b.bam")
+    assert inserts[2][1] == ("d", 1, 2, 3, "d.bam", "m4", 9)
+
+
+def test_insert_rows_rejects_duplicate_keys(make_cursor):
+    cursor = make_cursor(_read_back())
+
+    with pytest.raises(ValueError):
+        file.File()._insert_rows([_file_row("a"), _file_row("b"), _file_row("a")], ["file_id"], cursor)
+    assert cursor.statements == []
+
+
+def test_insert_rows_requires_required_fields(make_cursor):
+    cursor = make_cursor(_read_back())
+    row = _file_row("a")
+    del row["project_id"]
+
+    with pytest.raises(Exception, match="Missing required param"):
+        file.File()._insert_rows([row], ["file_id"], cursor)
+    assert cursor.statements == []
+
+
+def test_insert_rows_fails_when_ids_cannot_be_read_back(make_cursor):
+    cursor = make_cursor(lambda stmt, params : [])
+
+    with pytest.raises(Exception, match="Unable to read back"):
+        file.File()._insert_rows([_file_row("a")], ["file_id"], cursor)
+
+
+def test_add_files_rereads_in_chunks(monkeypatch):
+    count = db_utils.IN_CLAUSE_CHUNK_SIZE * 2 + 1
+    ids = {f"f{i}" : i for i in range(count)}
+    lookups = []
+
+    def get_files(self, params={}, assoc={}, **kwargs):
+        lookups.append(params["id"])
+        return [file.File(params={"id" : file_id, "file_id" : f"f{file_id}"}) for file_id in params["id"]]
+
+    monkeypatch.setattr(db_utils.Db, "get_db_connection", lambda self : mock.MagicMock())
+    monkeypatch.setattr(db_utils.Db, "close_connection", lambda self, cnx : None)
+    monkeypatch.setattr(file.File, "_insert_rows", lambda self, rows, key_fields, cursor, chunk_size : ids)
+    monkeypatch.setattr(file.File, "_create_assocs_for", lambda self, *args : None)
+    monkeypatch.setattr(file.File, "get_files", get_files)
+
+    files = file.File().add_files([_file_row(key) for key in ids])
+
+    assert [len(chunk) for chunk in lookups] == [db_utils.IN_CLAUSE_CHUNK_SIZE, db_utils.IN_CLAUSE_CHUNK_SIZE, 1]
+    assert [f.file_id for f in files] == list(ids.keys())
+
+
+def test_insert_rows_reads_back_ids_stored_in_another_case(make_cursor):
+    # A case insensitive key column returns its stored spelling
+    cursor = make_cursor(lambda stmt, params : [(100, "abc")] if stmt.startswith("SELECT") else None)
+
+    assert file.File()._insert_rows([_file_row("ABC ")], ["file_id"], cursor) == {"ABC " : 100}
@@ -0,0 +1,27 @@
+import pytest
+import db_utils
+import file
+import lineage_closure
+import project
+
+
+@pytest.fixture
+def no_connection(monkeypatch):
+    def get_db_connection(self):
+        raise Exception("pool exhausted")
+    monkeypatch.setattr(db_utils.Db, "get_db_connection", get_db_connection)
+
+
+@pytest.mark.parametrize("command", ["rebuild", "check"])
+def test_connection_failure_is_reported(no_connection, command):
+    closure = lineage_closure.LineageClosure(file.File())
+
+    with pytest.raises(Exception, match="pool exhausted"):
+        getattr(closure, command)()
+
+
+def test_closure_requires_edges_written_by_the_library():
+    assert lineage_closure.LineageClosure.supported_for(file.File())
+    assert not lineage_closure.LineageClosure.supported_for(project.Project())
+    with pytest.raises(NotImplementedError):
+        lineage_closure.LineageClosure(project.Project())
@@ -0,0 +1,57 @@
+import pytest
+from unittest import mock
+import mysql.connector
+import base
+import collection
+import db_utils
+import file
+
+
+def _failing_connection(errno):
+    cnx = mock.MagicMock()
+    cnx.cursor.return_value.execute.side_effect = mysql.connector.errors.ProgrammingError(msg="rejected", errno=errno)
+    return cnx
+
+
+@pytest.fixture
+def cte_engine(monkeypatch):
+    monkeypatch.setattr(base, "LINEAGE_ENGINE", "cte")
+    monkeypatch.setattr(base, "_cte_supported", True)
+    monkeypatch.setattr(db_utils.Db, "close_connection", lambda self, cnx : None)
+
+
+def test_lineage_falls_back_on_parse_error(monkeypatch, cte_engine):
+    monkeypatch.setattr(db_utils.Db, "get_db_connection", lambda self : _failing_connection(1064))
+    monkeypatch.setattr(file.File, "_breadth_first_search", lambda self, find_ancestors, flatten_results : [[2], [3]])
+
+    assert file.File(params={"id" : 1})._lineage_search(True, False) == [[2], [3]]
+    assert base._cte_supported is False
+
+
+def test_lineage_reraises_other_errors(monkeypatch, cte_engine):
+    # ER_NO_SUCH_TABLE
+    monkeypatch.setattr(db_utils.Db, "get_db_connection", lambda self : _failing_connection(1146))
+    monkeypatch.setattr(file.File, "_breadth_first_search", mock.Mock())
+
+    with pytest.raises(mysql.connector.errors.ProgrammingError):
+        file.File(params={"id" : 1})._lineage_search(True, False)
+    assert base._cte_supported is True
+    file.File._breadth_first_search.assert_not_called()
+
+
+def test_collection_members_fall_back_on_parse_error(monkeypatch, cte_engine):
+    monkeypatch.setattr(db_utils.Db, "get_db_connection", lambda self : _failing_connection(1064))
+    monkeypatch.setattr(collection.Collection, "_iter_member_ids_walked", lambda self, assoc, cursor : iter([7, 8]))
+
+    members = collection.Collection(params={"id" : 1})._iter_member_ids("files", True, 100)
+    assert list(members) == [7, 8]
+    assert base._cte_supported is False
+
+
+def test_collection_members_reraise_other_errors(monkeypatch, cte_engine):
+    # ER_TABLEACCESS_DENIED_ERROR
+    monkeypatch.setattr(db_utils.Db, "get_db_connection", lambda self : _failing_connection(1142))
+
+    with pytest.raises(mysql.connector.errors.ProgrammingError):
+        list(collection.Collection(params={"id" : 1})._iter_member_ids("files", True, 100))
+    assert base._cte_supported is True
@@ -0,0 +1,22 @@
+import pytest
+import file
+import library
+import project
+
+
+@pytest.mark.parametrize("model, name", [(file.File, "file"), (library.Library, "library"), (project.Project, "project")])
+@pytest.mark.parametrize("direction, find_ancestors", [("ancestors", True), ("descendants", False)])
+def test_lineage_for_wrappers_default_to_levels(monkeypatch, model, name, direction, find_ancestors):
+    calls = []
+
+    def search(self, record_ids, find_ancestors, flatten_results, cursor=None):
+        calls.append((record_ids, find_ancestors, flatten_results))
+        return {}
+
+    monkeypatch.setattr(model, "_batched_lineage_search", search)
+    wrapper = getattr(model(), f"get_{name}_{direction}_for")
+
+    wrapper([1, 2])
+    wrapper([1, 2], flattened=True)
+
+    assert calls == [([1, 2], find_ancestors, False), ([1, 2], find_ancestors, True)]
@@ -0,0 +1,12 @@
+import lookup_cache
+
+
+def test_default_tables_are_reference_tables_only():
+    cache = lookup_cache.LookupCache()
+    assert cache.tables == set(lookup_cache.REFERENCE_TABLES)
+    for table in ["collection", "contributor", "library_pool", "ins_cert"]:
+        assert not cache.is_cacheable(table)
+
+
+def test_configured_tables_are_reference_tables_only():
+    assert lookup_cache.get_cache().tables <= set(lookup_cache.REFERENCE_TABLES)
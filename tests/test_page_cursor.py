@@ -0,0 +1,33 @@
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+import file
+
+
+@pytest.mark.parametrize("value", [
+    17,
+    "sample.bam",
+    None,
+    datetime(2024, 1, 2, 3, 4, 5, 678),
+    date(2024, 1, 2),
+    Decimal("12345678901234567890.000123"),
+    b"\x00\xffmd5"
+])
+def test_page_cursor_round_trips(value):
+    f = file.File()
+
+    token = f._encode_page_cursor("size", True, value, 42)
+
+    decoded, record_id = f._decode_page_cursor(token, "size", True)
+    assert decoded == value and type(decoded) == type(value)
+    assert record_id == 42
+
+
+def test_page_cursor_rejects_other_orderings():
+    f = file.File()
+    token = f._encode_page_cursor("size", False, Decimal("1.5"), 42)
+
+    with pytest.raises(ValueError):
+        f._decode_page_cursor(token, "size", True)
+    with pytest.raises(ValueError):
+        f._decode_page_cursor("not a cursor", "size", False)
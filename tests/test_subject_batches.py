@@ -0,0 +1,43 @@
+import pytest
+import cohort
+import project
+import subject
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """
+    Return the stored spelling of projects and cohorts, as a case insensitive collation matches them
+    """
+    def stored(projects=[], cohorts=[]):
+        monkeypatch.setattr(project.Project, "get_projects", lambda self, params={}, *args, **kwargs :
+            [project.Project(params={"id" : proj_id, "short_name" : name}) for proj_id, name in projects])
+        monkeypatch.setattr(cohort.Cohort, "get_cohorts", lambda self, params={}, *args, **kwargs :
+            [cohort.Cohort(params={"id" : coh_id, "cohort_name" : name}) for coh_id, name in cohorts])
+    return stored
+
+
+def test_resolve_batch_keys_names_as_requested(stored):
+    stored(projects=[(4, "testproject")], cohorts=[(8, "TestCohort")])
+    subjects = [
+        {"sbj_id" : "s1", "project" : "TestProject", "cohort" : "testcohort "},
+        {"sbj_id" : "s2", "project" : "testproject", "cohort" : "TestCohort"}
+    ]
+
+    rows, _, _ = subject.Subject()._resolve_batch(subjects)
+
+    assert [(row["project_id"], row["cohort_id"]) for row in rows] == [(4, 8), (4, 8)]
+
+
+def test_resolve_batch_reports_unknown_names(stored):
+    stored(projects=[(4, "testproject")])
+
+    with pytest.raises(Exception, match="Unable to retrieve projects"):
+        subject.Subject()._resolve_batch([{"sbj_id" : "s1", "project" : "other"}])
+
+
+def test_resolve_batch_rejects_ambiguous_cohorts(stored):
+    stored(cohorts=[(8, "TestCohort"), (9, "testcohort")])
+
+    with pytest.raises(ValueError, match="multiple cohorts"):
+        subject.Subject()._resolve_batch([{"sbj_id" : "s1", "cohort" : "TESTCOHORT"}])
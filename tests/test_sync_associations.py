@@ -0,0 +1,155 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+import base
+import file
+import library
+
+
+def _stored(rows):
+    """
+    A responder that answers the read of the current association rows with rows
+    """
+    return lambda stmt, params : rows if stmt.startswith("SELECT") else None
+
+
+def _deletes(cursor):
+    return cursor.matching("DELETE")
+
+
+def _inserted(cursor):
+    return [row for _, seq_params in cursor.matching("INSERT") for row in seq_params]
+
+
+def test_sync_writes_only_the_multiset_difference(make_cursor):
+    cursor = make_cursor(_stored([
+        {"file_id" : 1, "key" : "k", "value" : "a"},
+        {"file_id" : 1, "key" : "k", "value" : "c"},
+        {"file_id" : 1, "key" : "k", "value" : "c"}
+    ]))
+    attributes = [{"key" : "k", "value" : "a"}, {"key" : "k", "value" : "a"}, {"key" : "k", "value" : "b"}]
+
+    counts, changed_ids = file.File()._sync_associations([{"file_attributes" : attributes}], [1], ["file_attributes"], cursor)
+
+    assert counts == {"file_attributes" : {"inserted" : 2, "deleted" : 2}}
+    assert changed_ids == {1}
+    [select] = cursor.matching("SELECT")
+    assert select[0].startswith("SELECT `file_id`, `key`, `value` FROM file_attributes WHERE file_id IN")
+    assert _deletes(cursor) == [("DELETE FROM file_attributes WHERE file_id = %s AND `key` <=> %s AND `value` <=> %s LIMIT 2", (1, "k", "c"))]
+    assert _inserted(cursor) == [("k", "a", 1), ("k", "b", 1)]
+
+
+def test_sync_removes_surplus_duplicates(make_cursor):
+    cursor = make_cursor(_stored([{"file_id" : 1, "key" : "k", "value" : "a"}] * 3))
+
+    counts, _ = file.File()._sync_associations([{"file_attributes" : [{"key" : "k", "value" : "a"}]}], [1], ["file_attributes"], cursor)
+
+    assert counts["file_attributes"] == {"inserted" : 0, "deleted" : 2}
+    assert [stmt.endswith("LIMIT 2") for stmt, _ in _deletes(cursor)] == [True]
+    assert _inserted(cursor) == []
+
+
+def test_sync_leaves_matching_rows_alone(make_cursor):
+    cursor = make_cursor(_stored([{"file_id" : 1, "key" : "k", "value" : "a"}]))
+
+    counts, changed_ids = file.File()._sync_associations([{"file_attributes" : [{"key" : "k", "value" : "a"}]}], [1], ["file_attributes"], cursor)
+
+    assert counts["file_attributes"] == {"inserted" : 0, "deleted" : 0}
+    assert changed_ids == set()
+    assert _deletes(cursor) == [] and _inserted(cursor) == []
+
+
+def test_sync_empty_list_removes_all_rows(make_cursor):
+    cursor = make_cursor(_stored([
+        {"file_id" : 1, "key" : "k", "value" : "a"},
+        {"file_id" : 1, "key" : "j", "value" : "b"}
+    ]))
+
+    counts, _ = file.File()._sync_associations([{"file_attributes" : []}], [1], ["file_attributes"], cursor)
+
+    assert counts["file_attributes"] == {"inserted" : 0, "deleted" : 2}
+    assert _deletes(cursor) == [("DELETE FROM file_attributes WHERE file_id = %s LIMIT 2", (1,))]
+
+
+def test_sync_skips_records_without_the_association(make_cursor):
+    cursor = make_cursor(_stored([{"file_id" : 1, "key" : "k", "value" : "a"}]))
+
+    counts, _ = file.File()._sync_associations([{"file_id" : "f1"}], [1], ["file_attributes"], cursor)
+
+    assert counts["file_attributes"] == {"inserted" : 0, "deleted" : 0}
+    assert cursor.statements == []
+
+
+def test_sync_compares_only_supplied_columns(make_cursor):
+    # cv_list_id isn't supplied, so the stored value is neither compared nor cleared
+    cursor = make_cursor(_stored([{"file_id" : 1, "key" : "k", "value" : "a", "cv_list_id" : 7}]))
+
+    counts, _ = file.File()._sync_associations([{"file_attributes" : [{"key" : "k", "value" : "a"}]}], [1], ["file_attributes"], cursor)
+
+    assert counts["file_attributes"] == {"inserted" : 0, "deleted" : 0}
+    assert "cv_list_id" not in cursor.matching("SELECT")[0][0]
+
+
+def test_sync_column_supplied_by_some_rows_compares_as_null_for_the_rest(make_cursor):
+    cursor = make_cursor(_stored([
+        {"file_id" : 1, "key" : "k", "value" : "a", "cv_list_id" : None},
+        {"file_id" : 1, "key" : "j", "value" : "b", "cv_list_id" : 7}
+    ]))
+    attributes = [{"key" : "k", "value" : "a"}, {"key" : "j", "value" : "b", "cv_list_id" : 8}]
+
+    counts, _ = file.File()._sync_associations([{"file_attributes" : attributes}], [1], ["file_attributes"], cursor)
+
+    assert counts["file_attributes"] == {"inserted" : 1, "deleted" : 1}
+    assert _deletes(cursor)[0][1] == (1, "j", "b", 7)
+
+
+def test_sync_file_parents_by_owner_col(make_cursor):
+    # file_parents rows are joined on parent_file_id but owned by the child file
+    cursor = make_cursor(_stored([
+        {"child_file_id" : 1, "parent_file_id" : 5, "relationship" : "r"},
+        {"child_file_id" : 1, "parent_file_id" : 6, "relationship" : "r"}
+    ]))
+    parents = [{"parent_file_id" : 5, "relationship" : "r"}, {"parent_file_id" : 7, "relationship" : "r"}]
+
+    counts, _ = file.File()._sync_associations([{"file_parents" : parents}], [1], ["file_parents"], cursor)
+
+    assert counts["file_parents"] == {"inserted" : 1, "deleted" : 1}
+    assert "WHERE child_file_id IN" in cursor.matching("SELECT")[0][0]
+    assert _deletes(cursor) == [("DELETE FROM file_assoc_file WHERE child_file_id = %s AND `parent_file_id` <=> %s AND `relationship` <=> %s LIMIT 1", (1, 6, "r"))]
+    assert _inserted(cursor) == [(1, 7, "r")]
+
+
+def test_sync_library_pool_by_owner_col(make_cursor):
+    # library_assoc_library_pool is joined on its own id but owned through library_id
+    cursor = make_cursor(_stored([{"library_id" : 3, "library_pool_id" : 8}]))
+
+    counts, _ = library.Library()._sync_associations([{"lib_assoc_lib_pool" : 9}], [3], ["lib_assoc_lib_pool"], cursor)
+
+    assert counts["lib_assoc_lib_pool"] == {"inserted" : 1, "deleted" : 1}
+    assert "WHERE library_id IN" in cursor.matching("SELECT")[0][0]
+    assert _deletes(cursor) == [("DELETE FROM library_assoc_library_pool WHERE library_id = %s AND `library_pool_id` <=> %s LIMIT 1", (3, 8))]
+    assert _inserted(cursor) == [(3, 9)]
+
+
+def test_sync_rejects_unknown_associations(make_cursor):
+    with pytest.raises(ValueError):
+        file.File()._sync_associations([{}], [1], ["nope"], make_cursor())
+
+
+@pytest.mark.parametrize("param_value, db_value", [
+    (True, 1),
+    (1.0, 1),
+    (1, 1),
+    ("1", 1),
+    ("1.0", 1),
+    ("True", True),
+    ("", None),
+    (0, None),
+    (False, 0),
+    (Decimal("1.50"), "1.50"),
+    (Decimal("1.50"), "1.5"),
+    ("2024-01-02 03:04:05.000000", datetime(2024, 1, 2, 3, 4, 5)),
+    ("2024-01-02", datetime(2024, 1, 2))
+])
+def test_comparable_agrees_with_values_equal(param_value, db_value):
+    assert (base._comparable(param_value) == base._comparable(db_value)) == base._values_equal(param_value, db_value)
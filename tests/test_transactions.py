@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from unittest import mock
+import db_utils
+import transaction_manager
+
+
+@pytest.fixture(autouse=True)
+def end_transaction():
+    yield
+    transaction_manager.set_transaction_state(False)
+
+
+def test_nested_begin_is_rejected():
+    transaction_manager.begin_txn()
+    connector = object()
+    transaction_manager.set_connector(connector)
+
+    with pytest.raises(Exception, match="already in progress"):
+        transaction_manager.begin_txn()
+    assert transaction_manager.get_connector() is connector
+    assert transaction_manager.is_transaction_state()
+
+
+def test_begin_after_the_transaction_ends():
+    transaction_manager.begin_txn()
+    transaction_manager.set_transaction_state(False)
+
+    transaction_manager.begin_txn()
+    assert transaction_manager.is_transaction_state()
+    assert transaction_manager.get_connector() is None
+
+
+def test_task_begins_its_own_transaction_inside_its_parents():
+    async def child():
+        transaction_manager.begin_txn()
+        return transaction_manager.get_connector()
+
+    async def parent():
+        transaction_manager.begin_txn()
+        connector = object()
+        transaction_manager.set_connector(connector)
+        child_connector = await asyncio.create_task(child())
+        return connector, child_connector, transaction_manager.get_connector()
+
+    connector, child_connector, parent_connector = asyncio.run(parent())
+
+    assert child_connector is None
+    assert parent_connector is connector
+
+
+def test_batched_transaction_ends_when_no_connection(monkeypatch):
+    def no_connection(self):
+        raise Exception("pool exhausted")
+    monkeypatch.setattr(db_utils.Db, "get_db_connection", no_connection)
+
+    with pytest.raises(Exception, match="pool exhausted"):
+        with db_utils.Db().transaction():
+            pass
+    assert not transaction_manager.is_transaction_state()
+    assert transaction_manager.get_batch() is None
+
+
+def test_batched_transaction_releases_connection_when_savepoint_fails(monkeypatch):
+    cnx = mock.MagicMock()
+    cnx.base_obj.cursor.return_value.execute.side_effect = Exception("savepoint failed")
+    monkeypatch.setattr(db_utils.Db, "get_db_connection", lambda self : cnx)
+
+    with pytest.raises(Exception, match="savepoint failed"):
+        with db_utils.Db().transaction():
+            pass
+    assert not transaction_manager.is_transaction_state()
+    cnx.release.assert_called_once()
@@ -0,0 +1,125 @@
+import pytest
+from datetime import datetime
+import base
+import file
+
+
+EXISTING = {
+    "b" : {"id" : 2, "file_id" : "b", "data_type_id" : 1, "file_format_id" : 2, "project_id" : 3, "file_name" : "b.bam",
+           "md5" : "old", "size" : 100, "mtime" : datetime(2024, 1, 2, 3, 4, 5)},
+    "c" : {"id" : 3, "file_id" : "c", "data_type_id" : 1, "file_format_id" : 2, "project_id" : 3, "file_name" : "c.bam",
+           "md5" : None, "size" : 100, "mtime" : datetime(2024, 1, 2, 3, 4, 5)}
+}
+
+
+def _responder(unique=True):
+    def responder(stmt, params):
+        if "information_schema.STATISTICS" in stmt:
+            return [("file_id",)] if unique else []
+        # Keys are matched like MySQL's default collation, but returned with their stored spelling
+        if stmt.startswith("SELECT id, file_id FROM file"):
+            return [(200 + index, key.lower().rstrip()) for index, key in enumerate(params.values())]
+        if stmt.startswith("SELECT id, file_id,"):
+            fields = list(file.File.FIELDS.keys())
+            stored = [key.lower().rstrip() for key in params.values()]
+            return [dict({field : None for field in fields}, **EXISTING[key]) for key in stored if key in EXISTING]
+    return responder
+
+
+@pytest.fixture(autouse=True)
+def unchecked_keys(monkeypatch):
+    monkeypatch.setattr(base, "_unique_keys_checked", set())
+
+
+def _upserts(cursor):
+    return cursor.matching("INSERT INTO file")
+
+
+def test_upsert_rows_classifies_rows(make_cursor):
+    cursor = make_cursor(_responder())
+    rows = [
+        {"file_id" : "a", "data_type_id" : 1, "file_format_id" : 2, "project_id" : 3, "file_name" : "a.bam"},
+        {"file_id" : "b", "md5" : "new"},
+        {"file_id" : "c", "file_name" : "c.bam"}
+    ]
+
+    report = file.File()._upsert_rows(rows, "file_id", cursor)
+
+    assert report == {"inserted" : {"a" : 200}, "changed" : {"b" : 2}, "untouched" : {"c" : 3}}
+    # a and b supply different optional fields, so each gets its own single-row statement
+    upserts = _upserts(cursor)
+    assert [params[0] for _, params in upserts] == ["a", "b"]
+    assert all("ON DUPLICATE KEY UPDATE" in stmt for stmt, _ in upserts)
+
+
+def test_upsert_rows_partial_row_keeps_current_required_fields(make_cursor):
+    cursor = make_cursor(_responder())
+
+    file.File()._upsert_rows([{"file_id" : "b", "md5" : "new"}], "file_id", cursor)
+
+    [(stmt, params)] = _upserts(cursor)
+    assert stmt.startswith("INSERT INTO file (file_id, data_type_id, file_format_id, project_id, file_name, md5)")
+    assert params == ("b", 1, 2, 3, "b.bam", "new")
+
+
+@pytest.mark.parametrize("row", [
+    {"file_id" : "c", "size" : "100"},
+    {"file_id" : "c", "mtime" : "2024-01-02 03:04:05.000000"},
+    {"file_id" : "c", "md5" : ""},
+    {"file_id" : "c", "project_id" : "3", "file_name" : "c.bam"}
+])
+def test_upsert_rows_compares_like_compare_to(make_cursor, row):
+    cursor = make_cursor(_responder())
+
+    report = file.File()._upsert_rows([row], "file_id", cursor)
+
+    assert report["untouched"] == {"c" : 3}
+    assert _upserts(cursor) == []
+
+
+def test_upsert_rows_requires_unique_index(make_cursor):
+    cursor = make_cursor(_responder(unique=False))
+
+    with pytest.raises(Exception, match="UNIQUE index"):
+        file.File()._upsert_rows([{"file_id" : "b", "md5" : "new"}], "file_id", cursor)
+    assert _upserts(cursor) == []
+
+
+def test_upsert_rows_checks_unique_index_once(make_cursor):
+    cursor = make_cursor(_responder())
+
+    file.File()._upsert_rows([{"file_id" : "b", "md5" : "new"}], "file_id", cursor)
+    file.File()._upsert_rows([{"file_id" : "b", "md5" : "newer"}], "file_id", cursor)
+
+    assert len([stmt for stmt, _ in cursor.statements if "information_schema" in stmt]) == 1
+
+
+def test_upsert_rows_rejects_new_rows_without_required_fields(make_cursor):
+    cursor = make_cursor(_responder())
+
+    with pytest.raises(Exception, match="Missing required param"):
+        file.File()._upsert_rows([{"file_id" : "new", "md5" : "m"}], "file_id", cursor)
+    assert _upserts(cursor) == []
+
+
+def test_upsert_rows_rejects_duplicate_keys(make_cursor):
+    cursor = make_cursor(_responder())
+
+    with pytest.raises(ValueError):
+        file.File()._upsert_rows([{"file_id" : "b"}, {"file_id" : "b"}], "file_id", cursor)
+    assert cursor.statements == []
+
+
+def test_upsert_rows_matches_keys_under_the_collation(make_cursor):
+    cursor = make_cursor(_responder())
+    rows = [
+        {"file_id" : "B", "md5" : "new"},
+        {"file_id" : "c ", "file_name" : "c.bam"},
+        {"file_id" : "A", "data_type_id" : 1, "file_format_id" : 2, "project_id" : 3, "file_name" : "a.bam"}
+    ]
+
+    report = file.File()._upsert_rows(rows, "file_id", cursor)
+
+    assert report == {"inserted" : {"A" : 200}, "changed" : {"B" : 2}, "untouched" : {"c " : 3}}
+    # B keeps the stored record's required fields rather than being inserted as a new record
+    assert [params[:5] for _, params in _upserts(cursor)] == [("B", 1, 2, 3, "b.bam"), ("A", 1, 2, 3, "a.bam")]
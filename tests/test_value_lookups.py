@@ -0,0 +1,60 @@
+import pytest
+from unittest import mock
+import db_utils
+import lookup_cache
+
+
+@pytest.fixture
+def connect(monkeypatch, make_cursor):
+    """
+    Route Db's connection to a recording cursor whose SELECTs return rows
+    """
+    def connect(rows):
+        cnx = mock.MagicMock()
+        cnx.cursor.return_value = make_cursor(lambda stmt, params : rows)
+        monkeypatch.setattr(db_utils.Db, "get_db_connection", lambda self : cnx)
+        monkeypatch.setattr(db_utils.Db, "close_connection", lambda self, cnx : None)
+        return cnx.cursor.return_value
+    lookup_cache.get_cache().invalidate()
+    yield connect
+    lookup_cache.get_cache().invalidate()
+
+
+def test_ids_are_keyed_by_the_requested_value(connect):
+    # The collation matched "TestCohort" to the stored "testcohort"
+    connect([{"id" : 5, "cohort_name" : "testcohort"}])
+
+    assert db_utils.Db()._get_ids_from_unique_values("cohort", "cohort_name", ["TestCohort"]) == {"TestCohort" : 5}
+
+
+def test_cached_ids_are_keyed_by_the_requested_value(connect):
+    cursor = connect([{"id" : 9, "name" : "Homo sapiens"}])
+
+    assert db_utils.Db().get_taxonomy_ids(["homo sapiens "]) == {"homo sapiens " : 9}
+    assert lookup_cache.get_cache().get(("id", "taxonomy", "name", "homo sapiens ")) == 9
+    assert lookup_cache.get_cache().get(("id", "taxonomy", "name", "Homo sapiens")) is lookup_cache.MISSING
+
+    assert db_utils.Db().get_taxonomy_ids(["homo sapiens "]) == {"homo sapiens " : 9}
+    assert len(cursor.statements) == 1
+
+
+def test_spellings_of_one_stored_value_all_resolve(connect):
+    connect([{"id" : 3, "short_name" : "Café"}])
+
+    ids = db_utils.Db()._get_ids_from_unique_values("collection", "short_name", ["cafe", "CAFÉ ", "Café", "tea"])
+
+    assert ids == {"cafe" : 3, "CAFÉ " : 3, "Café" : 3}
+
+
+def test_exact_matches_win_over_folded_ones():
+    # Under a case sensitive collation both spellings are stored and returned
+    rows = [{"id" : 1, "name" : "abc"}, {"id" : 2, "name" : "ABC"}]
+
+    matches = db_utils.match_requested(["abc", "ABC", "Abc"], rows, lambda row : row["name"])
+
+    assert {value : [row["id"] for row in found] for value, found in matches.items()} == {"abc" : [1], "ABC" : [2], "Abc" : [1, 2]}
+
+
+def test_collation_key_folds_tuples_element_by_element():
+    assert db_utils.collation_key(("Ab ", 3)) == db_utils.collation_key(("ab", 3))
+    assert db_utils.collation_key(3) == 3